@@ -9,3 +9,11 @@ CREATE TABLE ai_model_versions (
     ruta_modelo VARCHAR(200),
     comentario VARCHAR(255)
 );
+
+-- Índice para ORDER BY fecha_entrenamiento y la paginación keyset de /api/v1/metrics/history
+CREATE INDEX idx_ai_model_versions_fecha ON ai_model_versions (fecha_entrenamiento, id);
+
+-- Hiperparámetros ganadores de la búsqueda del reentrenamiento y su duración
+ALTER TABLE ai_model_versions
+    ADD COLUMN hiperparametros JSON NULL,
+    ADD COLUMN tiempo_busqueda_s DECIMAL(10,2) NULL;
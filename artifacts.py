@@ -0,0 +1,96 @@
+# artifacts.py
+"""
+Escritura segura de artefactos del modelo.
+
+Todo se escribe primero en un archivo temporal del mismo directorio y luego
+se renombra con os.replace, que es atómico: un lector ve el archivo anterior
+completo o el nuevo completo, nunca uno a medio escribir.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+from config import MODEL_DIR, MODEL_MANIFEST
+
+MANIFEST_FULLPATH = os.path.join(MODEL_DIR, MODEL_MANIFEST)
+
+
+def _tmp_path(path):
+    return f"{path}.tmp-{os.getpid()}"
+
+
+def _replace(tmp, path):
+    try:
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def atomic_dump(obj, path):
+    """joblib.dump con escritura temporal + rename."""
+    # Import diferido: el modo INFERENCE_SLIM no carga joblib
+    import joblib
+    tmp = _tmp_path(path)
+    with open(tmp, "wb") as fh:
+        joblib.dump(obj, fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+    _replace(tmp, path)
+
+
+def atomic_savez(path, **arrays):
+    """numpy.savez (sin comprimir, sin pickle) con escritura temporal + rename."""
+    import numpy as np
+    tmp = _tmp_path(path)
+    with open(tmp, "wb") as fh:
+        np.savez(fh, **arrays)
+        fh.flush()
+        os.fsync(fh.fileno())
+    _replace(tmp, path)
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for bloque in iter(lambda: fh.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def atomic_copy(src, dst):
+    tmp = _tmp_path(dst)
+    with open(src, "rb") as fin, open(tmp, "wb") as fout:
+        shutil.copyfileobj(fin, fout)
+        fout.flush()
+        os.fsync(fout.fileno())
+    _replace(tmp, dst)
+
+
+def atomic_write_json(path, data):
+    tmp = _tmp_path(path)
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, ensure_ascii=False, indent=2, default=str)
+        fh.flush()
+        os.fsync(fh.fileno())
+    _replace(tmp, path)
+
+
+def write_manifest(version, model_file, encoder_file, **extra):
+    """
+    Publica la versión activa. `model_file` y `encoder_file` son nombres
+    relativos a MODEL_DIR. Debe llamarse después de escribir los artefactos.
+    """
+    data = {"version": version, "model": model_file, "encoder": encoder_file}
+    data.update(extra)
+    atomic_write_json(MANIFEST_FULLPATH, data)
+
+
+def read_manifest():
+    """Devuelve el manifiesto activo o None si no existe."""
+    if not os.path.exists(MANIFEST_FULLPATH):
+        return None
+    with open(MANIFEST_FULLPATH, "r", encoding="utf-8") as fh:
+        return json.load(fh)
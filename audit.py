@@ -0,0 +1,159 @@
+# audit.py
+"""
+Bitácora de auditoría en la tabla ai_audit_log.
+
+Los requests sólo encolan el registro en memoria; un hilo de fondo lo
+escribe en lotes (INSERT multi-fila) cuando se junta AUDIT_BATCH_SIZE o
+pasan AUDIT_FLUSH_INTERVAL segundos. Si la base no responde, el lote se
+agrega como JSON por línea a AUDIT_FALLBACK_FILE.
+"""
+from datetime import datetime
+import json
+import logging
+import queue
+import threading
+import time
+
+from config import (AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL, AUDIT_QUEUE_MAX,
+                    AUDIT_BLOCK_TIMEOUT, AUDIT_RETRY_INTERVAL, AUDIT_FALLBACK_FILE)
+
+INSERT_SQL = """
+    INSERT INTO ai_audit_log (usuario, fecha, accion, input, output, confianza)
+    VALUES (:usuario, :fecha, :accion, :input, :output, :confianza)
+"""
+
+
+class AuditWriter:
+    def __init__(self, batch_size=AUDIT_BATCH_SIZE, flush_interval=AUDIT_FLUSH_INTERVAL,
+                 max_queue=AUDIT_QUEUE_MAX, block_timeout=AUDIT_BLOCK_TIMEOUT,
+                 fallback_file=AUDIT_FALLBACK_FILE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.fallback_file = fallback_file
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        # Tras un fallo de BD se va directo al archivo hasta este instante
+        self._db_retry_at = 0.0
+        self.written = 0
+        self.fallback_written = 0
+        self.dropped = 0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, usuario, accion, input=None, output=None, confianza=None):
+        """
+        Encola un registro. Con la cola llena espera hasta AUDIT_BLOCK_TIMEOUT
+        segundos (0 = no espera) y, si sigue llena, lo descarta y lo cuenta.
+        """
+        item = {
+            "usuario": usuario,
+            "fecha": datetime.now(),
+            "accion": accion,
+            "input": input,
+            "output": output,
+            "confianza": confianza,
+        }
+        try:
+            if self.block_timeout > 0:
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logging.warning(f"Cola de auditoría llena: {self.dropped} registros descartados")
+            return False
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+        # Vaciar lo que quede al apagar
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                break
+            self._flush(batch)
+
+    def _collect(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(remaining, 0.5)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _serialize(item):
+        row = dict(item)
+        row["input"] = json.dumps(item["input"], ensure_ascii=False, default=str)
+        row["output"] = json.dumps(item["output"], ensure_ascii=False, default=str)
+        return row
+
+    def _flush(self, batch):
+        rows = [self._serialize(item) for item in batch]
+        if time.monotonic() >= self._db_retry_at:
+            try:
+                # Import diferido: SQLAlchemy se carga en este hilo con el primer
+                # lote, no al arrancar la API
+                from sqlalchemy import text
+                from db import get_engine
+                with get_engine().begin() as conn:
+                    conn.execute(text(INSERT_SQL), rows)
+                self.written += len(rows)
+                return
+            except Exception as e:
+                self._db_retry_at = time.monotonic() + AUDIT_RETRY_INTERVAL
+                logging.error(f"No se pudo escribir auditoría en BD, usando {self.fallback_file}: {e}")
+        self._write_fallback(rows)
+
+    def _write_fallback(self, rows):
+        try:
+            with open(self.fallback_file, "a", encoding="utf-8") as fh:
+                for row in rows:
+                    fh.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+            self.fallback_written += len(rows)
+        except Exception as e:
+            self.dropped += len(rows)
+            logging.error(f"No se pudo escribir auditoría en archivo: {e}")
+
+    def stop(self, timeout=10):
+        """Detiene el hilo tras escribir lo pendiente."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "fallback_written": self.fallback_written,
+            "dropped": self.dropped,
+        }
+
+
+audit_writer = AuditWriter()
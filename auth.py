@@ -5,19 +5,51 @@ from fastapi import HTTPException, Security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import jwt, JWTError
 from datetime import datetime
+import hashlib
+import time
 
 # Leer configuración desde config.py (variables de entorno)
-from config import SECRET_KEY, JWT_ALGORITHM
+from config import SECRET_KEY, JWT_ALGORITHM, AUTH_CACHE_SIZE, AUTH_CACHE_TTL
+from cache import TTLCache
+from instrumentation import etapa
 
 security = HTTPBearer()
 
+# Payloads ya verificados, indexados por el SHA-256 del token. Cada entrada
+# vence a más tardar en el `exp` del token, así que un token expirado nunca
+# se acepta desde la caché. SECRET_KEY y JWT_ALGORITHM se leen una sola vez al
+# importar: rotar la clave exige reiniciar el proceso, lo que vacía la caché.
+_token_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
 def verificar_jwt(credentials: HTTPAuthorizationCredentials = Security(security)):
-    token = credentials.credentials
+    with etapa("jwt"):
+        return _verificar_token(credentials.credentials)
+
+async def verificar_jwt_async(credentials: HTTPAuthorizationCredentials = Security(security)):
+    # Modo API_ASYNC: mismo chequeo en el event loop, sin pasar por el threadpool
+    # (con el token en caché es una búsqueda en memoria)
+    with etapa("jwt"):
+        return _verificar_token(credentials.credentials)
+
+def _verificar_token(token):
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _token_cache.get(key)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
         exp = payload.get("exp")
         if exp and datetime.utcfromtimestamp(exp) < datetime.utcnow():
             raise HTTPException(status_code=401, detail="Token expirado")
-        return payload  # puedes devolver el id_usuario, rol, etc.
     except JWTError:
         raise HTTPException(status_code=401, detail="Token inválido o no autorizado")
+
+    ttl = AUTH_CACHE_TTL
+    if exp:
+        ttl = min(ttl, exp - time.time())
+    _token_cache.set(key, payload, ttl)
+    return payload  # puedes devolver el id_usuario, rol, etc.
+
+def token_cache_stats():
+    return _token_cache.stats()
@@ -0,0 +1,239 @@
+# bench_concurrencia.py
+"""
+Throughput sostenido y latencia bajo concurrencia: API sincrónica contra
+API_ASYNC=1.
+
+Publica un modelo sintético y una base SQLite (ai_model_versions con
+algunas versiones) en un directorio temporal, levanta uvicorn en un proceso
+aparte para cada modo y lo carga con --concurrencia clientes durante
+--duracion segundos. La mezcla (--mezcla) combina predicción individual,
+lotes de --lote filas y GET /api/v1/metrics; la caché de métricas y la de
+predicciones se desactivan para que cada request haga su trabajo (consulta
+a la BD o recorrido del árbol).
+
+El generador de carga corre en la misma máquina: con pocos núcleos compite
+con el servidor, así que el resultado compara modos, no mide la capacidad
+absoluta del servicio.
+
+Uso:
+    python bench_concurrencia.py --concurrencia 64 --duracion 20
+    python bench_concurrencia.py --mezcla prediccion=0.6,lote=0.1,metricas=0.3 --salida conc.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ENDPOINTS = ("prediccion", "lote", "metricas")
+
+
+def _percentil(ordenados, q):
+    if not ordenados:
+        return None
+    return ordenados[min(len(ordenados) - 1, int(round((len(ordenados) - 1) * q)))]
+
+
+def _resumen(latencias, segundos):
+    ordenadas = sorted(latencias)
+    return {
+        "requests": len(ordenadas),
+        "rps": round(len(ordenadas) / segundos, 1),
+        "p50_ms": round(_percentil(ordenadas, 0.50) * 1000, 2) if ordenadas else None,
+        "p99_ms": round(_percentil(ordenadas, 0.99) * 1000, 2) if ordenadas else None,
+    }
+
+
+# --- Procesos hijos ---
+def preparar(directorio):
+    """Modelo sintético (ver bench_suite.preparar) y ai_model_versions en la base SQLite."""
+    from sqlalchemy import text
+    from bench_suite import preparar as publicar_modelo
+    from db import get_engine
+
+    publicar_modelo(directorio)
+    with get_engine().begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE ai_model_versions (
+                id INTEGER PRIMARY KEY, version_name TEXT, fecha_entrenamiento TEXT,
+                accuracy REAL, f1 REAL, clases TEXT, dataset_size INTEGER,
+                ruta_modelo TEXT, comentario TEXT, hiperparametros TEXT, tiempo_busqueda_s REAL)
+        """))
+        conn.execute(text("""
+            INSERT INTO ai_model_versions
+                (version_name, fecha_entrenamiento, accuracy, f1, dataset_size, comentario)
+            VALUES (:v, :f, 0.9, 0.88, 20000, 'bench')
+        """), [{"v": f"v{i}", "f": f"2025-01-{i:02d} 00:00:00"} for i in range(1, 29)])
+
+
+def servidor(puerto):
+    import uvicorn
+    import main
+    uvicorn.run(main.app, host="127.0.0.1", port=puerto, log_level="warning")
+
+
+def _interno(args):
+    import config
+    # DB_URI se arma desde DB_* y no se lee del entorno
+    config.DB_URI = f"sqlite:///{os.path.join(os.environ['MODEL_DIR'], 'bench.db')}"
+    if args.preparar:
+        preparar(os.environ["MODEL_DIR"].rstrip(os.sep))
+    else:
+        servidor(args.servidor)
+
+
+# --- Proceso principal ---
+def _env(directorio, modo_async=False):
+    return dict(os.environ,
+                MODEL_DIR=directorio + os.sep,
+                LOG_FILE=os.path.join(directorio, "bench.log"),
+                AUDIT_FALLBACK_FILE=os.path.join(directorio, "audit_fallback.jsonl"),
+                MODEL_WATCH_INTERVAL="0",
+                METRICS_CACHE_TTL="0",
+                PREDICTION_CACHE_SIZE="0",
+                API_ASYNC="1" if modo_async else "0")
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _filas(rng, n):
+    return [{
+        "consumo_7d": rng.uniform(0, 300), "consumo_30d": rng.uniform(0, 300),
+        "promedio_12m": rng.uniform(0, 300), "dias_desde_ultima_entrega": rng.randint(0, 30),
+        "stock_actual": rng.uniform(0, 500), "stock_capacidad": rng.uniform(100, 1000),
+        "solicitudes_pendientes": rng.randint(0, 5), "proyeccion_72h": rng.uniform(0, 100),
+        "indicador_riesgo": rng.random(),
+    } for _ in range(n)]
+
+
+async def _esperar_listo(cliente, url, headers, limite=60):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        try:
+            if (await cliente.get(f"{url}/api/v1/status", headers=headers)).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("El servidor no respondió a tiempo")
+
+
+async def cargar(url, headers, args, mezcla):
+    import httpx
+
+    tipos, pesos = zip(*mezcla.items())
+    latencias = {t: [] for t in tipos}
+    errores = {}
+    limites = httpx.Limits(max_connections=args.concurrencia, max_keepalive_connections=args.concurrencia)
+    async with httpx.AsyncClient(limits=limites, timeout=60) as cliente:
+        await _esperar_listo(cliente, url, headers)
+        inicio_medicion = time.monotonic() + args.calentamiento
+        fin = inicio_medicion + args.duracion
+
+        async def cliente_virtual(semilla):
+            rng = random.Random(semilla)
+            while time.monotonic() < fin:
+                tipo = rng.choices(tipos, pesos)[0]
+                t0 = time.monotonic()
+                if tipo == "prediccion":
+                    r = await cliente.post(f"{url}/api/v1/recommendations", json=_filas(rng, 1)[0], headers=headers)
+                elif tipo == "lote":
+                    r = await cliente.post(f"{url}/api/v1/recommendations/batch",
+                                           json=_filas(rng, args.lote), headers=headers)
+                else:
+                    r = await cliente.get(f"{url}/api/v1/metrics", headers=headers)
+                if t0 < inicio_medicion:
+                    continue
+                if r.status_code == 200:
+                    latencias[tipo].append(time.monotonic() - t0)
+                else:
+                    errores[r.status_code] = errores.get(r.status_code, 0) + 1
+
+        await asyncio.gather(*(cliente_virtual(i) for i in range(args.concurrencia)))
+
+    todas = [x for lista in latencias.values() for x in lista]
+    return {
+        **_resumen(todas, args.duracion),
+        "errores": errores,
+        "por_endpoint": {t: _resumen(latencias[t], args.duracion) for t in tipos},
+    }
+
+
+def medir_modo(directorio, modo_async, args, mezcla, headers):
+    puerto = _puerto_libre()
+    proceso = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--servidor", str(puerto)],
+                               env=_env(directorio, modo_async),
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    try:
+        return asyncio.run(cargar(f"http://127.0.0.1:{puerto}", headers, args, mezcla))
+    finally:
+        proceso.terminate()
+        proceso.wait(30)
+
+
+def _mezcla(texto):
+    mezcla = {}
+    for parte in texto.split(","):
+        nombre, peso = parte.split("=")
+        if nombre not in ENDPOINTS:
+            raise SystemExit(f"Endpoint desconocido en --mezcla: {nombre} (opciones: {', '.join(ENDPOINTS)})")
+        if float(peso) > 0:
+            mezcla[nombre] = float(peso)
+    return mezcla
+
+
+def main(args):
+    from jose import jwt
+    import config
+
+    mezcla = _mezcla(args.mezcla)
+    token = jwt.encode({"username": "bench", "exp": int(time.time()) + 86400},
+                       config.SECRET_KEY, algorithm=config.JWT_ALGORITHM)
+    headers = {"Authorization": f"Bearer {token}"}
+    informe = {"concurrencia": args.concurrencia, "duracion_s": args.duracion, "mezcla": mezcla,
+               "lote": args.lote, "cpus": os.cpu_count()}
+    with tempfile.TemporaryDirectory(prefix="bench_conc_") as directorio:
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--preparar"], env=_env(directorio),
+                       check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        for nombre, modo_async in (("sync", False), ("async", True)):
+            print(f"⏱️  {nombre}...", file=sys.stderr)
+            informe[nombre] = medir_modo(directorio, modo_async, args, mezcla, headers)
+
+    s, a = informe["sync"], informe["async"]
+    informe["comparacion"] = {
+        "rps_async_vs_sync": round(a["rps"] / s["rps"], 3) if s["rps"] else None,
+        "p99_async_vs_sync": round(a["p99_ms"] / s["p99_ms"], 3) if s["p99_ms"] and a["p99_ms"] else None,
+    }
+    texto = json.dumps(informe, indent=2)
+    print(texto)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as fh:
+            fh.write(texto)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput y p99 bajo concurrencia: sync vs API_ASYNC")
+    parser.add_argument("--concurrencia", type=int, default=64, help="Clientes simultáneos")
+    parser.add_argument("--duracion", type=float, default=20, help="Segundos medidos por modo")
+    parser.add_argument("--calentamiento", type=float, default=3, help="Segundos iniciales descartados")
+    parser.add_argument("--mezcla", default="prediccion=0.7,lote=0.1,metricas=0.2",
+                        help="Pesos por endpoint (prediccion, lote, metricas)")
+    parser.add_argument("--lote", type=int, default=100, help="Filas por request de lote")
+    parser.add_argument("--salida", help="Archivo donde guardar el informe JSON")
+    parser.add_argument("--preparar", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--servidor", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.preparar or args.servidor:
+        _interno(args)
+    else:
+        raise SystemExit(main(args))
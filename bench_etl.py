@@ -0,0 +1,89 @@
+# bench_etl.py
+"""
+Compara el SQL original de features (subconsultas correlacionadas) con la
+versión de una sola pasada: tiempo de ejecución y filas producidas.
+
+Sólo ejecuta la parte SELECT de cada archivo, así que no escribe en
+features_parroquia_daily. Requiere la base MySQL configurada en .env.
+
+Uso:
+    python bench_etl.py --repeticiones 5
+"""
+from decimal import Decimal
+import argparse
+import json
+import re
+import statistics
+import time
+
+from sqlalchemy import text
+
+from db import get_engine
+from etl_features_parroquia_daily import query_path_for
+
+SELECT_RE = re.compile(r"\)\s*(SELECT\b.*?)\s*ON DUPLICATE KEY UPDATE", re.S | re.I)
+
+
+def select_part(mode):
+    with open(query_path_for(mode), "r", encoding="utf-8") as f:
+        sql = f.read()
+    match = SELECT_RE.search(sql)
+    if not match:
+        raise ValueError(f"No se encontró el SELECT en el SQL del modo {mode}")
+    return match.group(1)
+
+
+def run(conn, sql):
+    t0 = time.perf_counter()
+    rows = conn.execute(text(sql)).mappings().all()
+    return time.perf_counter() - t0, rows
+
+
+def _normalize(value):
+    if isinstance(value, Decimal):
+        return round(float(value), 4)
+    if isinstance(value, float):
+        return round(value, 4)
+    return value
+
+
+def compare(rows_a, rows_b):
+    """Devuelve la lista de parroquias cuyas filas difieren entre ambos modos."""
+    a = {r["parroquia_id"]: {k: _normalize(v) for k, v in r.items()} for r in rows_a}
+    b = {r["parroquia_id"]: {k: _normalize(v) for k, v in r.items()} for r in rows_b}
+    return sorted(pid for pid in set(a) | set(b) if a.get(pid) != b.get(pid))
+
+
+def main(repeticiones):
+    engine = get_engine()
+    results = {}
+    outputs = {}
+    with engine.connect() as conn:
+        for mode in ("legacy", "setbased"):
+            sql = select_part(mode)
+            run(conn, sql)  # calentamiento (caché de páginas de MySQL)
+            times = []
+            for _ in range(repeticiones):
+                elapsed, rows = run(conn, sql)
+                times.append(elapsed)
+            outputs[mode] = rows
+            results[mode] = {
+                "filas": len(rows),
+                "mediana_s": round(statistics.median(times), 4),
+                "min_s": round(min(times), 4),
+                "max_s": round(max(times), 4),
+            }
+
+    diferencias = compare(outputs["legacy"], outputs["setbased"])
+    legacy, setbased = results["legacy"]["mediana_s"], results["setbased"]["mediana_s"]
+    results["aceleracion"] = round(legacy / setbased, 2) if setbased else None
+    results["parroquias_con_diferencias"] = diferencias
+    print(json.dumps(results, indent=2))
+    return 1 if diferencias else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del SQL de features diarias")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+    raise SystemExit(main(args.repeticiones))
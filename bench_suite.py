@@ -0,0 +1,376 @@
+# bench_suite.py
+"""
+Micro-benchmarks de los caminos de inferencia, ETL y entrenamiento.
+
+Corre sin MySQL: los datos se generan en un directorio temporal (modelo
+entrenado con datos sintéticos y una base SQLite con dataset_entrenamiento).
+Cada componente se ejecuta en su propio proceso, así el pico de memoria
+(RSS) y la carga en frío de uno no contaminan al siguiente.
+
+Componentes:
+  jwt                  verificar_jwt con el token en caché y sin caché
+  prediccion           predict_from_dict, una fila por llamada
+  prediccion_lote      predict_batch con --lote filas por llamada
+  carga_modelo         import de model_loader + load_model en un proceso nuevo
+  arranque_api         import de main + evento de arranque en un proceso nuevo
+  arranque_api_slim    lo mismo con INFERENCE_SLIM=1 (artefacto compacto)
+  etl_ventanas         avance diario de EstadoVentanas + fila de features
+                       (núcleo del ETL incremental; el SQL del ETL es de MySQL)
+  reentrenamiento_N    retrain_model completo sobre N filas (10k, 100k, 1M)
+
+Salida: JSON con percentiles de latencia, throughput y RSS pico por
+componente. Con --base se compara el p50 contra una corrida guardada y el
+proceso termina con código 1 si alguno empeora más de --umbral.
+
+Uso:
+    python bench_suite.py --salida bench.json
+    python bench_suite.py --componentes jwt,prediccion --guardar-base bench_base.json
+    python bench_suite.py --base bench_base.json --umbral 0.2
+"""
+from datetime import datetime
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+TAMANOS_REENTRENAMIENTO = (10_000, 100_000, 1_000_000)
+COMPONENTES = ["jwt", "prediccion", "prediccion_lote", "carga_modelo", "arranque_api",
+               "arranque_api_slim", "etl_ventanas"] + \
+              [f"reentrenamiento_{n}" for n in TAMANOS_REENTRENAMIENTO]
+# Se miden una vez por proceso: se repiten en --repeticiones-frias procesos
+EN_FRIO = ("carga_modelo", "arranque_api", "arranque_api_slim")
+
+
+# --- Medición ---
+def _medir(fn, repeticiones, calentamiento=0):
+    for _ in range(calentamiento):
+        fn()
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t0)
+    return tiempos
+
+
+def _percentil(ordenados, q):
+    if len(ordenados) == 1:
+        return ordenados[0]
+    pos = (len(ordenados) - 1) * q
+    i = int(pos)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (pos - i)
+
+
+def resumir(tiempos, unidades=1):
+    """Percentiles en ms y throughput (unidades por segundo) de una lista de tiempos en segundos."""
+    ordenados = sorted(tiempos)
+    total = sum(ordenados)
+    return {
+        "n": len(ordenados),
+        "media_ms": round(total / len(ordenados) * 1000, 4),
+        "p50_ms": round(_percentil(ordenados, 0.50) * 1000, 4),
+        "p95_ms": round(_percentil(ordenados, 0.95) * 1000, 4),
+        "p99_ms": round(_percentil(ordenados, 0.99) * 1000, 4),
+        "max_ms": round(ordenados[-1] * 1000, 4),
+        "throughput_s": round(unidades * len(ordenados) / total, 2) if total else None,
+    }
+
+
+# --- Datos sintéticos ---
+def _filas_sinteticas(n, seed=42):
+    import numpy as np
+    from model_loader import FEATURES
+    rng = np.random.default_rng(seed)
+    X = rng.gamma(2.0, 50.0, size=(n, len(FEATURES))).astype(np.float32)
+    return X, FEATURES
+
+
+def _etiquetas(X):
+    import numpy as np
+    # Reglas parecidas a las de dataset_entrenamiento_v, sólo para tener clases con estructura
+    return np.select([X[:, 4] < X[:, 5] * 0.25, X[:, 0] > 200, X[:, 1] > 220],
+                     ["riesgo", "abrir", "cerrar"], "normal")
+
+
+def preparar(directorio):
+    """Entrena y publica un modelo sintético en `directorio` (MODEL_DIR del benchmark)."""
+    from sklearn.preprocessing import LabelEncoder
+    from artifacts import atomic_dump, write_manifest
+    from busqueda_hiperparametros import crear_modelo
+    from model_loader import export_compact
+
+    X, _ = _filas_sinteticas(20_000)
+    encoder = LabelEncoder().fit(_etiquetas(X))
+    model = crear_modelo({"max_depth": 8, "min_samples_leaf": 5, "ccp_alpha": 0.0})
+    model.fit(X, encoder.transform(_etiquetas(X)))
+    atomic_dump(model, os.path.join(directorio, "modelo_cart_bench.joblib"))
+    atomic_dump(encoder, os.path.join(directorio, "encoder_etiquetas_bench.joblib"))
+    sha256 = export_compact(model, encoder, os.path.join(directorio, "modelo_bench.npz"), "bench")
+    write_manifest("bench", "modelo_cart_bench.joblib", "encoder_etiquetas_bench.joblib",
+                   compact="modelo_bench.npz", compact_sha256=sha256)
+
+
+def _crear_dataset(n):
+    """Tabla dataset_entrenamiento (y ai_model_versions) con n filas en la base SQLite del benchmark."""
+    import numpy as np
+    import pandas as pd
+    from sqlalchemy import text
+    from db import get_engine
+    from dataset_entrenamiento import FEATURES
+
+    X, _ = _filas_sinteticas(n, seed=n)
+    df = pd.DataFrame(X, columns=FEATURES)
+    df.insert(0, "parroquia", np.arange(n) % 500 + 1)
+    df.insert(1, "fecha", pd.Timestamp("2023-01-01") + pd.to_timedelta(np.arange(n) // 500, unit="D"))
+    df["etiqueta"] = _etiquetas(X)
+    engine = get_engine()
+    df.to_sql("dataset_entrenamiento", engine, index=False, if_exists="replace", chunksize=50_000)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS ai_model_versions"))
+        conn.execute(text("""
+            CREATE TABLE ai_model_versions (
+                id INTEGER PRIMARY KEY, version_name TEXT, fecha_entrenamiento TEXT,
+                accuracy REAL, f1 REAL, clases TEXT, dataset_size INTEGER,
+                ruta_modelo TEXT, comentario TEXT, hiperparametros TEXT, tiempo_busqueda_s REAL)
+        """))
+
+
+# --- Componentes (se ejecutan dentro del proceso hijo) ---
+def bench_jwt(args):
+    from fastapi.security import HTTPAuthorizationCredentials
+    from jose import jwt
+    import auth
+    import config
+
+    token = jwt.encode({"username": "bench", "exp": int(time.time()) + 3600},
+                       config.SECRET_KEY, algorithm=config.JWT_ALGORITHM)
+    cred = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    def sin_cache():
+        auth._token_cache.clear()
+        auth.verificar_jwt(cred)
+
+    return {
+        "jwt": (_medir(lambda: auth.verificar_jwt(cred), args.repeticiones, 100), 1),
+        "jwt_sin_cache": (_medir(sin_cache, args.repeticiones, 100), 1),
+    }
+
+
+def bench_prediccion(args):
+    import model_loader
+    bundle = model_loader.load_model()
+    X, features = _filas_sinteticas(1000, seed=7)
+    filas = [dict(zip(features, map(float, x))) for x in X]
+    it = iter(range(10 ** 9))
+    return {"prediccion": (_medir(lambda: model_loader.predict_from_dict(filas[next(it) % 1000], bundle),
+                                  args.repeticiones, 200), 1)}
+
+
+def bench_prediccion_lote(args):
+    import model_loader
+    bundle = model_loader.load_model()
+    X, features = _filas_sinteticas(args.lote, seed=7)
+    filas = [dict(zip(features, map(float, x))) for x in X]
+    repeticiones = max(10, args.repeticiones // args.lote)
+    return {"prediccion_lote": (_medir(lambda: model_loader.predict_batch(filas, bundle),
+                                       repeticiones, 3), args.lote)}
+
+
+def bench_carga_modelo(args):
+    t0 = time.perf_counter()
+    import model_loader
+    model_loader.load_model()
+    return {"carga_modelo": ([time.perf_counter() - t0], 1)}
+
+
+def bench_arranque_api(args, nombre="arranque_api"):
+    t0 = time.perf_counter()
+    import main
+    main.startup_event()
+    total = time.perf_counter() - t0
+    main.shutdown_event()
+    return {nombre: ([total], 1), f"{nombre}_imports": ([main.IMPORT_SECONDS], 1)}
+
+
+def bench_arranque_api_slim(args):
+    # INFERENCE_SLIM=1 llega por el entorno del proceso (ver correr)
+    return bench_arranque_api(args, "arranque_api_slim")
+
+
+def bench_etl_ventanas(args):
+    from datetime import date, timedelta
+    from decimal import Decimal
+    import random
+    from etl_incremental import EstadoVentanas, dias_expirados
+
+    rng = random.Random(42)
+    parroquias, inicio, dias = 200, date(2023, 1, 1), 730
+    diarios = []
+    for _ in range(parroquias):
+        diarios.append({inicio + timedelta(days=i): (Decimal(rng.randint(0, 400)), rng.randint(0, 2))
+                        for i in range(dias)})
+    arranque = inicio + timedelta(days=366)
+    estados = [EstadoVentanas.sembrar(arranque, d) for d in diarios]
+
+    def un_dia():
+        # Los días que expiran son los mismos para todas las parroquias
+        expirados = dias_expirados(estados[0].fecha + timedelta(days=1))
+        for pid, (estado, diario) in enumerate(zip(estados, diarios)):
+            estado.avanzar(diario, expirados)
+            estado.features(pid, 0, Decimal(1000))
+
+    return {"etl_ventanas": (_medir(un_dia, dias - 367), parroquias)}
+
+
+def bench_reentrenamiento(args, n):
+    _crear_dataset(n)
+    from memoria import peak_rss_mb
+    import retrain_model
+    t0 = time.perf_counter()
+    retrain_model.retrain_model("db")
+    tiempos = [time.perf_counter() - t0]
+    return {f"reentrenamiento_{n}": (tiempos, n)}, peak_rss_mb(hijos=True)
+
+
+def _ejecutar_componente(nombre, args):
+    """Punto de entrada del proceso hijo: imprime {"resultados", "peak_rss_mb"} en la última línea."""
+    import config
+    # Base SQLite del benchmark (DB_URI se arma desde DB_* y no se lee del entorno)
+    config.DB_URI = f"sqlite:///{os.path.join(args.directorio, 'bench.db')}"
+    from memoria import peak_rss_mb
+
+    if nombre == "preparar":
+        preparar(args.directorio)
+        resultados, rss_hijos = {}, None
+    elif nombre.startswith("reentrenamiento_"):
+        resultados, rss_hijos = bench_reentrenamiento(args, int(nombre.split("_")[1]))
+    else:
+        resultados, rss_hijos = globals()[f"bench_{nombre}"](args), None
+    print(json.dumps({
+        "resultados": {k: {"tiempos": t, "unidades": u} for k, (t, u) in resultados.items()},
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_rss_hijos_mb": rss_hijos,
+    }))
+
+
+# --- Proceso principal ---
+def _lanzar(nombre, args, env):
+    cmd = [sys.executable, os.path.abspath(__file__), "--interno", nombre,
+           "--directorio", args.directorio, "--repeticiones", str(args.repeticiones),
+           "--lote", str(args.lote)]
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        raise RuntimeError(f"El componente {nombre} falló:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def correr(componentes, args):
+    env = dict(os.environ,
+               MODEL_DIR=args.directorio + os.sep,
+               LOG_FILE=os.path.join(args.directorio, "bench.log"),
+               AUDIT_FALLBACK_FILE=os.path.join(args.directorio, "audit_fallback.jsonl"),
+               MODEL_WATCH_INTERVAL="0")
+    if args.presupuesto_busqueda is not None:
+        env["SEARCH_TIME_BUDGET"] = str(args.presupuesto_busqueda)
+    _lanzar("preparar", args, env)
+
+    resultados = {}
+    for nombre in componentes:
+        print(f"⏱️  {nombre}...", file=sys.stderr)
+        # La carga en frío sólo se puede medir una vez por proceso
+        corridas = args.repeticiones_frias if nombre in EN_FRIO else 1
+        env_componente = dict(env, INFERENCE_SLIM="1" if nombre == "arranque_api_slim" else "0")
+        muestras = {}
+        for _ in range(corridas):
+            salida = _lanzar(nombre, args, env_componente)
+            for clave, r in salida["resultados"].items():
+                m = muestras.setdefault(clave, {"tiempos": [], "unidades": r["unidades"], "rss": []})
+                m["tiempos"] += r["tiempos"]
+                m["rss"].append(salida["peak_rss_mb"])
+                if salida["peak_rss_hijos_mb"] is not None:
+                    m["rss_hijos"] = salida["peak_rss_hijos_mb"]
+        for clave, m in muestras.items():
+            resultados[clave] = resumir(m["tiempos"], m["unidades"])
+            resultados[clave]["peak_rss_mb"] = max((r for r in m["rss"] if r is not None), default=None)
+            if "rss_hijos" in m:
+                resultados[clave]["peak_rss_hijos_mb"] = m["rss_hijos"]
+    return resultados
+
+
+def comparar(actual, base, umbral):
+    """{componente: {"p50_ms", "base_p50_ms", "cambio", "regresion"}} de los componentes presentes en ambos."""
+    comparacion = {}
+    for nombre, r in actual.items():
+        b = base.get(nombre)
+        if not b or not b.get("p50_ms"):
+            continue
+        cambio = r["p50_ms"] / b["p50_ms"] - 1
+        comparacion[nombre] = {"p50_ms": r["p50_ms"], "base_p50_ms": b["p50_ms"],
+                               "cambio": round(cambio, 4), "regresion": cambio > umbral}
+    return comparacion
+
+
+def main(args):
+    componentes = args.componentes.split(",") if args.componentes else COMPONENTES
+    desconocidos = [c for c in componentes if c not in COMPONENTES]
+    if desconocidos:
+        raise SystemExit(f"Componentes desconocidos: {desconocidos} (opciones: {', '.join(COMPONENTES)})")
+
+    with tempfile.TemporaryDirectory(prefix="bench_epsdc_") as directorio:
+        args.directorio = directorio
+        resultados = correr(componentes, args)
+
+    informe = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "componentes": resultados,
+    }
+    codigo = 0
+    if args.base:
+        with open(args.base, "r", encoding="utf-8") as fh:
+            base = json.load(fh)["componentes"]
+        informe["comparacion"] = comparar(resultados, base, args.umbral)
+        regresiones = [n for n, c in informe["comparacion"].items() if c["regresion"]]
+        informe["regresiones"] = regresiones
+        if regresiones:
+            print(f"❌ Regresiones de más de {args.umbral:.0%} en p50: {', '.join(regresiones)}", file=sys.stderr)
+            codigo = 1
+        else:
+            print("✅ Sin regresiones respecto de la base", file=sys.stderr)
+
+    texto = json.dumps(informe, indent=2)
+    print(texto)
+    for ruta in filter(None, (args.salida, args.guardar_base)):
+        with open(ruta, "w", encoding="utf-8") as fh:
+            fh.write(texto)
+    return codigo
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de inferencia, ETL y entrenamiento")
+    parser.add_argument("--componentes", help=f"Lista separada por comas (por defecto todos: {', '.join(COMPONENTES)})")
+    parser.add_argument("--repeticiones", type=int, default=10_000,
+                        help="Llamadas medidas por componente (en lote: filas totales)")
+    parser.add_argument("--repeticiones-frias", type=int, default=5, help="Procesos para medir la carga y el arranque en frío")
+    parser.add_argument("--lote", type=int, default=1000, help="Filas por llamada en prediccion_lote")
+    parser.add_argument("--presupuesto-busqueda", type=float,
+                        help="SEARCH_TIME_BUDGET para los reentrenamientos (por defecto el configurado)")
+    parser.add_argument("--salida", help="Archivo donde guardar el informe JSON")
+    parser.add_argument("--guardar-base", help="Guardar el informe como base de comparación")
+    parser.add_argument("--base", help="Informe base contra el que comparar")
+    parser.add_argument("--umbral", type=float, default=0.2, help="Empeoramiento relativo del p50 tolerado")
+    parser.add_argument("--interno", help=argparse.SUPPRESS)
+    parser.add_argument("--directorio", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.interno:
+        _ejecutar_componente(args.interno, args)
+    else:
+        raise SystemExit(main(args))
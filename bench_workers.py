@@ -0,0 +1,163 @@
+# bench_workers.py
+"""
+Memoria de N workers que sirven el mismo modelo, con y sin MODEL_MMAP.
+
+Publica en un directorio temporal un árbol grande entrenado con datos
+sintéticos (o usa --directorio con artefactos ya publicados), arranca N
+procesos por modo que cargan el modelo y predicen, y con todos vivos a la
+vez lee /proc/<pid>/smaps_rollup de cada uno. La PSS (memoria proporcional:
+cada página compartida se reparte entre los procesos que la mapean) es la
+que muestra el ahorro; la memoria privada es lo que cada worker no comparte.
+También verifica que ambos modos den las mismas predicciones.
+
+Sólo Linux (smaps_rollup).
+
+Uso:
+    python bench_workers.py --workers 4
+    python bench_workers.py --workers 8 --directorio ./   # artefactos reales (MODEL_DIR)
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+CAMPOS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def preparar(directorio, filas):
+    """Publica un árbol sin límite de profundidad (muchos nodos) con su archivo de arreglos."""
+    import numpy as np
+    from sklearn.preprocessing import LabelEncoder
+    from artifacts import atomic_dump, write_manifest
+    from bench_suite import _filas_sinteticas, _etiquetas
+    from busqueda_hiperparametros import crear_modelo
+    from model_loader import export_arrays
+
+    X, _ = _filas_sinteticas(filas)
+    y = _etiquetas(X)
+    # Etiquetas con ruido: el árbol crece hasta separar cada fila ruidosa
+    rng = np.random.default_rng(0)
+    ruido = rng.random(len(y)) < 0.2
+    y[ruido] = rng.choice(np.unique(y), size=int(ruido.sum()))
+    encoder = LabelEncoder().fit(y)
+    model = crear_modelo({"max_depth": None, "min_samples_leaf": 1, "ccp_alpha": 0.0})
+    model.fit(X, encoder.transform(y))
+    atomic_dump(model, os.path.join(directorio, "modelo_cart_bench.joblib"))
+    atomic_dump(encoder, os.path.join(directorio, "encoder_etiquetas_bench.joblib"))
+    export_arrays(model, encoder, os.path.join(directorio, "arbol_bench.joblib"))
+    write_manifest("bench", "modelo_cart_bench.joblib", "encoder_etiquetas_bench.joblib",
+                   arrays="arbol_bench.joblib")
+    return model.tree_.node_count
+
+
+def worker():
+    """Proceso hijo: carga, predice, informa y espera a que el padre mida."""
+    t0 = time.perf_counter()
+    import model_loader
+    bundle = model_loader.load_model()
+    carga = time.perf_counter() - t0
+    from bench_suite import _filas_sinteticas
+    X, _ = _filas_sinteticas(5000, seed=3)
+    etiquetas = [bundle.compiled.predict_one(row)["prediction"] for row in X.tolist()]
+    etiquetas += [r["prediction"] for r in bundle.compiled.predict_batch(X)]
+    huella = hashlib.sha256("|".join(etiquetas).encode()).hexdigest()[:16]
+    print(json.dumps({"carga_s": round(carga, 3), "huella": huella}), flush=True)
+    sys.stdin.read()
+
+
+def leer_smaps(pid):
+    valores = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as fh:
+        for linea in fh:
+            partes = linea.split()
+            if partes and partes[0].rstrip(":") in CAMPOS:
+                valores[partes[0].rstrip(":")] = int(partes[1]) / 1024  # kB -> MB
+    return valores
+
+
+def _env(directorio, mmap=False):
+    # MODEL_DIR se lee al importar config: cada proceso hijo apunta al directorio del benchmark
+    return dict(os.environ, MODEL_DIR=directorio + os.sep, MODEL_MMAP="1" if mmap else "0",
+                LOG_FILE=os.path.join(directorio, "bench_workers.log"))
+
+
+def medir_modo(directorio, workers, mmap):
+    env = _env(directorio, mmap)
+    procesos = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--interno"],
+                                 stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=env,
+                                 cwd=os.path.dirname(os.path.abspath(__file__)))
+                for _ in range(workers)]
+    try:
+        informes = []
+        for p in procesos:
+            # load_model imprime su mensaje antes del JSON
+            linea = ""
+            while not linea.startswith("{"):
+                linea = p.stdout.readline()
+                if not linea:
+                    raise RuntimeError("Un worker terminó sin informar")
+            informes.append(json.loads(linea))
+        # Todos vivos: las páginas compartidas se reparten entre los N
+        memorias = [leer_smaps(p.pid) for p in procesos]
+    finally:
+        for p in procesos:
+            p.stdin.close()
+            p.wait()
+
+    def media(campo):
+        return round(sum(m.get(campo, 0) for m in memorias) / workers, 1)
+
+    return {
+        "workers": workers,
+        "carga_s_media": round(sum(i["carga_s"] for i in informes) / workers, 3),
+        "rss_mb_media": media("Rss"),
+        "pss_mb_media": media("Pss"),
+        "pss_mb_total": round(sum(m.get("Pss", 0) for m in memorias), 1),
+        "privada_mb_media": round(sum(m.get("Private_Clean", 0) + m.get("Private_Dirty", 0)
+                                      for m in memorias) / workers, 1),
+        "huellas": sorted({i["huella"] for i in informes}),
+    }
+
+
+def main(args):
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        raise SystemExit("bench_workers.py necesita /proc/<pid>/smaps_rollup (Linux)")
+    with tempfile.TemporaryDirectory(prefix="bench_workers_") as tmp:
+        directorio = args.directorio or tmp
+        informe = {}
+        if not args.directorio:
+            salida = subprocess.run([sys.executable, os.path.abspath(__file__), "--preparar", str(args.filas)],
+                                    env=_env(directorio), capture_output=True, text=True, check=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__)))
+            informe["nodos"] = int(salida.stdout.strip().splitlines()[-1])
+        informe["sin_mmap"] = medir_modo(directorio, args.workers, mmap=False)
+        informe["mmap"] = medir_modo(directorio, args.workers, mmap=True)
+
+    a, b = informe["sin_mmap"], informe["mmap"]
+    informe["ahorro_pss_mb_por_worker"] = round(a["pss_mb_media"] - b["pss_mb_media"], 1)
+    informe["ahorro_pss_mb_total"] = round(a["pss_mb_total"] - b["pss_mb_total"], 1)
+    informe["ahorro_carga_s"] = round(a["carga_s_media"] - b["carga_s_media"], 3)
+    informe["mismas_predicciones"] = a["huellas"] == b["huellas"] and len(a["huellas"]) == 1
+    print(json.dumps(informe, indent=2))
+    return 0 if informe["mismas_predicciones"] else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memoria por worker con y sin MODEL_MMAP")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--filas", type=int, default=200_000,
+                        help="Filas sintéticas para entrenar el árbol de prueba")
+    parser.add_argument("--directorio", help="MODEL_DIR con artefactos publicados (con arreglos)")
+    parser.add_argument("--interno", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--preparar", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.interno:
+        worker()
+    elif args.preparar:
+        print(preparar(os.environ["MODEL_DIR"].rstrip(os.sep), args.preparar))
+    else:
+        raise SystemExit(main(args))
@@ -0,0 +1,156 @@
+# busqueda_hiperparametros.py
+"""
+Búsqueda de hiperparámetros del árbol CART para el reentrenamiento.
+
+Candidatos: max_depth x min_samples_leaf x ccp_alpha. Los valores de
+ccp_alpha salen una sola vez de cost_complexity_pruning_path sobre el
+conjunto de entrenamiento (0 más cuantiles altos de los alfas del camino).
+
+Evaluación: validación cruzada estratificada de SEARCH_FOLDS pliegues con
+halving sucesivo. En cada ronda los candidatos vivos se evalúan en un
+pliegue más y sólo sigue la fracción 1/SEARCH_HALVING con mejor F1 medio,
+así los candidatos sin opción no consumen los pliegues restantes. Las
+evaluaciones corren en un pool de procesos (los datos viajan una vez por
+proceso, en el inicializador). Al agotar SEARCH_TIME_BUDGET segundos no se
+lanzan más evaluaciones (las que ya corren terminan) y gana el mejor de los
+candidatos vivos con lo evaluado hasta ese momento.
+"""
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import itertools
+import logging
+import math
+import os
+import time
+
+import numpy as np
+from sklearn.metrics import f1_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.tree import DecisionTreeClassifier
+
+from config import (SEARCH_MAX_DEPTHS, SEARCH_MIN_SAMPLES_LEAF, SEARCH_CCP_ALPHAS, SEARCH_FOLDS,
+                    SEARCH_HALVING, SEARCH_TIME_BUDGET, SEARCH_WORKERS, SEARCH_SEED)
+
+# Parámetros comunes a todos los candidatos
+BASE_PARAMS = {"criterion": "gini", "class_weight": "balanced"}
+# Parámetros usados cuando no hay datos suficientes para validar
+DEFAULT_PARAMS = {"max_depth": 6, "min_samples_leaf": 1, "ccp_alpha": 0.0}
+
+
+def _lista(valor, tipo):
+    """'4,6,none' -> [4, 6, None]"""
+    return [None if v.strip().lower() == "none" else tipo(v) for v in valor.split(",") if v.strip()]
+
+
+def crear_modelo(params, seed=SEARCH_SEED):
+    return DecisionTreeClassifier(**BASE_PARAMS, **params, random_state=seed)
+
+
+def alphas_de_poda(X, y, n=SEARCH_CCP_ALPHAS, seed=SEARCH_SEED):
+    """
+    0 y `n - 1` cuantiles altos de los alfas efectivos del camino de poda.
+    La mayoría de los alfas del camino podan hojas casi puras y equivalen a 0,
+    por eso se toman cuantiles a partir de la mediana.
+    """
+    path = crear_modelo({}, seed).cost_complexity_pruning_path(X, y)
+    # El último alfa poda el árbol hasta la raíz
+    positivos = np.unique(path.ccp_alphas[:-1][path.ccp_alphas[:-1] > 0])
+    if n <= 1 or len(positivos) == 0:
+        return [0.0]
+    cuantiles = np.quantile(positivos, np.linspace(0.5, 0.99, n - 1))
+    return [0.0] + sorted({float(a) for a in cuantiles})
+
+
+def candidatos(alphas, max_depths=None, min_samples_leaf=None):
+    max_depths = max_depths or _lista(SEARCH_MAX_DEPTHS, int)
+    min_samples_leaf = min_samples_leaf or _lista(SEARCH_MIN_SAMPLES_LEAF, int)
+    return [{"max_depth": d, "min_samples_leaf": m, "ccp_alpha": a}
+            for d, m, a in itertools.product(max_depths, min_samples_leaf, alphas)]
+
+
+# --- Proceso de evaluación ---
+_X = _y = _folds = _seed = None
+
+
+def _iniciar_proceso(X, y, folds, seed):
+    global _X, _y, _folds, _seed
+    _X, _y, _folds, _seed = X, y, folds, seed
+
+
+def _evaluar(params, k):
+    train_idx, val_idx = _folds[k]
+    model = crear_modelo(params, _seed).fit(_X[train_idx], _y[train_idx])
+    return f1_score(_y[val_idx], model.predict(_X[val_idx]), average="weighted")
+
+
+def buscar(X, y, seed=SEARCH_SEED, presupuesto=SEARCH_TIME_BUDGET, workers=SEARCH_WORKERS,
+           n_folds=SEARCH_FOLDS, halving=SEARCH_HALVING, max_depths=None, min_samples_leaf=None):
+    """
+    Devuelve {"params", "f1_cv", "pliegues", "candidatos", "evaluaciones",
+    "agotado", "tiempo_s"}. `y` son las etiquetas codificadas.
+    """
+    t0 = time.monotonic()
+    _, por_clase = np.unique(y, return_counts=True)
+    n_folds = min(n_folds, int(por_clase.min()))
+    if n_folds < 2:
+        logging.warning("Búsqueda de hiperparámetros omitida: hay clases con menos de 2 filas")
+        return {"params": dict(DEFAULT_PARAMS), "f1_cv": None, "pliegues": 0, "candidatos": 0,
+                "evaluaciones": 0, "agotado": False, "tiempo_s": round(time.monotonic() - t0, 2)}
+
+    lista = candidatos(alphas_de_poda(X, y, seed=seed), max_depths, min_samples_leaf)
+    folds = list(StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed).split(X, y))
+    puntajes = [[] for _ in lista]
+    vivos = list(range(len(lista)))
+    evaluaciones = 0
+    agotado = False
+    fin = t0 + presupuesto
+    workers = min(workers or os.cpu_count() or 1, len(lista))
+
+    def media(c):
+        return float(np.mean(puntajes[c])) if puntajes[c] else -1.0
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_proceso,
+                               initargs=(X, y, folds, seed))
+    try:
+        for k in range(n_folds):
+            pendientes = {pool.submit(_evaluar, lista[c], k): c for c in vivos}
+            while pendientes:
+                restante = fin - time.monotonic()
+                if restante <= 0:
+                    agotado = True
+                    break
+                hechos, _ = wait(pendientes, timeout=restante, return_when=FIRST_COMPLETED)
+                for futuro in hechos:
+                    puntajes[pendientes.pop(futuro)].append(futuro.result())
+                    evaluaciones += 1
+            if agotado:
+                break
+            if k < n_folds - 1:
+                vivos.sort(key=media, reverse=True)
+                vivos = vivos[:max(1, math.ceil(len(vivos) / halving))]
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    # Si el presupuesto cortó una ronda, unos sobrevivientes tienen un pliegue
+    # más que otros: se comparan sólo en los pliegues que completaron todos
+    # (los mismos para todos, porque los pliegues se evalúan en orden)
+    pliegues = min(len(puntajes[c]) for c in vivos) or 1
+    evaluados = [c for c in vivos if len(puntajes[c]) >= pliegues]
+    if not evaluados:
+        logging.warning("Búsqueda de hiperparámetros sin evaluaciones dentro del presupuesto; "
+                        "se usan los parámetros por defecto")
+        mejor, f1_cv, pliegues = dict(DEFAULT_PARAMS), None, 0
+    else:
+        def media_comun(c):
+            return float(np.mean(puntajes[c][:pliegues]))
+        c = max(evaluados, key=media_comun)
+        mejor, f1_cv = lista[c], round(media_comun(c), 6)
+    return {"params": mejor, "f1_cv": f1_cv, "pliegues": pliegues, "candidatos": len(lista),
+            "evaluaciones": evaluaciones, "agotado": agotado,
+            "tiempo_s": round(time.monotonic() - t0, 2)}
+
+
+def entrenar(X, y, seed=SEARCH_SEED, **opciones):
+    """Busca los hiperparámetros y ajusta el árbol final con todo X. Devuelve (modelo, búsqueda)."""
+    busqueda = buscar(X, y, seed=seed, **opciones)
+    model = crear_modelo(busqueda["params"], seed).fit(X, y)
+    return model, busqueda
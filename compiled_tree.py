@@ -0,0 +1,252 @@
+# compiled_tree.py
+"""
+Evaluador compilado de un DecisionTreeClassifier entrenado.
+
+Convierte `tree_.feature`, `threshold`, `children_left/right` y `value`
+en arreglos contiguos y los recorre sin pasar por sklearn ni pandas.
+Cada hoja guarda su resultado ya armado (etiqueta, confianza y
+probabilidades), así que una predicción individual se reduce a unas
+pocas comparaciones.
+
+Con `compartido=True` (arreglos mapeados desde disco, ver
+model_loader.MODEL_MMAP) el recorrido lee los arreglos a través de
+memoryview en lugar de copiarlos a listas, y el resultado de cada hoja se
+arma la primera vez que se usa: los datos del árbol quedan en páginas del
+archivo que comparten todos los procesos que lo mapean.
+
+Uso como script (verificación de paridad y latencia contra el modelo activo):
+    python compiled_tree.py
+"""
+from array import array
+import numpy as np
+
+TREE_LEAF = -1
+
+
+class _HojasPerezosas(dict):
+    """Resultado por hoja armado al primer uso (modo compartido)."""
+
+    def __init__(self, tree):
+        super().__init__()
+        self._tree = tree
+
+    def __missing__(self, node):
+        payload = self[node] = self._tree._hoja(node)
+        return payload
+
+
+class CompiledTree:
+    def __init__(self, feature, threshold, children_left, children_right,
+                 proba, classes, missing_go_to_left=None, max_depth=None,
+                 n_features=None, compartido=False):
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.children_left = np.ascontiguousarray(children_left, dtype=np.intp)
+        self.children_right = np.ascontiguousarray(children_right, dtype=np.intp)
+        self.proba = np.ascontiguousarray(proba, dtype=np.float64)
+        self.classes = [str(c) for c in classes]
+        self.missing_go_to_left = (
+            None if missing_go_to_left is None
+            else np.ascontiguousarray(missing_go_to_left, dtype=bool)
+        )
+        self.n_nodes = len(self.feature)
+        self.n_features = n_features
+        self.max_depth = max_depth if max_depth is not None else self._depth()
+        self.compartido = compartido
+
+        if compartido:
+            # memoryview indexa casi tan rápido como una lista y no copia los datos
+            self._feat = memoryview(self.feature)
+            self._thr = memoryview(self.threshold)
+            self._left = memoryview(self.children_left)
+            self._right = memoryview(self.children_right)
+            self._mgl = (memoryview(self.missing_go_to_left)
+                         if self.missing_go_to_left is not None
+                         else [False] * self.n_nodes)
+            self._payload = _HojasPerezosas(self)
+            return
+
+        # Copias en listas de Python: indexarlas es más barato que indexar
+        # arreglos numpy elemento a elemento en el recorrido fila a fila.
+        self._feat = self.feature.tolist()
+        self._thr = self.threshold.tolist()
+        self._left = self.children_left.tolist()
+        self._right = self.children_right.tolist()
+        self._mgl = (self.missing_go_to_left.tolist()
+                     if self.missing_go_to_left is not None
+                     else [False] * self.n_nodes)
+
+        # Resultado precalculado por hoja (compartido: no mutar)
+        self._payload = [None] * self.n_nodes
+        for node in range(self.n_nodes):
+            if self._left[node] == TREE_LEAF:
+                self._payload[node] = self._hoja(node)
+
+    def _hoja(self, node):
+        probs = self.proba[node]
+        return {
+            "prediction": self.classes[int(np.argmax(probs))],
+            "confidence": round(float(probs.max()), 2),
+            "probabilities": {c: round(float(p), 3)
+                              for c, p in zip(self.classes, probs)},
+        }
+
+    def to_arrays(self):
+        """Contenido serializable del árbol (ver CompiledTree(**arrays, compartido=True))."""
+        return {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "children_left": self.children_left,
+            "children_right": self.children_right,
+            "proba": self.proba,
+            "classes": list(self.classes),
+            "missing_go_to_left": self.missing_go_to_left,
+            "max_depth": int(self.max_depth),
+            "n_features": self.n_features,
+        }
+
+    @classmethod
+    def from_sklearn(cls, model, encoder=None):
+        """Construye el evaluador a partir de un DecisionTreeClassifier ajustado."""
+        tree = model.tree_
+        # value trae conteos (o fracciones ponderadas) por clase: se normaliza
+        value = tree.value[:, 0, :].astype(np.float64)
+        totals = value.sum(axis=1, keepdims=True)
+        totals[totals == 0] = 1.0
+        proba = value / totals
+
+        classes = model.classes_
+        if encoder is not None:
+            classes = encoder.inverse_transform(model.classes_)
+
+        return cls(
+            feature=tree.feature,
+            threshold=tree.threshold,
+            children_left=tree.children_left,
+            children_right=tree.children_right,
+            proba=proba,
+            classes=classes,
+            missing_go_to_left=getattr(tree, "missing_go_to_left", None),
+            max_depth=tree.max_depth,
+            n_features=int(model.n_features_in_),
+        )
+
+    def _depth(self):
+        depth = 0
+        stack = [(0, 0)]
+        while stack:
+            node, d = stack.pop()
+            depth = max(depth, d)
+            if self.children_left[node] != TREE_LEAF:
+                stack.append((int(self.children_left[node]), d + 1))
+                stack.append((int(self.children_right[node]), d + 1))
+        return depth
+
+    # --- Fila individual ---
+    def leaf_one(self, values):
+        # sklearn evalúa en float32: se reproduce el mismo redondeo
+        row = array('f', values)
+        feat, thr, left, right, mgl = self._feat, self._thr, self._left, self._right, self._mgl
+        node = 0
+        while left[node] != TREE_LEAF:
+            x = row[feat[node]]
+            if x <= thr[node] or (x != x and mgl[node]):
+                node = left[node]
+            else:
+                node = right[node]
+        return node
+
+    def predict_one(self, values):
+        """
+        Devuelve {"prediction", "confidence", "probabilities"} para una fila
+        con los valores en el orden de entrenamiento. El dict es compartido
+        entre llamadas: no debe modificarse.
+        """
+        return self._payload[self.leaf_one(values)]
+
+    # --- Lote vectorizado ---
+    def apply(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2:
+            raise ValueError("Se esperaba una matriz 2D de features")
+        n = X.shape[0]
+        rows = np.arange(n)
+        node = np.zeros(n, dtype=np.intp)
+        for _ in range(self.max_depth):
+            left = self.children_left[node]
+            active = left != TREE_LEAF
+            if not active.any():
+                break
+            x = X[rows, self.feature[node]]
+            go_left = x <= self.threshold[node]
+            if self.missing_go_to_left is not None:
+                go_left |= np.isnan(x) & self.missing_go_to_left[node]
+            nxt = np.where(go_left, left, self.children_right[node])
+            node = np.where(active, nxt, node)
+        return node
+
+    def predict_proba(self, X):
+        return self.proba[self.apply(X)]
+
+    def predict_batch(self, X):
+        payload = self._payload
+        return [payload[leaf] for leaf in self.apply(X).tolist()]
+
+
+def sample_inputs(compiled: CompiledTree, n_features: int, n: int = 256, seed: int = 0):
+    """
+    Genera filas que caen justo en los umbrales del árbol (y a ambos lados),
+    que es donde una diferencia de redondeo cambiaría la hoja.
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 1000, size=(n, n_features))
+    for f in range(n_features):
+        thr = compiled.threshold[compiled.feature == f]
+        if len(thr) == 0:
+            continue
+        candidates = np.concatenate([thr, np.nextafter(thr, np.inf), np.nextafter(thr, -np.inf),
+                                     thr + 1e-3, thr - 1e-3])
+        mask = rng.random(n) < 0.7
+        X[mask, f] = rng.choice(candidates, size=int(mask.sum()))
+    return X
+
+
+def check_parity(compiled: CompiledTree, model, X):
+    """
+    Compara contra sklearn. Devuelve (filas con etiqueta distinta,
+    diferencia máxima absoluta de probabilidades).
+    """
+    X = np.asarray(X, dtype=np.float64)
+    sk_proba = model.predict_proba(X)
+    proba = compiled.predict_proba(X)
+    mismatches = int((model.predict(X) != model.classes_[proba.argmax(axis=1)]).sum())
+    max_diff = float(np.abs(sk_proba - proba).max()) if len(X) else 0.0
+    return mismatches, max_diff
+
+
+if __name__ == "__main__":
+    import time
+    import warnings
+    import model_loader
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    bundle = model_loader.load_model()
+    model = bundle.model
+    if model is None:
+        raise SystemExit("La verificación necesita el árbol sklearn: ejecutar con MODEL_MMAP=0")
+    compiled = CompiledTree.from_sklearn(model, bundle.encoder)
+
+    X = sample_inputs(compiled, model.n_features_in_, n=20000)
+    mismatches, max_diff = check_parity(compiled, model, X)
+    print(f"Paridad: {mismatches} etiquetas distintas, diferencia máxima de probabilidad {max_diff:.2e}")
+    single = [compiled.predict_one(row)["prediction"] for row in X[:2000].tolist()]
+    batch = [r["prediction"] for r in compiled.predict_batch(X[:2000])]
+    print(f"Fila a fila vs lote: {'OK' if single == batch else 'DIFERENTES'}")
+
+    rows = X[:1000].tolist()
+    t0 = time.perf_counter()
+    for _ in range(20):
+        for row in rows:
+            compiled.predict_one(row)
+    per_row = (time.perf_counter() - t0) / (20 * len(rows))
+    print(f"Latencia por fila (compilado): {per_row * 1e6:.2f} µs")
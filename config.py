@@ -14,13 +14,66 @@ DB_NAME = os.getenv("DB_NAME", "epsdc_principal")
 
 DB_URI = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Pool de conexiones compartido (ver db.py)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Segundos tras los cuales se recicla una conexión (evita cortes por wait_timeout de MySQL)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1").lower() in ("1", "true", "yes")
+
 # --- JWT ---
 SECRET_KEY = os.getenv("SECRET_KEY", "default_secret")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+# Caché de tokens ya verificados (entradas como máximo hasta el `exp` del token)
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))
 
 # --- LOGS ---
 LOG_FILE = os.getenv("LOG_FILE", "ia_audit.log")
 
+# --- AUDITORÍA (tabla ai_audit_log, ver audit.py) ---
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+# Segundos máximos que un registro espera en memoria antes de escribirse
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "2"))
+AUDIT_QUEUE_MAX = int(os.getenv("AUDIT_QUEUE_MAX", "50000"))
+# Con la cola llena: segundos que el request espera antes de descartar (0 = descarta ya)
+AUDIT_BLOCK_TIMEOUT = float(os.getenv("AUDIT_BLOCK_TIMEOUT", "0"))
+# Tras un error de BD, segundos durante los que se escribe directo al archivo
+AUDIT_RETRY_INTERVAL = float(os.getenv("AUDIT_RETRY_INTERVAL", "30"))
+AUDIT_FALLBACK_FILE = os.getenv("AUDIT_FALLBACK_FILE", "ia_audit_fallback.jsonl")
+
+# --- ETL ---
+# Variante del SQL de features: 'setbased' (una pasada) o 'legacy' (subconsultas)
+ETL_MODE = os.getenv("ETL_MODE", "setbased")
+# ETL incremental: días hacia atrás que se re-agregan en cada corrida (cambios de estado tardíos)
+ETL_LATE_DAYS = int(os.getenv("ETL_LATE_DAYS", "3"))
+# Backfill: días por bloque (cada bloque es una transacción) y archivo de checkpoint
+ETL_BACKFILL_CHUNK_DAYS = int(os.getenv("ETL_BACKFILL_CHUNK_DAYS", "30"))
+ETL_CHECKPOINT_FILE = os.getenv("ETL_CHECKPOINT_FILE", "etl_backfill_checkpoint.json")
+# ETL paralelo: hilos, criterio de partición ('rango' o 'municipio') y reintentos por partición
+ETL_WORKERS = int(os.getenv("ETL_WORKERS", "4"))
+ETL_PARTITION_BY = os.getenv("ETL_PARTITION_BY", "rango")
+ETL_PARTITION_RETRIES = int(os.getenv("ETL_PARTITION_RETRIES", "2"))
+
+# --- DATASET DE ENTRENAMIENTO ---
+# Filas por bloque al leer dataset_entrenamiento con cursor del lado del servidor
+DATASET_CHUNK_SIZE = int(os.getenv("DATASET_CHUNK_SIZE", "50000"))
+# Días recientes que se recalculan siempre en la tabla dataset_entrenamiento
+DATASET_REFRESH_DAYS = int(os.getenv("DATASET_REFRESH_DAYS", "7"))
+# Copia columnar local del dataset (ver snapshot_store.py)
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshot_dataset")
+# Origen de datos del reentrenamiento: 'db' (tabla dataset_entrenamiento) o 'snapshot'
+TRAIN_SOURCE = os.getenv("TRAIN_SOURCE", "db")
+# Drift (drift_sketch.py): días de la ventana reciente, que se compara contra
+# los DRIFT_BASELINE_DAYS días anteriores de histogramas diarios
+DRIFT_RECENT_DAYS = int(os.getenv("DRIFT_RECENT_DAYS", "30"))
+# Drift por histogramas (drift_sketch.py): intervalos por feature, días de la
+# ventana base y PSI a partir del cual una feature se considera con drift
+DRIFT_BINS = int(os.getenv("DRIFT_BINS", "20"))
+DRIFT_BASELINE_DAYS = int(os.getenv("DRIFT_BASELINE_DAYS", "180"))
+DRIFT_PSI_ALERT = float(os.getenv("DRIFT_PSI_ALERT", "0.2"))
+
 # --- RUTAS DE ARTEFACTOS ML ---
 # Directorio donde se guardan los modelos (por defecto la raíz del proyecto)
 MODEL_DIR = os.getenv("MODEL_DIR", "./")
@@ -28,3 +81,81 @@ MODEL_DIR = os.getenv("MODEL_DIR", "./")
 MODEL_PATH = os.getenv("MODEL_PATH", "modelo_cart.joblib")
 # Nombre del archivo del codificador de etiquetas
 ENCODER_PATH = os.getenv("ENCODER_PATH", "encoder_etiquetas.joblib")
+# Manifiesto que apunta a la versión activa (modelo + codificador). Se reescribe
+# de forma atómica al final de cada reentrenamiento.
+MODEL_MANIFEST = os.getenv("MODEL_MANIFEST", "modelo_activo.json")
+# Cada cuántos segundos se revisa si cambiaron los artefactos activos (0 = desactivado)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "5"))
+# Modo compartido: cargar el árbol compilado desde el archivo de arreglos de la
+# versión (manifiesto "arrays") mapeado en memoria, sin cargar sklearn. Varios
+# workers que sirven la misma versión comparten esas páginas del page cache.
+MODEL_MMAP = os.getenv("MODEL_MMAP", "0").lower() in ("1", "true", "yes")
+# Arranque liviano: cargar sólo el artefacto compacto de la versión (manifiesto
+# "compact", ver modelo_compacto.py) sin joblib ni sklearn, y dejar la carga de
+# SQLAlchemy y de los datos de BD para después de que la API quede lista.
+# Tiene prioridad sobre MODEL_MMAP.
+INFERENCE_SLIM = os.getenv("INFERENCE_SLIM", "0").lower() in ("1", "true", "yes")
+
+# --- INFERENCIA ---
+# Máximo de filas aceptadas por /api/v1/recommendations/batch
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "10000"))
+# Caché de resultados por (versión del modelo, valores de entrada): entradas
+# como máximo (0 = desactivada) y vigencia en segundos. Se vacía al recargar el modelo
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "50000"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+# Cada cuántos segundos la API revisa si hay recomendaciones diarias nuevas
+# (recomendaciones_diarias.py; 0 = sólo al iniciar)
+RECOMMENDATIONS_REFRESH_INTERVAL = float(os.getenv("RECOMMENDATIONS_REFRESH_INTERVAL", "60"))
+# Índice en memoria de features_parroquia_daily (features_index.py): días
+# cargados hasta la última fecha y cada cuántos segundos se revisa si cambió
+FEATURES_INDEX_DAYS = int(os.getenv("FEATURES_INDEX_DAYS", "7"))
+FEATURES_INDEX_REFRESH_INTERVAL = float(os.getenv("FEATURES_INDEX_REFRESH_INTERVAL", "60"))
+# Drift en línea sobre el tráfico de predicción (drift_online.py): observaciones
+# en espera como máximo, cada cuántos segundos se procesan, duración de cada
+# ventana, ventanas cerradas que se conservan y tamaño de la muestra de reservorio
+DRIFT_ONLINE_ENABLED = os.getenv("DRIFT_ONLINE_ENABLED", "1").lower() in ("1", "true", "yes")
+DRIFT_ONLINE_BUFFER = int(os.getenv("DRIFT_ONLINE_BUFFER", "100000"))
+DRIFT_ONLINE_INTERVAL = float(os.getenv("DRIFT_ONLINE_INTERVAL", "5"))
+DRIFT_ONLINE_WINDOW = float(os.getenv("DRIFT_ONLINE_WINDOW", "3600"))
+DRIFT_ONLINE_WINDOWS = int(os.getenv("DRIFT_ONLINE_WINDOWS", "24"))
+DRIFT_RESERVOIR_SIZE = int(os.getenv("DRIFT_RESERVOIR_SIZE", "1000"))
+# Modo asíncrono de la API: JWT y predicción individual en el event loop, lotes
+# en un ejecutor propio de CPU_WORKERS hilos (0 = uno por núcleo) con hasta
+# CPU_QUEUE_MAX tareas en espera (más allá responde 503), y consultas de
+# métricas con el engine async de SQLAlchemy (aiomysql / aiosqlite).
+# Con AUDIT_BLOCK_TIMEOUT > 0 una cola de auditoría llena frenaría el loop.
+API_ASYNC = os.getenv("API_ASYNC", "0").lower() in ("1", "true", "yes")
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", "0"))
+CPU_QUEUE_MAX = int(os.getenv("CPU_QUEUE_MAX", "256"))
+
+# --- REENTRENAMIENTO ---
+# Tiempo máximo de un reentrenamiento antes de abortarlo (segundos)
+RETRAIN_TIMEOUT = int(os.getenv("RETRAIN_TIMEOUT", "3600"))
+# Incremento de "nice" del proceso de entrenamiento (menor prioridad de CPU)
+RETRAIN_NICE = int(os.getenv("RETRAIN_NICE", "10"))
+# Tope de memoria virtual del proceso de entrenamiento en MB (0 = sin tope)
+RETRAIN_MEMORY_LIMIT_MB = int(os.getenv("RETRAIN_MEMORY_LIMIT_MB", "4096"))
+# Trabajos de reentrenamiento recordados para consulta de estado
+RETRAIN_JOBS_HISTORY = int(os.getenv("RETRAIN_JOBS_HISTORY", "50"))
+# Búsqueda de hiperparámetros (busqueda_hiperparametros.py): valores de
+# max_depth ('none' = sin límite) y min_samples_leaf separados por coma,
+# cantidad de valores de ccp_alpha tomados del camino de poda, pliegues de CV,
+# factor de descarte por ronda, presupuesto en segundos, procesos (0 = todos
+# los núcleos) y semilla
+SEARCH_MAX_DEPTHS = os.getenv("SEARCH_MAX_DEPTHS", "4,6,8,10,none")
+SEARCH_MIN_SAMPLES_LEAF = os.getenv("SEARCH_MIN_SAMPLES_LEAF", "1,5,20,50")
+SEARCH_CCP_ALPHAS = int(os.getenv("SEARCH_CCP_ALPHAS", "4"))
+SEARCH_FOLDS = int(os.getenv("SEARCH_FOLDS", "5"))
+SEARCH_HALVING = int(os.getenv("SEARCH_HALVING", "3"))
+SEARCH_TIME_BUDGET = float(os.getenv("SEARCH_TIME_BUDGET", "900"))
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "0"))
+SEARCH_SEED = int(os.getenv("SEARCH_SEED", "42"))
+
+# --- MÉTRICAS ---
+# Vigencia máxima (segundos) de las respuestas cacheadas de /api/v1/metrics*
+METRICS_CACHE_TTL = float(os.getenv("METRICS_CACHE_TTL", "300"))
+# Tamaño máximo de página de /api/v1/metrics/history
+METRICS_HISTORY_MAX_LIMIT = int(os.getenv("METRICS_HISTORY_MAX_LIMIT", "500"))
+# Métricas del servicio en formato Prometheus (instrumentation.py), sin autenticación
+METRICS_PROM_ENABLED = os.getenv("METRICS_PROM_ENABLED", "1").lower() in ("1", "true", "yes")
+METRICS_PROM_PATH = os.getenv("METRICS_PROM_PATH", "/metrics-prom")
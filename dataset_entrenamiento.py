@@ -1,31 +1,124 @@
 # V1.0
 
 # dataset_entrenamiento.py
+"""
+Carga de la tabla dataset_entrenamiento (materializada desde la vista
+dataset_entrenamiento_v, ver dataset_materializado.py) para entrenamiento
+y drift.
+
+Se piden sólo las columnas necesarias y se leen en bloques con cursor del
+lado del servidor; cada bloque se convierte a tipos compactos (float32 para
+las features, enteros reducidos para ids y etiqueta categórica) antes de
+juntarlos, así el pico de memoria no lo marca el DataFrame por defecto de
+pandas (float64 / object).
+"""
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
+from pandas.api.types import union_categoricals
+from sqlalchemy import text
+
+from config import DATASET_CHUNK_SIZE
+from db import get_engine
+
+# Features del modelo con los nombres de la vista (mismo orden que model_loader.FEATURES)
+FEATURES = [
+    'consumo_7d', 'consumo_30d', 'promedio_12m',
+    'dias_desde_ultima_entrega', 'stock_actual',
+    'stock_minimo', 'entregas_pendientes',
+    'proyeccion_72h', 'indicador_riesgo'
+]
+TARGET = 'etiqueta'
+COLUMNAS = ['parroquia', 'fecha'] + FEATURES + [TARGET]
+
+
+def _compactar(chunk):
+    """Convierte un bloque leído por pandas a tipos compactos (en sitio)."""
+    for col in chunk.columns:
+        if col in FEATURES:
+            # sklearn convierte X a float32 internamente: no se pierde precisión
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce').astype(np.float32)
+        elif col == 'parroquia':
+            chunk[col] = pd.to_numeric(chunk[col], downcast='integer')
+        elif col == 'fecha':
+            chunk[col] = pd.to_datetime(chunk[col])
+        elif col == TARGET:
+            # Códigos int8 en lugar de un string por fila
+            chunk[col] = chunk[col].astype('category')
+    return chunk
+
 
-from config import DB_URI
+def _leer_bloques(columnas, desde=None, hasta=None, chunksize=DATASET_CHUNK_SIZE):
+    desconocidas = set(columnas) - set(COLUMNAS)
+    if desconocidas:
+        raise ValueError(f"Columnas desconocidas en dataset_entrenamiento: {sorted(desconocidas)}")
+    query = f"SELECT {', '.join(columnas)} FROM dataset_entrenamiento WHERE 1 = 1"
+    params = {}
+    if desde is not None:
+        query += " AND fecha >= :desde"
+        params["desde"] = desde
+    if hasta is not None:
+        query += " AND fecha <= :hasta"
+        params["hasta"] = hasta
+
+    engine = get_engine()
+    # stream_results: el driver entrega filas a medida que se leen (SSCursor en MySQL)
+    with engine.connect().execution_options(stream_results=True, max_row_buffer=chunksize) as conn:
+        for chunk in pd.read_sql(text(query), conn, params=params, chunksize=chunksize):
+            yield _compactar(chunk)
+
+
+def cargar_dataset(columnas=None, desde=None, hasta=None, chunksize=DATASET_CHUNK_SIZE):
+    """
+    DataFrame compacto con `columnas` (todas por defecto) de dataset_entrenamiento,
+    opcionalmente filtrado por rango de fecha.
+    """
+    columnas = list(columnas or COLUMNAS)
+    bloques = list(_leer_bloques(columnas, desde, hasta, chunksize))
+    if not bloques:
+        return _compactar(pd.DataFrame({c: pd.Series(dtype=object) for c in columnas}))
+    # Cada bloque trae sus propias categorías: unirlas sin pasar por object
+    etiquetas = None
+    if TARGET in columnas:
+        etiquetas = union_categoricals([b.pop(TARGET) for b in bloques], sort_categories=True)
+    df = pd.concat(bloques, ignore_index=True, copy=False)
+    del bloques
+    if etiquetas is not None:
+        df[TARGET] = etiquetas
+    return df if list(df.columns) == columnas else df[columnas]
+
+
+def cargar_xy(desde=None, hasta=None, chunksize=DATASET_CHUNK_SIZE):
+    """
+    Matriz de features float32 (filas x FEATURES, contigua) y etiquetas como
+    pd.Categorical, sin pasar por un DataFrame completo intermedio.
+    """
+    xs, ys = [], []
+    for chunk in _leer_bloques(FEATURES + [TARGET], desde, hasta, chunksize):
+        xs.append(np.ascontiguousarray(chunk[FEATURES].to_numpy(dtype=np.float32)))
+        ys.append(chunk[TARGET])
+        del chunk
+    if not xs:
+        return np.empty((0, len(FEATURES)), dtype=np.float32), pd.Categorical([])
+    X = np.concatenate(xs) if len(xs) > 1 else xs[0]
+    del xs
+    y = union_categoricals(ys, sort_categories=True)
+    return X, y
 
-def cargar_dataset():
-    engine = create_engine(DB_URI)
-    query = "SELECT * FROM dataset_entrenamiento"
-    df = pd.read_sql(query, engine)
-    return df
 
 if __name__ == "__main__":
-    df = cargar_dataset()
-    print(df.head())
+    # Copia local columnar (reemplaza al antiguo dataset_entrenamiento.csv):
+    # se traen de la BD las fechas nuevas y las modificadas desde la última vez
+    from snapshot_store import SnapshotStore
+
+    store = SnapshotStore()
+    nuevas = store.actualizar()
+    print(f"Fechas escritas en el snapshot: {len(nuevas)}")
+    if nuevas:
+        print(f"  {nuevas[0]} → {nuevas[-1]}")
 
     # Conteo de clases
-    print("\nDistribución de etiquetas:")
-    print(df['etiqueta'].value_counts())
-
-    # Limpieza básica (opcional)
-    df = df.dropna(subset=[
-        'consumo_7d','consumo_30d','promedio_12m',
-        'stock_actual','stock_minimo'
-    ])
-
-    # Guardar CSV para entrenamiento
-    df.to_csv("dataset_entrenamiento.csv", index=False)
-    print("✅ Dataset exportado a dataset_entrenamiento.csv")
+    y = store.cargar_xy()[1]
+    print(f"\nFilas en el snapshot: {len(y)}")
+    print("Distribución de etiquetas:")
+    print(pd.Series(y).value_counts())
+    print(f"✅ Snapshot actualizado en {store.root}")
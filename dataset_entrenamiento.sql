@@ -1,7 +1,10 @@
--- V1.0
+-- V2.0
 
 -- dataset_entrenamiento.sql
-CREATE OR REPLACE VIEW dataset_entrenamiento AS
+-- La vista queda como definición de referencia (dataset_entrenamiento_v)
+-- y los datos de entrenamiento se leen de la tabla materializada
+-- dataset_entrenamiento, que refresca dataset_materializado.py tras el ETL.
+CREATE OR REPLACE VIEW dataset_entrenamiento_v AS
 SELECT 
      f.parroquia_id AS parroquia,
      f.fecha,
@@ -33,3 +36,44 @@ SELECT
     END AS etiqueta
 
 FROM features_parroquia_daily f;
+
+-- Los EXISTS de la etiqueta buscan periodos por parroquia y fecha
+CREATE INDEX idx_periodo_parroquia_inicio ON periodo (parroquia_id, fecha_inicio);
+CREATE INDEX idx_periodo_parroquia_final ON periodo (parroquia_id, fecha_final);
+
+-- Marca de agua del refresco incremental (filas de features modificadas)
+CREATE INDEX idx_features_updated_at ON features_parroquia_daily (updated_at);
+
+-- La vista V1.0 tenía este nombre
+DROP VIEW IF EXISTS dataset_entrenamiento;
+
+CREATE TABLE IF NOT EXISTS dataset_entrenamiento (
+    parroquia INT NOT NULL,
+    fecha DATE NOT NULL,
+
+    consumo_7d DECIMAL(10,2) DEFAULT NULL,
+    consumo_30d DECIMAL(10,2) DEFAULT NULL,
+    promedio_12m DECIMAL(10,2) DEFAULT NULL,
+
+    dias_desde_ultima_entrega INT DEFAULT NULL,
+    stock_actual DECIMAL(10,2) DEFAULT NULL,
+    stock_minimo DECIMAL(10,2) DEFAULT NULL,
+    entregas_pendientes INT DEFAULT NULL,
+
+    proyeccion_72h DECIMAL(10,2) DEFAULT NULL,
+    indicador_riesgo DECIMAL(5,2) DEFAULT NULL,
+
+    etiqueta VARCHAR(10) NOT NULL,
+
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    -- Lectura por rango de fecha = recorrido del índice primario
+    PRIMARY KEY (fecha, parroquia),
+    INDEX idx_dataset_parroquia_fecha (parroquia, fecha)
+);
+
+-- Marcas de agua de procesos incrementales
+CREATE TABLE IF NOT EXISTS etl_marcas (
+    nombre VARCHAR(50) PRIMARY KEY,
+    valor DATETIME NOT NULL
+);
@@ -0,0 +1,146 @@
+# dataset_materializado.py
+"""
+Refresco de la tabla dataset_entrenamiento a partir de la vista de
+referencia dataset_entrenamiento_v.
+
+La etiqueta (con sus EXISTS contra periodo) se calcula una vez por fila al
+refrescar, no en cada lectura. Se recalculan sólo:
+  - las fechas con filas de features_parroquia_daily modificadas desde la
+    última marca de agua (updated_at), y
+  - los últimos DATASET_REFRESH_DAYS días, porque un periodo nuevo puede
+    cambiar la etiqueta sin tocar features_parroquia_daily.
+
+Uso:
+    python dataset_materializado.py               # refresco incremental
+    python dataset_materializado.py --completo    # reconstruye toda la tabla
+    python dataset_materializado.py --verificar   # compara tabla y vista
+"""
+from datetime import date, timedelta
+import argparse
+import logging
+import time
+
+from sqlalchemy import text, bindparam
+
+from config import DATASET_REFRESH_DAYS
+from db import get_engine
+
+MARCA = "dataset_entrenamiento"
+COLUMNAS = [
+    "parroquia", "fecha",
+    "consumo_7d", "consumo_30d", "promedio_12m",
+    "dias_desde_ultima_entrega", "stock_actual",
+    "stock_minimo", "entregas_pendientes",
+    "proyeccion_72h", "indicador_riesgo",
+    "etiqueta",
+]
+_COLS = ", ".join(COLUMNAS)
+
+SQL_LEER_MARCA = text("SELECT valor FROM etl_marcas WHERE nombre = :nombre")
+SQL_GUARDAR_MARCA = text("""
+    INSERT INTO etl_marcas (nombre, valor) VALUES (:nombre, :valor)
+    ON DUPLICATE KEY UPDATE valor = VALUES(valor)
+""")
+SQL_MAX_UPDATED = text("SELECT MAX(updated_at) FROM features_parroquia_daily")
+SQL_FECHAS_MODIFICADAS = text("""
+    SELECT DISTINCT fecha FROM features_parroquia_daily WHERE updated_at >= :marca
+""")
+SQL_BORRAR_FECHAS = text(
+    "DELETE FROM dataset_entrenamiento WHERE fecha IN :fechas"
+).bindparams(bindparam("fechas", expanding=True))
+SQL_INSERTAR_FECHAS = text(f"""
+    INSERT INTO dataset_entrenamiento ({_COLS})
+    SELECT {_COLS} FROM dataset_entrenamiento_v WHERE fecha IN :fechas
+""").bindparams(bindparam("fechas", expanding=True))
+
+# Filas distintas entre tabla y vista (<=> compara NULL con NULL)
+_DISTINTAS = " OR ".join(f"NOT (t.{c} <=> v.{c})" for c in COLUMNAS[2:])
+SQL_VERIFICAR = text(f"""
+    SELECT 'vista' AS lado, v.fecha, COUNT(*) AS filas
+    FROM dataset_entrenamiento_v v
+    LEFT JOIN dataset_entrenamiento t ON t.fecha = v.fecha AND t.parroquia = v.parroquia
+    WHERE v.fecha >= :desde AND (t.parroquia IS NULL OR {_DISTINTAS})
+    GROUP BY v.fecha
+    UNION ALL
+    SELECT 'tabla' AS lado, t.fecha, COUNT(*) AS filas
+    FROM dataset_entrenamiento t
+    LEFT JOIN dataset_entrenamiento_v v ON v.fecha = t.fecha AND v.parroquia = t.parroquia
+    WHERE t.fecha >= :desde AND v.parroquia IS NULL
+    GROUP BY t.fecha
+""")
+
+# Fechas por sentencia al refrescar (acota el tamaño de cada transacción)
+LOTE_FECHAS = 31
+
+
+def _refrescar_fechas(engine, fechas):
+    filas = 0
+    for i in range(0, len(fechas), LOTE_FECHAS):
+        lote = fechas[i:i + LOTE_FECHAS]
+        with engine.begin() as conn:
+            conn.execute(SQL_BORRAR_FECHAS, {"fechas": lote})
+            filas += conn.execute(SQL_INSERTAR_FECHAS, {"fechas": lote}).rowcount
+    return filas
+
+
+def refrescar_dataset(completo=False, dias_recientes=DATASET_REFRESH_DAYS):
+    """
+    Recalcula en dataset_entrenamiento las fechas nuevas o modificadas.
+    Devuelve {"fechas": n, "filas": n, "duracion_s": s}.
+    """
+    engine = get_engine()
+    t0 = time.perf_counter()
+    with engine.connect() as conn:
+        # La marca nueva se toma antes de buscar fechas: lo que se modifique
+        # durante el refresco queda para la próxima corrida
+        nueva_marca = conn.execute(SQL_MAX_UPDATED).scalar()
+        marca = None if completo else conn.execute(SQL_LEER_MARCA, {"nombre": MARCA}).scalar()
+        if marca is None:
+            fechas = {r[0] for r in conn.execute(text("SELECT DISTINCT fecha FROM features_parroquia_daily"))}
+            # Fechas que ya no existen en features
+            fechas |= {r[0] for r in conn.execute(text("SELECT DISTINCT fecha FROM dataset_entrenamiento"))}
+        else:
+            fechas = {r[0] for r in conn.execute(SQL_FECHAS_MODIFICADAS, {"marca": marca})}
+            hoy = date.today()
+            fechas |= {hoy - timedelta(days=i) for i in range(dias_recientes)}
+
+    filas = _refrescar_fechas(engine, sorted(fechas))
+    if nueva_marca is not None:
+        with engine.begin() as conn:
+            conn.execute(SQL_GUARDAR_MARCA, {"nombre": MARCA, "valor": nueva_marca})
+
+    resumen = {"fechas": len(fechas), "filas": filas, "duracion_s": round(time.perf_counter() - t0, 3)}
+    logging.info(f"dataset_entrenamiento refrescado: {resumen}")
+    return resumen
+
+
+def verificar_dataset(desde=None):
+    """
+    Compara la tabla con la vista desde `desde` (toda la historia por defecto).
+    Devuelve {"ok": bool, "vista": {fecha: filas faltantes o distintas},
+    "tabla": {fecha: filas sobrantes}}.
+    """
+    with get_engine().connect() as conn:
+        filas = conn.execute(SQL_VERIFICAR, {"desde": desde or date.min}).fetchall()
+    resultado = {"vista": {}, "tabla": {}}
+    for lado, fecha, n in filas:
+        resultado[lado][str(fecha)] = n
+    resultado["ok"] = not resultado["vista"] and not resultado["tabla"]
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresco de la tabla dataset_entrenamiento")
+    parser.add_argument("--completo", action="store_true", help="Recalcular todas las fechas")
+    parser.add_argument("--verificar", action="store_true", help="Sólo comparar tabla y vista")
+    parser.add_argument("--desde", type=date.fromisoformat, help="Fecha inicial de la verificación")
+    args = parser.parse_args()
+    if args.verificar:
+        res = verificar_dataset(args.desde)
+        if res["ok"]:
+            print("✅ dataset_entrenamiento coincide con la vista")
+        else:
+            print(f"❌ Diferencias: faltantes/distintas {res['vista']}, sobrantes {res['tabla']}")
+    else:
+        res = refrescar_dataset(args.completo)
+        print(f"✅ dataset_entrenamiento refrescado: {res['filas']} filas en {res['fechas']} fechas")
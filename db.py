@@ -0,0 +1,155 @@
+# db.py
+"""
+Engine SQLAlchemy compartido por todo el proceso.
+
+Se crea una sola vez (la primera vez que se pide) con un pool configurable
+desde variables de entorno, así la API, el reentrenamiento, el monitor de
+drift y el ETL reutilizan conexiones en lugar de abrir una nueva por llamada.
+"""
+import atexit
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from config import (DB_URI, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+                    DB_POOL_RECYCLE, DB_POOL_PRE_PING)
+
+_engine = None
+# Engine asíncrono (modo API_ASYNC), con el mismo pool configurado
+_async_engine = None
+_lock = threading.Lock()
+
+# Contadores del pool (se actualizan desde los eventos de SQLAlchemy)
+_stats = {
+    "connects": 0,         # conexiones físicas abiertas
+    "checkouts": 0,        # préstamos de conexión desde el pool
+    "checkins": 0,
+    "wait_total_s": 0.0,   # tiempo acumulado obteniendo una conexión (espera + connect)
+    "wait_max_s": 0.0,
+}
+_stats_lock = threading.Lock()
+
+
+class _TimedPoolMixin:
+    """
+    Mide cuánto tarda cada préstamo de conexión (Pool.connect, API pública).
+    Incluye la espera por una conexión libre y, cuando el pool tiene que
+    abrir una nueva o hacer el pre-ping, el tiempo de conexión a la BD: con
+    el pool saturado domina la espera; con el pool frío, el connect.
+    """
+
+    def connect(self):
+        t0 = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            waited = time.perf_counter() - t0
+            with _stats_lock:
+                _stats["wait_total_s"] += waited
+                if waited > _stats["wait_max_s"]:
+                    _stats["wait_max_s"] = waited
+
+
+class _TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class _TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _count(key):
+    def listener(*args):
+        with _stats_lock:
+            _stats[key] += 1
+    return listener
+
+
+def get_engine():
+    """Devuelve el engine del proceso, creándolo la primera vez."""
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                kwargs = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+                if not DB_URI.startswith("sqlite"):
+                    kwargs.update(poolclass=_TimedQueuePool, pool_size=DB_POOL_SIZE,
+                                  max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+                engine = create_engine(DB_URI, **kwargs)
+                event.listen(engine, "connect", _count("connects"))
+                event.listen(engine, "checkout", _count("checkouts"))
+                event.listen(engine, "checkin", _count("checkins"))
+                _engine = engine
+    return _engine
+
+
+def _async_uri(uri):
+    """La misma URI con el driver asíncrono (pymysql -> aiomysql, sqlite -> aiosqlite)."""
+    for sync, asincrono in (("mysql+pymysql://", "mysql+aiomysql://"), ("sqlite://", "sqlite+aiosqlite://")):
+        if uri.startswith(sync):
+            return asincrono + uri[len(sync):]
+    return uri
+
+
+def get_async_engine():
+    """Engine asíncrono del proceso, creado la primera vez (necesita aiomysql/aiosqlite)."""
+    global _async_engine
+    if _async_engine is None:
+        with _lock:
+            if _async_engine is None:
+                from sqlalchemy.ext.asyncio import create_async_engine
+                kwargs = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+                if not DB_URI.startswith("sqlite"):
+                    kwargs.update(poolclass=_TimedAsyncQueuePool, pool_size=DB_POOL_SIZE,
+                                  max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+                engine = create_async_engine(_async_uri(DB_URI), **kwargs)
+                # Los eventos de pool se registran en el engine sincrónico subyacente
+                event.listen(engine.sync_engine, "connect", _count("connects"))
+                event.listen(engine.sync_engine, "checkout", _count("checkouts"))
+                event.listen(engine.sync_engine, "checkin", _count("checkins"))
+                _async_engine = engine
+    return _async_engine
+
+
+async def dispose_async_engine():
+    global _async_engine
+    engine, _async_engine = _async_engine, None
+    if engine is not None:
+        await engine.dispose()
+
+
+def dispose_engine():
+    """Cierra las conexiones del pool (al apagar el servidor o terminar un script)."""
+    global _engine
+    with _lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+
+def pool_stats():
+    """Estado actual del pool y contadores acumulados."""
+    with _stats_lock:
+        stats = dict(_stats)
+    engine = _engine
+    if engine is not None and isinstance(engine.pool, QueuePool):
+        stats.update(_pool_state(engine.pool))
+    async_engine = _async_engine
+    if async_engine is not None and isinstance(async_engine.pool, QueuePool):
+        stats["async"] = _pool_state(async_engine.pool)
+    stats["wait_avg_s"] = stats["wait_total_s"] / stats["checkouts"] if stats["checkouts"] else 0.0
+    return stats
+
+
+def _pool_state(pool):
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+
+
+atexit.register(dispose_engine)
@@ -0,0 +1,208 @@
+# drift_online.py
+"""
+Monitor de drift sobre el tráfico de /api/v1/recommendations.
+
+El request sólo agrega (features, predicción) a un deque acotado: un
+append atómico, sin locks ni cálculo. Un hilo de fondo vacía el deque cada
+DRIFT_ONLINE_INTERVAL segundos y actualiza la ventana en curso:
+  - histograma por feature con los bordes del perfil de entrenamiento de la
+    versión activa (ver drift_stats.perfil_entrenamiento)
+  - conteo de etiquetas predichas
+  - muestra de reservorio de vectores de entrada (DRIFT_RESERVOIR_SIZE)
+Cada DRIFT_ONLINE_WINDOW segundos la ventana se cierra y se guarda su
+resumen; se conservan las últimas DRIFT_ONLINE_WINDOWS.
+"""
+from collections import deque
+import logging
+import random
+import threading
+import time
+
+import numpy as np
+
+from config import (DRIFT_ONLINE_BUFFER, DRIFT_ONLINE_INTERVAL, DRIFT_ONLINE_WINDOW,
+                    DRIFT_ONLINE_WINDOWS, DRIFT_RESERVOIR_SIZE, DRIFT_PSI_ALERT)
+from drift_stats import histograma, psi, ks_aprox
+
+
+class _Ventana:
+    """Acumuladores de una ventana de tiempo (sólo los toca el hilo consumidor)."""
+
+    def __init__(self, profile, inicio, reservorio, semilla=None):
+        self.inicio = inicio
+        self.n = 0
+        self.bordes = [np.asarray(b, dtype=np.float64) for b in profile["bordes"]]
+        self.conteos = [np.zeros(len(b) + 2, dtype=np.int64) for b in profile["bordes"]]
+        self.clases = {}
+        self.reservorio = []
+        self.capacidad = reservorio
+        self._rng = random.Random(semilla)
+
+    def agregar(self, X, etiquetas):
+        for j, bordes in enumerate(self.bordes):
+            self.conteos[j] += histograma(X[:, j], bordes)
+        for etiqueta in etiquetas:
+            self.clases[etiqueta] = self.clases.get(etiqueta, 0) + 1
+        # Reservorio (algoritmo R): cada fila vista tiene la misma probabilidad de quedar
+        for fila in X:
+            self.n += 1
+            if len(self.reservorio) < self.capacidad:
+                self.reservorio.append(fila)
+            else:
+                k = self._rng.randrange(self.n)
+                if k < self.capacidad:
+                    self.reservorio[k] = fila
+
+
+class OnlineDriftMonitor:
+    def __init__(self, features, buffer=DRIFT_ONLINE_BUFFER, interval=DRIFT_ONLINE_INTERVAL,
+                 window=DRIFT_ONLINE_WINDOW, windows=DRIFT_ONLINE_WINDOWS,
+                 reservoir=DRIFT_RESERVOIR_SIZE):
+        self.features = list(features)
+        self.interval = interval
+        self.window = window
+        self.reservoir = reservoir
+        self._buffer = deque(maxlen=buffer)
+        # Observaciones que el deque descartó por estar lleno; el lock sólo se
+        # toma en ese caso, el append normal sigue sin locks
+        self.perdidas = 0
+        self._perdidas_lock = threading.Lock()
+        self._lock = threading.Lock()      # protege ventana/historial frente a report()
+        self._profile = None
+        self._version = None
+        self._actual = None
+        self._cerradas = deque(maxlen=windows)
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Camino del request ---
+    def observe(self, features: dict, prediction):
+        buffer = self._buffer
+        if len(buffer) >= buffer.maxlen:
+            self._contar_perdidas(1)
+        buffer.append((features, prediction))
+
+    def observe_many(self, rows, predictions):
+        buffer = self._buffer
+        items = list(zip(rows, predictions))
+        sobran = len(buffer) + len(items) - buffer.maxlen
+        if sobran > 0:
+            self._contar_perdidas(min(sobran, len(items)))
+        buffer.extend(items)
+
+    def _contar_perdidas(self, n):
+        # Aproximado si el consumidor vacía el deque entre la medición y el
+        # append, pero nunca negativo
+        with self._perdidas_lock:
+            self.perdidas += n
+
+    # --- Versión del modelo ---
+    def set_profile(self, profile, version):
+        """Cambia la referencia (al recargar el modelo); la ventana en curso se reinicia."""
+        with self._lock:
+            if self._actual is not None and self._actual.n:
+                self._cerradas.append(self._resumen(self._actual))
+            self._profile = profile
+            self._version = version
+            self._actual = self._nueva_ventana() if profile else None
+
+    def _nueva_ventana(self):
+        return _Ventana(self._profile, time.time(), self.reservoir)
+
+    # --- Hilo consumidor ---
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="drift-online", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.procesar()
+            except Exception as e:
+                logging.error(f"Error en monitor de drift en línea: {e}")
+
+    def _drenar(self):
+        items = []
+        popleft = self._buffer.popleft
+        while True:
+            try:
+                items.append(popleft())
+            except IndexError:
+                return items
+
+    def procesar(self):
+        """Vacía el buffer en la ventana en curso (lo llama el hilo de fondo)."""
+        items = self._drenar()
+        with self._lock:
+            if self._actual is None:
+                return
+            if items:
+                X = np.array([[row.get(f, np.nan) for f in self.features] for row, _ in items],
+                             dtype=np.float64)
+                self._actual.agregar(X, [pred for _, pred in items])
+            if time.time() - self._actual.inicio >= self.window:
+                self._cerradas.append(self._resumen(self._actual))
+                self._actual = self._nueva_ventana()
+
+    # --- Reporte ---
+    def _resumen(self, ventana):
+        profile = self._profile
+        features = {}
+        for j, nombre in enumerate(self.features):
+            ref = np.asarray(profile["conteos"][j])
+            act = ventana.conteos[j]
+            features[nombre] = ({"psi": round(float(psi(ref, act)), 4), "ks": round(float(ks_aprox(ref, act)), 4)}
+                                if act.sum() else None)
+        clases_ref = profile.get("clases", {})
+        nombres = sorted(set(clases_ref) | set(ventana.clases))
+        ref = np.array([clases_ref.get(c, 0) for c in nombres], dtype=np.float64)
+        act = np.array([ventana.clases.get(c, 0) for c in nombres], dtype=np.float64)
+        total_ref, total_act = ref.sum(), act.sum()
+        clases = {
+            "esperadas": {c: round(float(v / total_ref), 4) for c, v in zip(nombres, ref)} if total_ref else {},
+            "observadas": {c: round(float(v / total_act), 4) for c, v in zip(nombres, act)} if total_act else {},
+            "psi": round(float(psi(ref, act)), 4) if total_ref and total_act else None,
+        }
+        psis = [m["psi"] for m in features.values() if m]
+        return {
+            "model_version": self._version,
+            "inicio": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(ventana.inicio)),
+            "observaciones": ventana.n,
+            "features": features,
+            "clases": clases,
+            "psi_max": max(psis) if psis else None,
+            "alerta": any(p > DRIFT_PSI_ALERT for p in psis),
+        }
+
+    def report(self):
+        with self._lock:
+            if self._actual is None:
+                return {"status": "sin_perfil", "model_version": self._version,
+                        "message": "La versión activa no trae perfil de entrenamiento"}
+            actual = self._resumen(self._actual)
+            reservorio = list(self._actual.reservorio)
+            cerradas = [{k: v[k] for k in ("model_version", "inicio", "observaciones", "psi_max", "alerta")}
+                        for v in self._cerradas]
+        if reservorio:
+            muestra = np.array(reservorio)
+            actual["muestra"] = {
+                "filas": len(reservorio),
+                "p50": dict(zip(self.features, np.round(np.nanpercentile(muestra, 50, axis=0), 3).tolist())),
+                "p90": dict(zip(self.features, np.round(np.nanpercentile(muestra, 90, axis=0), 3).tolist())),
+            }
+        return {
+            "status": "ok",
+            "ventana_actual": actual,
+            "ventanas_anteriores": cerradas,
+            "pendientes": len(self._buffer),
+            "perdidas": self.perdidas,
+        }
@@ -0,0 +1,239 @@
+# drift_sketch.py
+"""
+Drift por feature a partir de histogramas diarios de tamaño fijo.
+
+Para cada feature se fijan una vez los bordes de DRIFT_BINS intervalos
+(cuantiles de los datos disponibles al crearlos, tabla drift_bordes). Cada
+día del dataset se resume en un histograma con esos bordes más un contador
+de nulos (drift_histograma_diario). La comparación de una ventana reciente
+contra la ventana base se hace sumando histogramas: PSI y una aproximación
+de KS (máxima diferencia entre las CDF en los bordes) salen de los conteos,
+sin releer filas. El resultado por día y feature queda en drift_serie.
+
+Una feature sin datos suficientes para sus bordes (menos de MIN_BORDES
+cuantiles distintos, p.ej. toda nula) no se guarda ni se monitorea: se
+reintenta en la próxima corrida y, cuando consigue bordes, se recalculan
+los histogramas de todas las fechas. completo=True recalcula los bordes.
+
+Se ejecuta tras el refresco de dataset_entrenamiento (ver
+etl_features_parroquia_daily.py) y desde monitor_drift.py.
+"""
+from datetime import date, datetime, timedelta
+import json
+import logging
+
+import numpy as np
+from sqlalchemy import text, bindparam
+
+from config import DRIFT_RECENT_DAYS, DRIFT_BASELINE_DAYS
+from dataset_entrenamiento import FEATURES, cargar_dataset
+from db import get_engine
+from drift_stats import bordes_por_cuantiles, histograma, psi, ks_aprox
+
+MARCA = "drift_histogramas"
+# Con menos bordes el histograma queda en un solo intervalo (más nulos) y el PSI en ~0
+MIN_BORDES = 2
+
+
+# --- SQL ---
+SQL_BORDES = text("SELECT feature, bordes FROM drift_bordes")
+SQL_BORRAR_BORDES = text("DELETE FROM drift_bordes")
+SQL_GUARDAR_BORDES = text("""
+    INSERT INTO drift_bordes (feature, bordes, creado) VALUES (:feature, :bordes, :creado)
+""")
+SQL_FECHAS_CAMBIADAS = text("""
+    SELECT DISTINCT fecha FROM dataset_entrenamiento WHERE updated_at >= :marca
+""")
+SQL_MAX_UPDATED = text("SELECT MAX(updated_at) FROM dataset_entrenamiento")
+SQL_BORRAR_HIST = text(
+    "DELETE FROM drift_histograma_diario WHERE fecha IN :fechas"
+).bindparams(bindparam("fechas", expanding=True))
+SQL_INSERTAR_HIST = text("""
+    INSERT INTO drift_histograma_diario (fecha, feature, conteos, total)
+    VALUES (:fecha, :feature, :conteos, :total)
+""")
+SQL_LEER_HIST = text("""
+    SELECT fecha, feature, conteos FROM drift_histograma_diario
+    WHERE fecha BETWEEN :desde AND :hasta
+""")
+SQL_MAX_FECHA_HIST = text("SELECT MAX(fecha) FROM drift_histograma_diario")
+SQL_MAX_FECHA_SERIE = text("SELECT MAX(fecha) FROM drift_serie")
+SQL_BORRAR_SERIE = text(
+    "DELETE FROM drift_serie WHERE fecha BETWEEN :desde AND :hasta"
+)
+SQL_INSERTAR_SERIE = text("""
+    INSERT INTO drift_serie (fecha, feature, psi, ks, n_base, n_reciente)
+    VALUES (:fecha, :feature, :psi, :ks, :n_base, :n_reciente)
+""")
+SQL_LEER_MARCA = text("SELECT valor FROM etl_marcas WHERE nombre = :nombre")
+SQL_GUARDAR_MARCA = text("""
+    INSERT INTO etl_marcas (nombre, valor) VALUES (:nombre, :valor)
+    ON DUPLICATE KEY UPDATE valor = VALUES(valor)
+""")
+
+
+# --- Mantenimiento ---
+def _asegurar_bordes(conn, recalcular=False):
+    """
+    Bordes por feature; los que falten (todos con `recalcular`) se calculan
+    con los últimos DRIFT_BASELINE_DAYS días. Devuelve (bordes, nuevos): las
+    features sin bordes válidos no aparecen y `nuevos` indica si se guardó alguno.
+    """
+    if recalcular:
+        conn.execute(SQL_BORRAR_BORDES)
+    bordes = {f: json.loads(b) for f, b in conn.execute(SQL_BORDES)}
+    faltan = [f for f in FEATURES if f not in bordes]
+    nuevos = False
+    if faltan:
+        desde = date.today() - timedelta(days=DRIFT_BASELINE_DAYS)
+        df = cargar_dataset(faltan, desde=desde)
+        ahora = datetime.now()
+        for f in faltan:
+            calculados = bordes_por_cuantiles(df[f].to_numpy())
+            if len(calculados) < MIN_BORDES:
+                logging.warning(f"Drift: {f} sin datos suficientes para sus bordes, se reintenta en la próxima corrida")
+                continue
+            bordes[f] = calculados
+            conn.execute(SQL_GUARDAR_BORDES, {"feature": f, "bordes": json.dumps(calculados), "creado": ahora})
+            nuevos = True
+    return bordes, nuevos
+
+
+def _tramos(fechas):
+    """Agrupa fechas ordenadas en tramos de días consecutivos [(desde, hasta), ...]."""
+    tramos = []
+    for f in fechas:
+        if tramos and f - tramos[-1][1] == timedelta(days=1):
+            tramos[-1][1] = f
+        else:
+            tramos.append([f, f])
+    return tramos
+
+
+def _histogramas_de(fechas, bordes):
+    """Filas para drift_histograma_diario de las fechas dadas (una lectura por tramo)."""
+    filas = []
+    for desde, hasta in _tramos(fechas):
+        df = cargar_dataset(["fecha"] + FEATURES, desde=desde, hasta=hasta)
+        for fecha, grupo in df.groupby(df["fecha"].dt.date, sort=True):
+            for f in FEATURES:
+                if f not in bordes:
+                    continue
+                conteos = histograma(grupo[f].to_numpy(), bordes[f])
+                filas.append({"fecha": fecha, "feature": f, "conteos": json.dumps(conteos.tolist()),
+                              "total": int(conteos.sum())})
+    return filas
+
+
+def calcular_serie(historicos, fechas, recientes=DRIFT_RECENT_DAYS, base=DRIFT_BASELINE_DAYS):
+    """
+    Filas de drift_serie para `fechas`. `historicos` es {(fecha, feature): conteos}.
+    Ventana reciente: (d - recientes, d]; ventana base: los `base` días anteriores.
+    Las ventanas salen de sumas acumuladas por día: O(1) por punto de la serie.
+    """
+    if not fechas:
+        return []
+    inicio = min(fechas) - timedelta(days=recientes - 1 + base)
+    n = (max(fechas) - inicio).days + 1
+    filas = []
+    for f in FEATURES:
+        por_dia = [(fecha, c) for (fecha, feature), c in historicos.items()
+                   if feature == f and 0 <= (fecha - inicio).days < n]
+        if not por_dia:
+            continue
+        ancho = len(por_dia[0][1])
+        # acumulado[i] = suma de los días [inicio, inicio + i)
+        diario = np.zeros((n + 1, ancho), dtype=np.int64)
+        for fecha, conteos in por_dia:
+            if len(conteos) == ancho:
+                diario[(fecha - inicio).days + 1] += conteos
+        acumulado = np.cumsum(diario, axis=0)
+        for d in fechas:
+            k = (d - inicio).days + 1
+            act = acumulado[k] - acumulado[k - recientes]
+            ref = acumulado[k - recientes] - acumulado[k - recientes - base]
+            if not ref.sum() or not act.sum():
+                continue
+            filas.append({"fecha": d, "feature": f, "psi": round(psi(ref, act), 6),
+                          "ks": round(ks_aprox(ref, act), 6),
+                          "n_base": int(ref.sum()), "n_reciente": int(act.sum())})
+    return filas
+
+
+def actualizar_drift(completo=False):
+    """
+    Recalcula los histogramas de las fechas cuyo dataset cambió desde la
+    última corrida y la serie de drift de los días afectados. Si alguna
+    feature consiguió bordes nuevos (o con `completo`) se recalculan todas.
+    """
+    engine = get_engine()
+    with engine.begin() as conn:
+        bordes, nuevos = _asegurar_bordes(conn, recalcular=completo)
+        nueva_marca = conn.execute(SQL_MAX_UPDATED).scalar()
+        marca = None if completo or nuevos else conn.execute(SQL_LEER_MARCA, {"nombre": MARCA}).scalar()
+        if marca is None:
+            fechas = sorted(r[0] for r in conn.execute(text("SELECT DISTINCT fecha FROM dataset_entrenamiento")))
+        else:
+            fechas = sorted(r[0] for r in conn.execute(SQL_FECHAS_CAMBIADAS, {"marca": marca}))
+    fechas = [date.fromisoformat(str(f)[:10]) for f in fechas]
+    if not fechas:
+        return {"histogramas": 0, "serie": 0}
+
+    filas_hist = _histogramas_de(fechas, bordes)
+    with engine.begin() as conn:
+        conn.execute(SQL_BORRAR_HIST, {"fechas": fechas})
+        if filas_hist:
+            conn.execute(SQL_INSERTAR_HIST, filas_hist)
+
+        # Un día cambiado afecta la serie de los días en los que cae dentro de alguna ventana
+        desde_serie = fechas[0]
+        hasta_serie = date.fromisoformat(str(conn.execute(SQL_MAX_FECHA_HIST).scalar())[:10])
+        desde_hist = desde_serie - timedelta(days=DRIFT_RECENT_DAYS + DRIFT_BASELINE_DAYS)
+        historicos = {
+            (date.fromisoformat(str(fecha)[:10]), feature): np.asarray(json.loads(conteos), dtype=np.int64)
+            for fecha, feature, conteos in conn.execute(SQL_LEER_HIST, {"desde": desde_hist, "hasta": hasta_serie})
+        }
+        dias = [desde_serie + timedelta(days=i) for i in range((hasta_serie - desde_serie).days + 1)]
+        filas_serie = calcular_serie(historicos, dias)
+        conn.execute(SQL_BORRAR_SERIE, {"desde": desde_serie, "hasta": hasta_serie})
+        if filas_serie:
+            conn.execute(SQL_INSERTAR_SERIE, filas_serie)
+        if nueva_marca is not None:
+            conn.execute(SQL_GUARDAR_MARCA, {"nombre": MARCA, "valor": nueva_marca})
+
+    resumen = {"histogramas": len(filas_hist), "serie": len(filas_serie)}
+    logging.info(f"Drift actualizado: {resumen}")
+    return resumen
+
+
+def ultima_fecha():
+    """Fecha del último punto de drift_serie (None si está vacía)."""
+    with get_engine().connect() as conn:
+        ultima = conn.execute(SQL_MAX_FECHA_SERIE).scalar()
+    if ultima is None or isinstance(ultima, date):
+        return ultima
+    return date.fromisoformat(str(ultima)[:10])
+
+
+def serie(feature=None, desde=None, fechas=None):
+    """
+    Puntos de drift_serie (más recientes al final), opcionalmente de una
+    feature, desde una fecha o sólo de las `fechas` indicadas.
+    """
+    query = "SELECT fecha, feature, psi, ks, n_base, n_reciente FROM drift_serie WHERE 1 = 1"
+    params = {}
+    if fechas is not None:
+        query += " AND fecha IN :fechas"
+        params["fechas"] = list(fechas)
+    if feature:
+        query += " AND feature = :feature"
+        params["feature"] = feature
+    if desde:
+        query += " AND fecha >= :desde"
+        params["desde"] = desde
+    query += " ORDER BY fecha, feature"
+    sql = text(query)
+    if fechas is not None:
+        sql = sql.bindparams(bindparam("fechas", expanding=True))
+    with get_engine().connect() as conn:
+        return [dict(r._mapping) for r in conn.execute(sql, params)]
@@ -0,0 +1,32 @@
+-- drift_sketch.sql
+-- Tablas del monitoreo de drift por histogramas (drift_sketch.py)
+
+-- Bordes fijos de los intervalos de cada feature (JSON: lista de floats)
+CREATE TABLE IF NOT EXISTS drift_bordes (
+    feature VARCHAR(40) PRIMARY KEY,
+    bordes JSON NOT NULL,
+    creado DATETIME NOT NULL
+);
+
+-- Histograma diario por feature: len(bordes) + 1 intervalos y al final los nulos
+CREATE TABLE IF NOT EXISTS drift_histograma_diario (
+    fecha DATE NOT NULL,
+    feature VARCHAR(40) NOT NULL,
+    conteos JSON NOT NULL,
+    total INT NOT NULL,
+
+    PRIMARY KEY (fecha, feature)
+);
+
+-- Serie de drift: ventana reciente contra ventana base, por día y feature
+CREATE TABLE IF NOT EXISTS drift_serie (
+    fecha DATE NOT NULL,
+    feature VARCHAR(40) NOT NULL,
+    psi DOUBLE NOT NULL,
+    ks DOUBLE NOT NULL,
+    n_base INT NOT NULL,
+    n_reciente INT NOT NULL,
+
+    PRIMARY KEY (fecha, feature),
+    INDEX idx_drift_serie_feature (feature, fecha)
+);
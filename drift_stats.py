@@ -0,0 +1,75 @@
+# drift_stats.py
+"""
+Histogramas de bordes fijos y medidas de drift calculadas sobre ellos.
+Sólo depende de numpy: lo usan el drift diario (drift_sketch.py), el
+monitor en línea de la API (drift_online.py) y el perfil de entrenamiento
+que se guarda con cada versión del modelo.
+"""
+import numpy as np
+
+from config import DRIFT_BINS
+
+# Suavizado para intervalos vacíos en el PSI
+EPS = 1e-4
+
+
+def bordes_por_cuantiles(valores, n_bins=DRIFT_BINS):
+    """Bordes internos (n_bins - 1 como máximo) en los cuantiles de `valores`."""
+    valores = np.asarray(valores, dtype=np.float64)
+    valores = valores[~np.isnan(valores)]
+    if valores.size == 0:
+        return []
+    cuantiles = np.quantile(valores, np.linspace(0, 1, n_bins + 1)[1:-1])
+    return np.unique(cuantiles).tolist()
+
+
+def histograma(valores, bordes):
+    """
+    Conteos por intervalo: len(bordes) + 1 intervalos (los extremos son
+    abiertos) seguidos del conteo de nulos.
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    nulos = np.isnan(valores)
+    idx = np.searchsorted(np.asarray(bordes, dtype=np.float64), valores[~nulos], side="right")
+    conteos = np.bincount(idx, minlength=len(bordes) + 1)
+    return np.append(conteos, nulos.sum()).astype(np.int64)
+
+
+def _proporciones(conteos):
+    conteos = np.asarray(conteos, dtype=np.float64)
+    total = conteos.sum()
+    return conteos / total if total else conteos
+
+
+def psi(ref, act):
+    """Population Stability Index entre dos histogramas con los mismos bordes."""
+    p = np.clip(_proporciones(ref), EPS, None)
+    q = np.clip(_proporciones(act), EPS, None)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def ks_aprox(ref, act):
+    """Máxima distancia entre las CDF evaluadas en los bordes (cota inferior del KS)."""
+    return float(np.max(np.abs(np.cumsum(_proporciones(ref)) - np.cumsum(_proporciones(act)))))
+
+
+def perfil_entrenamiento(X, etiquetas, features, n_bins=DRIFT_BINS):
+    """
+    Distribución de entrenamiento que se publica junto a cada versión del
+    modelo: bordes e histograma por feature (en el orden de `features`) y
+    conteo de etiquetas.
+    """
+    X = np.asarray(X)
+    bordes, conteos = [], []
+    for j in range(X.shape[1]):
+        columna = X[:, j]
+        bordes.append(bordes_por_cuantiles(columna, n_bins))
+        conteos.append(histograma(columna, bordes[-1]).tolist())
+    clases, n = np.unique(np.asarray(etiquetas).astype(str), return_counts=True)
+    return {
+        "features": list(features),
+        "bordes": bordes,
+        "conteos": conteos,
+        "clases": {c: int(k) for c, k in zip(clases, n)},
+        "filas": int(X.shape[0]),
+    }
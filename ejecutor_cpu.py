@@ -0,0 +1,72 @@
+# ejecutor_cpu.py
+"""
+Ejecutor acotado para el trabajo de CPU de los endpoints async (API_ASYNC).
+
+Un ThreadPoolExecutor propio de CPU_WORKERS hilos (por defecto uno por
+núcleo), separado del threadpool por defecto de FastAPI: la puntuación de
+lotes no compite por hilos con los endpoints sincrónicos y el event loop
+queda libre para aceptar requests y esperar a la BD.
+
+Como mucho CPU_QUEUE_MAX tareas esperan turno detrás de las que corren; con
+la cola llena `run` lanza EjecutorSaturado (la API responde 503) en lugar
+de acumular trabajo que terminaría fuera de plazo.
+
+Los hilos comparten el GIL: el recorrido del árbol en Python no corre en
+paralelo, pero el `apply` vectorizado de numpy lo libera, y el tope evita
+que una ráfaga de lotes deje sin CPU al loop.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import functools
+import os
+
+from config import CPU_WORKERS, CPU_QUEUE_MAX
+
+
+class EjecutorSaturado(Exception):
+    pass
+
+
+class EjecutorCPU:
+    def __init__(self, workers=CPU_WORKERS, max_pendientes=CPU_QUEUE_MAX):
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.max_pendientes = max_pendientes
+        self._executor = None
+        # Sólo se tocan desde el hilo del event loop: no hace falta lock
+        self.en_curso = 0
+        self.terminadas = 0
+        self.rechazadas = 0
+
+    async def run(self, fn, *args):
+        """
+        Ejecuta `fn(*args)` en un hilo del ejecutor y devuelve su resultado.
+        Corre con el contexto del request, así las etapas de instrumentation
+        medidas dentro de `fn` se suman al request.
+        """
+        if self.en_curso >= self.workers + self.max_pendientes:
+            self.rechazadas += 1
+            raise EjecutorSaturado(f"{self.en_curso} tareas de CPU en curso o en espera")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cpu")
+        llamada = functools.partial(contextvars.copy_context().run, fn, *args)
+        self.en_curso += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, llamada)
+        finally:
+            self.en_curso -= 1
+            self.terminadas += 1
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_pendientes": self.max_pendientes,
+            "en_curso": self.en_curso,
+            "terminadas": self.terminadas,
+            "rechazadas": self.rechazadas,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -7,11 +7,14 @@ from sklearn.model_selection import train_test_split
 from sklearn.tree import DecisionTreeClassifier, plot_tree
 from sklearn.metrics import classification_report, confusion_matrix
 from sklearn.preprocessing import LabelEncoder
-import joblib
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+from datetime import datetime
 from config import MODEL_DIR, MODEL_PATH, ENCODER_PATH
+from artifacts import atomic_dump, atomic_write_json, write_manifest
+from drift_stats import perfil_entrenamiento
+from model_loader import export_arrays, export_compact
 
 # --- 1. Conexión y carga del dataset ---
 from config import DB_URI
@@ -73,8 +76,19 @@ print("\n📈 REPORTE DE CLASIFICACIÓN:")
 print(classification_report(y_test, y_pred, target_names=encoder.classes_))
 
 # --- 6. Guardar modelo y metadatos ---
-joblib.dump(model, os.path.join(MODEL_DIR, MODEL_PATH))
-joblib.dump(encoder, os.path.join(MODEL_DIR, ENCODER_PATH))
+atomic_dump(model, os.path.join(MODEL_DIR, MODEL_PATH))
+atomic_dump(encoder, os.path.join(MODEL_DIR, ENCODER_PATH))
+# Publicar como versión activa para que la API lo recargue
+version_name = f"manual_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+profile_file = f"perfil_{version_name}.json"
+arrays_file = f"arbol_{version_name}.joblib"
+compact_file = f"modelo_{version_name}.npz"
+atomic_write_json(os.path.join(MODEL_DIR, profile_file),
+                  perfil_entrenamiento(X_train.to_numpy(), encoder.classes_[y_train], features))
+export_arrays(model, encoder, os.path.join(MODEL_DIR, arrays_file))
+compact_sha256 = export_compact(model, encoder, os.path.join(MODEL_DIR, compact_file), version_name)
+write_manifest(version_name, MODEL_PATH, ENCODER_PATH, profile=profile_file, arrays=arrays_file,
+               compact=compact_file, compact_sha256=compact_sha256)
 print("💾 Modelo y codificador guardados.")
 
 # Save textual report to a log file
@@ -40,27 +40,54 @@
 # V2.0
 
 # etl_features_parroquia_daily.py
-import pandas as pd
-from sqlalchemy import create_engine, text
-from datetime import datetime
+from sqlalchemy import text
+from datetime import date, datetime
+import argparse
 import logging
 
 # Usar configuración desde config.py (variables de entorno)
-from config import DB_URI, LOG_FILE
+from config import LOG_FILE, ETL_MODE, ETL_BACKFILL_CHUNK_DAYS, ETL_WORKERS, ETL_PARTITION_BY
+from db import get_engine
+import etl_incremental
+import etl_paralelo
+import dataset_materializado
+import drift_sketch
+import recomendaciones_diarias
 from pathlib import Path
 
-QUERY_FILE = "features_diarias.sql"
+# Archivo SQL por modo de ejecución:
+#  - legacy: una subconsulta correlacionada por feature (versión original)
+#  - setbased: una sola pasada agrupada sobre solicitud (misma salida)
+# El modo 'incremental' no usa SQL fijo: avanza ventanas guardadas (etl_incremental.py)
+# El modo 'paralelo' ejecuta setbased por particiones de parroquias (etl_paralelo.py)
+QUERY_FILES = {
+    "legacy": "features_diarias.sql",
+    "setbased": "features_diarias_setbased.sql",
+}
+MODOS = list(QUERY_FILES) + ["incremental", "paralelo"]
 
 logging.basicConfig(filename=LOG_FILE,
                     level=logging.INFO,
                     format="%(asctime)s [%(levelname)s] %(message)s")
 
-def run_etl():
-    logging.info("Inicio de ETL de features_parroquia_daily")
-    engine = create_engine(DB_URI)
-
+def query_path_for(mode):
+    if mode not in QUERY_FILES:
+        raise ValueError(f"Modo de ETL desconocido: {mode} (opciones: {', '.join(QUERY_FILES)})")
     # Resolve query file relative to this script to avoid CWD confusion
-    query_path = Path(__file__).resolve().parent.joinpath(QUERY_FILE)
+    return Path(__file__).resolve().parent.joinpath(QUERY_FILES[mode])
+
+def run_etl(mode=ETL_MODE, workers=ETL_WORKERS, particion_por=ETL_PARTITION_BY):
+    logging.info(f"Inicio de ETL de features_parroquia_daily (modo {mode})")
+    if mode in ("incremental", "paralelo"):
+        if mode == "incremental":
+            etl_incremental.run_incremental()
+        else:
+            etl_paralelo.run_paralelo(workers, particion_por)
+        logging.info(f"ETL completado correctamente para {datetime.now().date()}")
+        return
+    engine = get_engine()
+
+    query_path = query_path_for(mode)
     logging.info(f"Usando archivo SQL: {str(query_path)}")
 
     if not query_path.exists():
@@ -77,9 +104,51 @@ def run_etl():
     logging.info(f"ETL completado correctamente para {datetime.now().date()}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ETL de features_parroquia_daily")
+    parser.add_argument("--modo", choices=MODOS, default=ETL_MODE,
+                        help="Variante del ETL a ejecutar")
+    parser.add_argument("--backfill-desde", type=date.fromisoformat,
+                        help="Inicio (YYYY-MM-DD) del backfill histórico")
+    parser.add_argument("--backfill-hasta", type=date.fromisoformat,
+                        help="Fin (YYYY-MM-DD) del backfill histórico (por defecto ayer)")
+    parser.add_argument("--chunk-dias", type=int, default=ETL_BACKFILL_CHUNK_DAYS,
+                        help="Días por bloque del backfill")
+    parser.add_argument("--reanudar", action="store_true",
+                        help="Continuar un backfill interrumpido desde su checkpoint")
+    parser.add_argument("--workers", type=int, default=ETL_WORKERS,
+                        help="Hilos del modo paralelo")
+    parser.add_argument("--particion-por", choices=etl_paralelo.CRITERIOS, default=ETL_PARTITION_BY,
+                        help="Criterio de partición del modo paralelo")
+    parser.add_argument("--sin-dataset", action="store_true",
+                        help="No refrescar dataset_entrenamiento ni el drift al terminar")
+    parser.add_argument("--sin-recomendaciones", action="store_true",
+                        help="No puntuar las recomendaciones del día al terminar")
+    parser.add_argument("--verificar-paridad", action="store_true",
+                        help="Comparar las features de hoy con las del SQL setbased (sin escribirlas)")
+    args = parser.parse_args()
     try:
-        run_etl()
+        if args.backfill_desde:
+            hasta = args.backfill_hasta or date.fromordinal(date.today().toordinal() - 1)
+            logging.info(f"Inicio de backfill {args.backfill_desde} → {hasta}")
+            etl_incremental.backfill(args.backfill_desde, hasta, args.chunk_dias, args.reanudar)
+            logging.info("Backfill completado")
+        else:
+            run_etl(args.modo, args.workers, args.particion_por)
+        if args.verificar_paridad:
+            diferencias = etl_incremental.verificar_paridad()
+            for pid, columnas in diferencias.items():
+                print(f"⚠️ Parroquia {pid}: {columnas}")
+            print(f"Paridad con setbased: {len(diferencias)} parroquias con diferencias")
+        if not args.sin_dataset:
+            # Sólo las fechas que el ETL modificó (marca de agua en updated_at)
+            dataset_materializado.refrescar_dataset()
+            # Histogramas diarios y serie de drift de las fechas refrescadas
+            drift_sketch.actualizar_drift()
+        if not args.sin_recomendaciones and not args.backfill_desde:
+            # Recomendación de cada parroquia para la última fecha, con el modelo activo
+            recomendaciones_diarias.puntuar_dia()
         print("✅ ETL ejecutado correctamente")
     except Exception as e:
-        logging.error(f"Error en ETL: {str(e)}")
+        # Sin str(e): en errores de SQLAlchemy incluye el SQL completo
+        logging.error(f"Error en ETL: {etl_paralelo.describir_error(e)}")
         print("❌ Error durante la ejecución del ETL, revisa etl_features.log")
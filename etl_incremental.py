@@ -0,0 +1,517 @@
+# etl_incremental.py
+"""
+ETL incremental de features_parroquia_daily por ventanas móviles.
+
+En lugar de recorrer 12 meses de solicitud por parroquia cada día, se guarda
+el consumo diario agregado por parroquia (consumo_parroquia_diario) y el
+estado de las ventanas al cierre del último día procesado
+(etl_ventanas_parroquia). Pasar al día siguiente es sumar el día nuevo y
+restar los días que salen de cada ventana, así que el costo diario no
+depende de cuánta historia haya.
+
+Las ventanas reproducen las del SQL original (BETWEEN d - INTERVAL ... AND d,
+ambos extremos incluidos), y los promedios y la proyección redondean como
+MySQL (división DECIMAL con 4 decimales extra, ROUND hacia arriba en .5).
+Para el día de hoy los pendientes son, como en el SQL original, todas las
+solicitudes pendientes. Para fechas pasadas (backfill) hay dos
+aproximaciones inevitables: el stock es la foto actual de almacen (no hay
+historia de stock) y los pendientes son las solicitudes hoy pendientes con
+fecha <= d. verificar_paridad() compara el resultado de hoy con el de
+features_diarias_setbased.sql.
+
+Uso (ver etl_features_parroquia_daily.py):
+    python etl_features_parroquia_daily.py --modo incremental
+    python etl_features_parroquia_daily.py --backfill-desde 2024-01-01 --backfill-hasta 2024-12-31
+"""
+from bisect import bisect_right
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+import calendar
+import json
+import logging
+import os
+import time
+
+from sqlalchemy import text, bindparam
+
+from config import ETL_LATE_DAYS, ETL_BACKFILL_CHUNK_DAYS, ETL_CHECKPOINT_FILE
+from db import get_engine
+
+CERO = Decimal(0)
+UN_DIA = timedelta(days=1)
+# div_precision_increment por defecto de MySQL
+DECIMALES_DIVISION = 4
+SETBASED_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "features_diarias_setbased.sql")
+
+
+def dividir(x: Decimal, n) -> Decimal:
+    """`x / n` como la división DECIMAL de MySQL: escala de x + 4, redondeo hacia arriba en .5."""
+    escala = max(0, -x.as_tuple().exponent) + DECIMALES_DIVISION
+    return (x / n).quantize(Decimal(1).scaleb(-escala), rounding=ROUND_HALF_UP)
+
+
+def redondear(x: Decimal, decimales=2) -> Decimal:
+    """ROUND(x, decimales) de MySQL sobre DECIMAL (.5 se aleja de cero)."""
+    return x.quantize(Decimal(1).scaleb(-decimales), rounding=ROUND_HALF_UP)
+
+
+def restar_meses(d: date, meses: int) -> date:
+    """Igual que `d - INTERVAL n MONTH` en MySQL (recorta al último día del mes)."""
+    total = d.year * 12 + (d.month - 1) - meses
+    y, m = divmod(total, 12)
+    m += 1
+    return date(y, m, min(d.day, calendar.monthrange(y, m)[1]))
+
+
+# Primer día (incluido) de cada ventana para el día d
+VENTANAS = {
+    "7d": lambda d: d - timedelta(days=7),
+    "30d": lambda d: d - timedelta(days=30),
+    "12m": lambda d: restar_meses(d, 12),
+}
+
+
+def dias_expirados(d: date):
+    """Días que salen de cada ventana al pasar de d-1 a d."""
+    prev = d - UN_DIA
+    expirados = {}
+    for nombre, inicio in VENTANAS.items():
+        a, b = inicio(prev), inicio(d)
+        expirados[nombre] = [a + timedelta(days=i) for i in range((b - a).days)]
+    return expirados
+
+
+class EstadoVentanas:
+    """Sumas de consumo por ventana de una parroquia al cierre de `fecha`."""
+    __slots__ = ("fecha", "sumas", "ultima_entrega")
+
+    def __init__(self, fecha, sumas=None, ultima_entrega=None):
+        self.fecha = fecha
+        self.sumas = sumas if sumas is not None else {n: CERO for n in VENTANAS}
+        self.ultima_entrega = ultima_entrega
+
+    @classmethod
+    def sembrar(cls, fecha, diario, ultima_entrega=None):
+        """
+        Calcula las ventanas de `fecha` desde cero. `diario` es
+        {fecha: (cantidad, solicitudes_finalizadas)} y debe cubrir los 12 meses.
+        """
+        sumas = {}
+        for nombre, inicio in VENTANAS.items():
+            desde = inicio(fecha)
+            sumas[nombre] = sum((c for f, (c, _) in diario.items() if desde <= f <= fecha), CERO)
+        return cls(fecha, sumas, ultima_entrega)
+
+    def avanzar(self, diario, expirados=None):
+        """Pasa al día siguiente: suma el día nuevo y resta los que expiran."""
+        d = self.fecha + UN_DIA
+        expirados = expirados or dias_expirados(d)
+        cantidad, finalizadas = diario.get(d, (CERO, 0))
+        for nombre, dias in expirados.items():
+            salen = sum((diario.get(x, (CERO, 0))[0] for x in dias), CERO)
+            self.sumas[nombre] += cantidad - salen
+        if finalizadas:
+            self.ultima_entrega = d
+        self.fecha = d
+
+    def corregir(self, dia, delta):
+        """Aplica un cambio tardío del consumo de `dia` (<= fecha) a las ventanas que lo contienen."""
+        for nombre, inicio in VENTANAS.items():
+            if inicio(self.fecha) <= dia <= self.fecha:
+                self.sumas[nombre] += delta
+
+    def features(self, parroquia_id, pendientes, stock):
+        """Fila de features_parroquia_daily con las mismas fórmulas que features_diarias.sql."""
+        s7 = self.sumas["7d"]
+        dias = (self.fecha - self.ultima_entrega).days if self.ultima_entrega else 0
+        return {
+            "parroquia_id": parroquia_id,
+            "fecha": self.fecha,
+            "consumo_7d": s7,
+            "consumo_30d": self.sumas["30d"],
+            "promedio_12m": redondear(dividir(self.sumas["12m"], 12)),
+            "dias_desde_ultima_entrega": dias,
+            "stock_actual": stock,
+            "stock_minimo": None,
+            "entregas_pendientes": pendientes,
+            "proyeccion_72h": redondear(dividir(s7, 7) * 3),
+            "indicador_riesgo": 0 if s7 == 0 else None,
+            "calidad_datos": "OK",
+        }
+
+
+# --- SQL ---
+_JOIN_PARROQUIA = """
+    FROM solicitud s
+    JOIN vocero_comunal v ON v.cedula = s.vocero_comunal
+    JOIN consejo_comunal cc ON cc.rif = v.consejo_comunal_rif
+    JOIN comunidad com ON com.id = cc.comunidad_id
+"""
+
+SQL_CONSUMO_RANGO = text(f"""
+    SELECT com.parroquia_id, s.fecha,
+           COALESCE(SUM(sc.cantidad), 0) AS cantidad,
+           COUNT(DISTINCT s.id) AS finalizadas
+    {_JOIN_PARROQUIA}
+    LEFT JOIN solicitud_cilindro sc ON sc.solicitud_id = s.id
+    WHERE s.estado IN ('FINALIZADA','EN ENTREGA')
+      AND s.fecha BETWEEN :desde AND :hasta
+    GROUP BY com.parroquia_id, s.fecha
+""")
+
+SQL_ULTIMA_ENTREGA = text(f"""
+    SELECT com.parroquia_id, MAX(s.fecha) AS ultima
+    {_JOIN_PARROQUIA}
+    WHERE s.estado IN ('FINALIZADA','EN ENTREGA')
+      AND s.fecha <= :hasta
+    GROUP BY com.parroquia_id
+""")
+
+SQL_PENDIENTES = text(f"""
+    SELECT com.parroquia_id, s.fecha, COUNT(*) AS n
+    {_JOIN_PARROQUIA}
+    WHERE s.estado IN ('PENDIENTE','EN PROCESO','POR PAGAR','VALIDANDO')
+    GROUP BY com.parroquia_id, s.fecha
+""")
+
+SQL_STOCK = text("SELECT MAX(litraje_total) FROM almacen")
+
+SQL_CONSUMO_GUARDADO = text("""
+    SELECT parroquia_id, fecha, cantidad, solicitudes_finalizadas
+    FROM consumo_parroquia_diario
+    WHERE fecha BETWEEN :desde AND :hasta
+""")
+
+SQL_CONSUMO_FECHAS = text("""
+    SELECT parroquia_id, fecha, cantidad, solicitudes_finalizadas
+    FROM consumo_parroquia_diario
+    WHERE fecha IN :fechas
+""").bindparams(bindparam("fechas", expanding=True))
+
+SQL_BORRAR_CONSUMO = text("DELETE FROM consumo_parroquia_diario WHERE fecha BETWEEN :desde AND :hasta")
+
+SQL_INSERTAR_CONSUMO = text("""
+    INSERT INTO consumo_parroquia_diario (parroquia_id, fecha, cantidad, solicitudes_finalizadas)
+    VALUES (:parroquia_id, :fecha, :cantidad, :finalizadas)
+""")
+
+SQL_UPSERT_FEATURES = text("""
+    INSERT INTO features_parroquia_daily (
+        parroquia_id, fecha, consumo_7d, consumo_30d, promedio_12m,
+        dias_desde_ultima_entrega, stock_actual, stock_minimo, entregas_pendientes,
+        proyeccion_72h, indicador_riesgo, calidad_datos
+    ) VALUES (
+        :parroquia_id, :fecha, :consumo_7d, :consumo_30d, :promedio_12m,
+        :dias_desde_ultima_entrega, :stock_actual, :stock_minimo, :entregas_pendientes,
+        :proyeccion_72h, :indicador_riesgo, :calidad_datos
+    )
+    ON DUPLICATE KEY UPDATE
+        consumo_7d = VALUES(consumo_7d),
+        consumo_30d = VALUES(consumo_30d),
+        promedio_12m = VALUES(promedio_12m),
+        dias_desde_ultima_entrega = VALUES(dias_desde_ultima_entrega),
+        stock_actual = VALUES(stock_actual),
+        stock_minimo = VALUES(stock_minimo),
+        entregas_pendientes = VALUES(entregas_pendientes),
+        proyeccion_72h = VALUES(proyeccion_72h),
+        indicador_riesgo = VALUES(indicador_riesgo),
+        calidad_datos = VALUES(calidad_datos),
+        updated_at = CURRENT_TIMESTAMP
+""")
+
+SQL_CARGAR_ESTADOS = text("""
+    SELECT parroquia_id, fecha, suma_7d, suma_30d, suma_12m, ultima_entrega
+    FROM etl_ventanas_parroquia
+""")
+
+SQL_GUARDAR_ESTADO = text("""
+    INSERT INTO etl_ventanas_parroquia
+        (parroquia_id, fecha, suma_7d, suma_30d, suma_12m, ultima_entrega)
+    VALUES (:parroquia_id, :fecha, :suma_7d, :suma_30d, :suma_12m, :ultima_entrega)
+    ON DUPLICATE KEY UPDATE
+        fecha = VALUES(fecha),
+        suma_7d = VALUES(suma_7d),
+        suma_30d = VALUES(suma_30d),
+        suma_12m = VALUES(suma_12m),
+        ultima_entrega = VALUES(ultima_entrega)
+""")
+
+
+# --- Acceso a datos ---
+def refrescar_consumo_diario(conn, desde, hasta):
+    """
+    Recalcula consumo_parroquia_diario para [desde, hasta] desde solicitud.
+    Devuelve (anteriores, nuevos) como {(parroquia_id, fecha): (cantidad, finalizadas)}.
+    """
+    anteriores = {(r.parroquia_id, r.fecha): (Decimal(r.cantidad), r.solicitudes_finalizadas)
+                  for r in conn.execute(SQL_CONSUMO_GUARDADO, {"desde": desde, "hasta": hasta})}
+    nuevos = {(r.parroquia_id, r.fecha): (Decimal(r.cantidad), r.finalizadas)
+              for r in conn.execute(SQL_CONSUMO_RANGO, {"desde": desde, "hasta": hasta})}
+    conn.execute(SQL_BORRAR_CONSUMO, {"desde": desde, "hasta": hasta})
+    if nuevos:
+        conn.execute(SQL_INSERTAR_CONSUMO, [
+            {"parroquia_id": pid, "fecha": f, "cantidad": c, "finalizadas": n}
+            for (pid, f), (c, n) in nuevos.items()
+        ])
+    return anteriores, nuevos
+
+
+def cargar_consumo(conn, fechas):
+    """{parroquia_id: {fecha: (cantidad, finalizadas)}} sólo para las fechas pedidas."""
+    diarios = {}
+    if not fechas:
+        return diarios
+    for r in conn.execute(SQL_CONSUMO_FECHAS, {"fechas": sorted(fechas)}):
+        diarios.setdefault(r.parroquia_id, {})[r.fecha] = (Decimal(r.cantidad), r.solicitudes_finalizadas)
+    return diarios
+
+
+def _rango(desde, hasta):
+    return [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+
+
+class Pendientes:
+    """
+    Solicitudes pendientes por parroquia: todas para hoy (como el SQL
+    original) y las de fecha <= d para días pasados (acumulado por día).
+    """
+
+    def __init__(self, conn):
+        self._hoy = date.today()
+        por_parroquia = {}
+        for r in conn.execute(SQL_PENDIENTES):
+            por_parroquia.setdefault(r.parroquia_id, []).append((r.fecha, r.n))
+        self._fechas, self._acumulado = {}, {}
+        for pid, filas in por_parroquia.items():
+            filas.sort()
+            total, acumulado = 0, []
+            for _, n in filas:
+                total += n
+                acumulado.append(total)
+            self._fechas[pid] = [f for f, _ in filas]
+            self._acumulado[pid] = acumulado
+
+    def hasta(self, parroquia_id, d):
+        fechas = self._fechas.get(parroquia_id)
+        if not fechas:
+            return 0
+        if d >= self._hoy:
+            return self._acumulado[parroquia_id][-1]
+        i = bisect_right(fechas, d)
+        return self._acumulado[parroquia_id][i - 1] if i else 0
+
+
+def _parroquias(conn):
+    return [r[0] for r in conn.execute(text("SELECT id FROM parroquia ORDER BY id"))]
+
+
+def _stock(conn):
+    return conn.execute(SQL_STOCK).scalar()
+
+
+def sembrar_estados(conn, parroquias, fecha):
+    """Estados de ventana al cierre de `fecha`, a partir de consumo_parroquia_diario."""
+    desde = VENTANAS["12m"](fecha)
+    diarios = cargar_consumo(conn, _rango(desde, fecha))
+    ultimas = {r.parroquia_id: r.ultima for r in conn.execute(SQL_ULTIMA_ENTREGA, {"hasta": fecha})}
+    return {pid: EstadoVentanas.sembrar(fecha, diarios.get(pid, {}), ultimas.get(pid))
+            for pid in parroquias}
+
+
+def cargar_estados(conn):
+    return {
+        r.parroquia_id: EstadoVentanas(
+            r.fecha,
+            {"7d": Decimal(r.suma_7d), "30d": Decimal(r.suma_30d), "12m": Decimal(r.suma_12m)},
+            r.ultima_entrega,
+        )
+        for r in conn.execute(SQL_CARGAR_ESTADOS)
+    }
+
+
+def guardar_estados(conn, estados):
+    conn.execute(SQL_GUARDAR_ESTADO, [
+        {"parroquia_id": pid, "fecha": e.fecha, "suma_7d": e.sumas["7d"],
+         "suma_30d": e.sumas["30d"], "suma_12m": e.sumas["12m"],
+         "ultima_entrega": e.ultima_entrega}
+        for pid, e in estados.items()
+    ])
+
+
+def guardar_features(conn, filas):
+    if filas:
+        conn.execute(SQL_UPSERT_FEATURES, filas)
+
+
+def avanzar_estados(conn, estados, hasta, pendientes, stock):
+    """
+    Avanza cada estado día a día hasta `hasta` y devuelve las filas de
+    features de los días recorridos (y de `hasta` si ya estaba ahí).
+    Sólo lee de consumo_parroquia_diario los días que entran o salen.
+    """
+    inicio = min((e.fecha for e in estados.values()), default=hasta) + UN_DIA
+    dias = _rango(inicio, hasta) if inicio <= hasta else []
+    expirados = {d: dias_expirados(d) for d in dias}
+    necesarias = set(dias)
+    for por_ventana in expirados.values():
+        for lista in por_ventana.values():
+            necesarias.update(lista)
+    diarios = cargar_consumo(conn, necesarias)
+
+    filas = []
+    for pid, estado in estados.items():
+        diario = diarios.get(pid, {})
+        if estado.fecha == hasta:
+            # Ya estaba al día (p.ej. re-ejecución tras correcciones tardías)
+            filas.append(estado.features(pid, pendientes.hasta(pid, hasta), stock))
+        while estado.fecha < hasta:
+            estado.avanzar(diario, expirados[estado.fecha + UN_DIA])
+            filas.append(estado.features(pid, pendientes.hasta(pid, estado.fecha), stock))
+    return filas
+
+
+# --- Checkpoint del backfill ---
+def _leer_checkpoint():
+    if not os.path.exists(ETL_CHECKPOINT_FILE):
+        return None
+    with open(ETL_CHECKPOINT_FILE, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _escribir_checkpoint(desde, hasta, ultimo_dia):
+    tmp = f"{ETL_CHECKPOINT_FILE}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump({"desde": desde.isoformat(), "hasta": hasta.isoformat(),
+                   "ultimo_dia": ultimo_dia.isoformat()}, fh)
+    os.replace(tmp, ETL_CHECKPOINT_FILE)
+
+
+# --- Entradas ---
+def backfill(desde: date, hasta: date, chunk_dias: int = ETL_BACKFILL_CHUNK_DAYS, reanudar: bool = False):
+    """
+    Llena features_parroquia_daily para [desde, hasta] en bloques de
+    `chunk_dias`. Cada bloque se confirma junto con el estado de las ventanas
+    y deja un checkpoint; con `reanudar` se continúa desde el último bloque.
+    """
+    if hasta < desde:
+        raise ValueError("La fecha final del backfill es anterior a la inicial")
+    engine = get_engine()
+    checkpoint = _leer_checkpoint() if reanudar else None
+
+    with engine.begin() as conn:
+        parroquias = _parroquias(conn)
+        stock = _stock(conn)
+        pendientes = Pendientes(conn)
+        estados = None
+        if checkpoint and checkpoint["desde"] == desde.isoformat() and checkpoint["hasta"] == hasta.isoformat():
+            ultimo = date.fromisoformat(checkpoint["ultimo_dia"])
+            inicio = ultimo + UN_DIA
+            estados = cargar_estados(conn)
+            if any(estados.get(pid) is None or estados[pid].fecha != ultimo for pid in parroquias):
+                estados = sembrar_estados(conn, parroquias, ultimo)
+            logging.info(f"Backfill reanudado desde {inicio}")
+        else:
+            inicio = desde
+            semilla = desde - UN_DIA
+            refrescar_consumo_diario(conn, VENTANAS["12m"](semilla), semilla)
+            estados = sembrar_estados(conn, parroquias, semilla)
+
+    while inicio <= hasta:
+        fin = min(inicio + timedelta(days=chunk_dias - 1), hasta)
+        t0 = time.perf_counter()
+        with engine.begin() as conn:
+            refrescar_consumo_diario(conn, inicio, fin)
+            filas = avanzar_estados(conn, estados, fin, pendientes, stock)
+            guardar_features(conn, filas)
+            guardar_estados(conn, estados)
+        _escribir_checkpoint(desde, hasta, fin)
+        logging.info(f"Backfill {inicio}..{fin}: {len(filas)} filas en {time.perf_counter() - t0:.2f}s")
+        print(f"  {inicio} → {fin}: {len(filas)} filas")
+        inicio = fin + UN_DIA
+
+    if os.path.exists(ETL_CHECKPOINT_FILE):
+        os.remove(ETL_CHECKPOINT_FILE)
+
+
+def run_incremental(fecha: date = None):
+    """
+    Calcula las features de `fecha` (hoy por defecto) avanzando las ventanas
+    guardadas. Antes re-agrega los últimos ETL_LATE_DAYS días para absorber
+    solicitudes que cambiaron de estado tarde, corrigiendo las sumas por delta.
+    """
+    fecha = fecha or date.today()
+    engine = get_engine()
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        parroquias = _parroquias(conn)
+        estados = cargar_estados(conn)
+        if any(e.fecha > fecha for e in estados.values()):
+            raise ValueError(f"Hay ventanas posteriores a {fecha}: use el backfill para fechas pasadas")
+
+        sin_estado = [pid for pid in parroquias if pid not in estados]
+        if sin_estado:
+            semilla = fecha - UN_DIA
+            if not estados:
+                # Primera ejecución: agregar la historia de la ventana de 12 meses
+                refrescar_consumo_diario(conn, VENTANAS["12m"](semilla), semilla)
+            estados.update(sembrar_estados(conn, sin_estado, semilla))
+
+        desde_tardio = min(fecha - timedelta(days=ETL_LATE_DAYS),
+                           min((e.fecha for e in estados.values()), default=fecha) + UN_DIA)
+        anteriores, nuevos = refrescar_consumo_diario(conn, desde_tardio, fecha)
+        for (pid, dia) in set(anteriores) | set(nuevos):
+            estado = estados.get(pid)
+            if estado is None or dia > estado.fecha:
+                continue  # se sumará al avanzar
+            viejo, _ = anteriores.get((pid, dia), (CERO, 0))
+            nuevo, finalizadas = nuevos.get((pid, dia), (CERO, 0))
+            if nuevo != viejo:
+                estado.corregir(dia, nuevo - viejo)
+            if finalizadas and (estado.ultima_entrega is None or dia > estado.ultima_entrega):
+                estado.ultima_entrega = dia
+
+        filas = avanzar_estados(conn, estados, fecha, Pendientes(conn), _stock(conn))
+        guardar_features(conn, filas)
+        guardar_estados(conn, estados)
+
+    logging.info(f"ETL incremental {fecha}: {len(filas)} filas en {time.perf_counter() - t0:.2f}s")
+    return len(filas)
+
+
+# --- Paridad con el ETL set-based ---
+COLUMNAS_PARIDAD = ("consumo_7d", "consumo_30d", "promedio_12m", "dias_desde_ultima_entrega",
+                    "stock_actual", "entregas_pendientes", "proyeccion_72h", "indicador_riesgo")
+SQL_FEATURES_HOY = text(f"""
+    SELECT parroquia_id, {", ".join(COLUMNAS_PARIDAD)}
+    FROM features_parroquia_daily WHERE fecha = CURDATE()
+""")
+
+
+def verificar_paridad():
+    """
+    Compara las features de hoy ya escritas por el ETL incremental con las
+    que calcula features_diarias_setbased.sql. El SQL set-based corre en una
+    transacción que se revierte, así que la tabla no cambia.
+    Devuelve {parroquia_id: {columna: (incremental, setbased)}} con las diferencias.
+    """
+    with open(SETBASED_FILE, "r", encoding="utf-8") as fh:
+        sql_setbased = text(fh.read())
+    with get_engine().connect() as conn:
+        incremental = {r.parroquia_id: r._mapping for r in conn.execute(SQL_FEATURES_HOY)}
+        conn.rollback()
+        with conn.begin() as trans:
+            conn.execute(sql_setbased)
+            setbased = {r.parroquia_id: r._mapping for r in conn.execute(SQL_FEATURES_HOY)}
+            trans.rollback()
+
+    diferencias = {}
+    for pid in sorted(set(incremental) | set(setbased)):
+        a, b = incremental.get(pid), setbased.get(pid)
+        if a is None or b is None:
+            diferencias[pid] = {"fila": (a is not None, b is not None)}
+            continue
+        distintas = {c: (a[c], b[c]) for c in COLUMNAS_PARIDAD if a[c] != b[c]}
+        if distintas:
+            diferencias[pid] = distintas
+    logging.info(f"Paridad incremental vs setbased: {len(diferencias)} parroquias con diferencias")
+    return diferencias
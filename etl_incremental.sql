@@ -0,0 +1,30 @@
+-- etl_incremental.sql
+-- Tablas de apoyo del ETL incremental (etl_incremental.py)
+
+-- Consumo agregado por parroquia y día (solicitudes FINALIZADA / EN ENTREGA)
+CREATE TABLE IF NOT EXISTS consumo_parroquia_diario (
+    parroquia_id INT NOT NULL,
+    fecha DATE NOT NULL,
+    cantidad DECIMAL(12,2) NOT NULL DEFAULT 0,
+    solicitudes_finalizadas INT NOT NULL DEFAULT 0,
+
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (parroquia_id, fecha),
+    INDEX idx_consumo_diario_fecha (fecha)
+);
+
+-- Sumas de cada ventana al cierre del último día procesado, por parroquia
+CREATE TABLE IF NOT EXISTS etl_ventanas_parroquia (
+    parroquia_id INT PRIMARY KEY,
+    fecha DATE NOT NULL,
+    suma_7d DECIMAL(14,2) NOT NULL DEFAULT 0,
+    suma_30d DECIMAL(14,2) NOT NULL DEFAULT 0,
+    suma_12m DECIMAL(14,2) NOT NULL DEFAULT 0,
+    ultima_entrega DATE DEFAULT NULL,
+
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- El re-agregado diario y el backfill filtran solicitud por rango de fecha
+CREATE INDEX idx_solicitud_fecha_estado ON solicitud (fecha, estado);
@@ -0,0 +1,136 @@
+# etl_paralelo.py
+"""
+ETL de features_parroquia_daily repartido en particiones de parroquias.
+
+Cada partición ejecuta features_diarias_setbased.sql filtrado por :ids (los
+comentarios /*filtro_...*/ del archivo se reemplazan por el filtro) en su
+propia conexión del pool y en su propia transacción, así MySQL trabaja en
+varios hilos a la vez y un fallo sólo obliga a reintentar esa partición.
+
+Uso:
+    python etl_features_parroquia_daily.py --modo paralelo [--workers 4] [--particion-por municipio]
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+import logging
+import time
+
+from sqlalchemy import text, bindparam
+
+from config import (ETL_WORKERS, ETL_PARTITION_BY, ETL_PARTITION_RETRIES,
+                    DB_POOL_SIZE, DB_MAX_OVERFLOW)
+from db import get_engine
+
+QUERY_FILE = Path(__file__).resolve().parent.joinpath("features_diarias_setbased.sql")
+CRITERIOS = ("rango", "municipio")
+# Marcas de features_diarias_setbased.sql -> filtro de la partición
+FILTROS = {
+    "/*filtro_solicitud*/": "AND com.parroquia_id IN :ids",
+    "/*filtro_parroquia*/": "WHERE p.id IN :ids",
+}
+
+
+def _sql_particion():
+    with open(QUERY_FILE, "r", encoding="utf-8") as f:
+        sql = f.read()
+    for marca, filtro in FILTROS.items():
+        if sql.count(marca) != 1:
+            raise RuntimeError(f"{QUERY_FILE.name} debe contener una vez la marca {marca}")
+        sql = sql.replace(marca, filtro)
+    return text(sql).bindparams(bindparam("ids", expanding=True))
+
+
+def describir_error(e):
+    """Mensaje del driver sin el texto del SQL (str() de SQLAlchemy lo incluye)."""
+    orig = getattr(e, "orig", None)
+    return f"{type(e).__name__}: {orig if orig is not None else e}"
+
+
+def particionar(conn, n, por=ETL_PARTITION_BY):
+    """
+    Reparte las parroquias en `n` grupos:
+      - rango: ids consecutivos en bloques de igual tamaño
+      - municipio: municipios completos, repartidos para equilibrar tamaños
+    Devuelve [(etiqueta, ids)]; la etiqueta identifica la partición en el log.
+    """
+    if por not in CRITERIOS:
+        raise ValueError(f"Criterio de partición desconocido: {por} (opciones: {', '.join(CRITERIOS)})")
+    if por == "rango":
+        ids = [r[0] for r in conn.execute(text("SELECT id FROM parroquia ORDER BY id"))]
+        n = max(1, min(n, len(ids)))
+        tam, resto = divmod(len(ids), n)
+        grupos, inicio = [], 0
+        for i in range(n):
+            fin = inicio + tam + (1 if i < resto else 0)
+            grupos.append(ids[inicio:fin])
+            inicio = fin
+        return [(f"rango de ids {g[0]}..{g[-1]}", g) for g in grupos if g]
+
+    por_municipio = {}
+    for pid, municipio in conn.execute(text("SELECT id, municipio_id FROM parroquia ORDER BY id")):
+        por_municipio.setdefault(municipio, []).append(pid)
+    grupos = [([], []) for _ in range(max(1, min(n, len(por_municipio))))]
+    # Municipios más grandes primero, cada uno al grupo con menos parroquias
+    for municipio, ids in sorted(por_municipio.items(), key=lambda m: len(m[1]), reverse=True):
+        municipios, parroquias = min(grupos, key=lambda g: len(g[1]))
+        municipios.append(municipio)
+        parroquias.extend(ids)
+    return [(f"municipios {', '.join(str(m) for m in sorted(municipios))}", parroquias)
+            for municipios, parroquias in grupos if parroquias]
+
+
+def _ejecutar_particion(engine, sql, indice, etiqueta, ids, reintentos):
+    for intento in range(1, reintentos + 2):
+        t0 = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                conn.execute(sql, {"ids": ids})
+            duracion = time.perf_counter() - t0
+            logging.info(f"Partición {indice} ({len(ids)} parroquias, {etiqueta}): "
+                         f"{duracion:.2f}s, intento {intento}")
+            return {"particion": indice, "parroquias": len(ids), "duracion_s": round(duracion, 3),
+                    "intentos": intento}
+        except Exception as e:
+            logging.warning(f"Partición {indice} ({etiqueta}) falló en el intento {intento}: "
+                            f"{describir_error(e)}")
+            if intento > reintentos:
+                raise
+            time.sleep(min(2 ** (intento - 1), 10))
+
+
+def run_paralelo(workers=ETL_WORKERS, por=ETL_PARTITION_BY, particiones=None, reintentos=ETL_PARTITION_RETRIES):
+    """
+    Ejecuta el ETL por particiones con `workers` hilos. Devuelve el resumen
+    por partición; si alguna falla tras sus reintentos lanza RuntimeError
+    (las demás particiones quedan confirmadas).
+    """
+    engine = get_engine()
+    limite_pool = DB_POOL_SIZE + DB_MAX_OVERFLOW
+    if workers > limite_pool:
+        logging.warning(f"ETL paralelo: {workers} workers pero el pool admite {limite_pool} conexiones; "
+                        f"se usan {limite_pool}")
+        workers = limite_pool
+    sql = _sql_particion()
+
+    with engine.connect() as conn:
+        grupos = particionar(conn, particiones or workers, por)
+    logging.info(f"ETL paralelo: {len(grupos)} particiones por {por}, {workers} workers")
+
+    t0 = time.perf_counter()
+    resumen, fallidas = [], []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="etl") as pool:
+        futuros = {pool.submit(_ejecutar_particion, engine, sql, i, etiqueta, ids, reintentos): i
+                   for i, (etiqueta, ids) in enumerate(grupos)}
+        for fut in as_completed(futuros):
+            try:
+                resumen.append(fut.result())
+            except Exception as e:
+                fallidas.append(futuros[fut])
+                logging.error(f"Partición {futuros[fut]} sin completar: {describir_error(e)}")
+
+    total = time.perf_counter() - t0
+    logging.info(f"ETL paralelo terminado en {total:.2f}s "
+                 f"({len(resumen)} particiones ok, {len(fallidas)} fallidas)")
+    if fallidas:
+        raise RuntimeError(f"Particiones fallidas: {sorted(fallidas)}")
+    return sorted(resumen, key=lambda r: r["particion"])
@@ -0,0 +1,88 @@
+-- features_diarias_setbased.sql
+-- Misma salida que features_diarias.sql, pero en una sola pasada sobre solicitud:
+--  - el join solicitud -> vocero -> consejo -> comunidad se hace una vez
+--  - las ventanas de 7d, 30d y 12m, la última entrega y los pendientes salen
+--    de agregaciones condicionales en un único GROUP BY por parroquia
+--  - el stock global de almacen se calcula una vez (no por parroquia)
+
+INSERT INTO features_parroquia_daily (
+    parroquia_id,
+    fecha,
+    consumo_7d,
+    consumo_30d,
+    promedio_12m,
+    dias_desde_ultima_entrega,
+    stock_actual,
+    stock_minimo,
+    entregas_pendientes,
+    proyeccion_72h,
+    indicador_riesgo,
+    calidad_datos
+)
+SELECT
+    p.id AS parroquia_id,
+    CURDATE() AS fecha,
+    COALESCE(a.consumo_7d, 0) AS consumo_7d,
+    COALESCE(a.consumo_30d, 0) AS consumo_30d,
+    COALESCE(a.consumo_12m / 12, 0) AS promedio_12m,
+    DATEDIFF(CURDATE(), COALESCE(a.ultima_entrega, CURDATE())) AS dias_desde_ultima_entrega,
+    st.litraje_total AS stock_actual,
+    NULL AS stock_minimo,
+    COALESCE(a.pendientes, 0) AS entregas_pendientes,
+    ROUND((COALESCE(a.consumo_7d, 0) / 7) * 3, 2) AS proyeccion_72h,
+    CASE WHEN COALESCE(a.consumo_7d, 0) = 0 THEN 0 ELSE NULL END AS indicador_riesgo,
+    CASE WHEN p.id IS NULL THEN 'SIN_PARROQUIA' ELSE 'OK' END AS calidad_datos
+
+FROM parroquia p
+
+CROSS JOIN (
+    SELECT MAX(litraje_total) AS litraje_total
+    FROM almacen
+) st
+
+LEFT JOIN (
+    SELECT
+        com.parroquia_id,
+
+        -- consumo por ventana (cilindros de solicitudes finalizadas/entregadas)
+        SUM(CASE WHEN s.estado IN ('FINALIZADA','EN ENTREGA')
+                  AND s.fecha BETWEEN CURDATE() - INTERVAL 7 DAY AND CURDATE()
+                 THEN sc.cantidad END) AS consumo_7d,
+        SUM(CASE WHEN s.estado IN ('FINALIZADA','EN ENTREGA')
+                  AND s.fecha BETWEEN CURDATE() - INTERVAL 30 DAY AND CURDATE()
+                 THEN sc.cantidad END) AS consumo_30d,
+        SUM(CASE WHEN s.estado IN ('FINALIZADA','EN ENTREGA')
+                  AND s.fecha BETWEEN CURDATE() - INTERVAL 12 MONTH AND CURDATE()
+                 THEN sc.cantidad END) AS consumo_12m,
+
+        -- última solicitud finalizada (proxy de última entrega)
+        MAX(CASE WHEN s.estado IN ('FINALIZADA','EN ENTREGA') THEN s.fecha END) AS ultima_entrega,
+
+        -- solicitudes pendientes (DISTINCT: el LEFT JOIN repite la solicitud por cilindro)
+        COUNT(DISTINCT CASE WHEN s.estado IN ('PENDIENTE','EN PROCESO','POR PAGAR','VALIDANDO')
+                            THEN s.id END) AS pendientes
+
+    FROM solicitud s
+    JOIN vocero_comunal v ON v.cedula = s.vocero_comunal
+    JOIN consejo_comunal cc ON cc.rif = v.consejo_comunal_rif
+    JOIN comunidad com ON com.id = cc.comunidad_id
+    LEFT JOIN solicitud_cilindro sc ON sc.solicitud_id = s.id
+    WHERE s.estado IN ('FINALIZADA','EN ENTREGA',
+                       'PENDIENTE','EN PROCESO','POR PAGAR','VALIDANDO')
+      /*filtro_solicitud*/
+    GROUP BY com.parroquia_id
+) a ON a.parroquia_id = p.id
+/*filtro_parroquia*/
+
+ON DUPLICATE KEY UPDATE
+    consumo_7d = VALUES(consumo_7d),
+    consumo_30d = VALUES(consumo_30d),
+    promedio_12m = VALUES(promedio_12m),
+    dias_desde_ultima_entrega = VALUES(dias_desde_ultima_entrega),
+    stock_actual = VALUES(stock_actual),
+    stock_minimo = VALUES(stock_minimo),
+    entregas_pendientes = VALUES(entregas_pendientes),
+    proyeccion_72h = VALUES(proyeccion_72h),
+    indicador_riesgo = VALUES(indicador_riesgo),
+    calidad_datos = VALUES(calidad_datos),
+    updated_at = CURRENT_TIMESTAMP;
@@ -0,0 +1,140 @@
+# features_index.py
+"""
+Índice en memoria de features_parroquia_daily para resolver las features
+de una parroquia en el servidor.
+
+Se cargan los últimos FEATURES_INDEX_DAYS días en arreglos compactos:
+  - `valores`: matriz float64 (filas x 9 features, NaN donde la columna es NULL)
+  - `claves`: int64 ordenado, parroquia << 32 | ordinal de la fecha
+  - `ultima`: parroquia -> fila de su fecha más reciente
+Buscar por (parroquia, fecha) es una búsqueda binaria en `claves`; sin
+fecha, un acceso a `ultima`.
+
+Las columnas de la tabla (stock_minimo, entregas_pendientes) se devuelven
+con los nombres de la API (stock_capacidad, solicitudes_pendientes): el
+modelo se alinea por posición (ver model_loader.FEATURES).
+
+El índice se reconstruye completo y se reemplaza con un único cambio de
+referencia cuando cambia la marca (MAX(fecha), MAX(updated_at)) de la tabla,
+que se revisa cada FEATURES_INDEX_REFRESH_INTERVAL segundos.
+"""
+from datetime import date, timedelta
+import logging
+import threading
+
+import numpy as np
+from sqlalchemy import text
+
+from config import FEATURES_INDEX_DAYS, FEATURES_INDEX_REFRESH_INTERVAL
+from dataset_entrenamiento import FEATURES as COLUMNAS_DB
+from db import get_engine
+
+SQL_FIRMA = text("SELECT MAX(fecha), MAX(updated_at), COUNT(*) FROM features_parroquia_daily")
+SQL_FILAS = text(f"""
+    SELECT parroquia_id, fecha, {", ".join(COLUMNAS_DB)}
+    FROM features_parroquia_daily
+    WHERE fecha >= :desde
+    ORDER BY parroquia_id, fecha
+""")
+
+
+def _clave(parroquia_id, fecha):
+    return (int(parroquia_id) << 32) | fecha.toordinal()
+
+
+class _Datos:
+    """Contenido inmutable de una carga del índice."""
+    __slots__ = ("claves", "valores", "fechas", "ultima")
+
+    def __init__(self, filas):
+        n = len(filas)
+        self.claves = np.empty(n, dtype=np.int64)
+        self.fechas = np.empty(n, dtype=np.int32)
+        self.valores = np.empty((n, len(COLUMNAS_DB)), dtype=np.float64)
+        self.ultima = {}
+        for i, fila in enumerate(filas):
+            fecha = fila[1] if isinstance(fila[1], date) else date.fromisoformat(str(fila[1])[:10])
+            self.claves[i] = _clave(fila[0], fecha)
+            self.fechas[i] = fecha.toordinal()
+            # NULL -> NaN: el árbol lo manda por la rama de valores faltantes
+            self.valores[i] = [np.nan if v is None else float(v) for v in fila[2:]]
+            # Filas ordenadas por (parroquia, fecha): `claves` queda ordenada y
+            # la última fila vista de cada parroquia es la más reciente
+            self.ultima[int(fila[0])] = i
+
+    def fila(self, parroquia_id, fecha=None):
+        if fecha is None:
+            return self.ultima.get(parroquia_id)
+        clave = _clave(parroquia_id, fecha)
+        i = int(np.searchsorted(self.claves, clave))
+        return i if i < len(self.claves) and self.claves[i] == clave else None
+
+
+class IndiceFeatures:
+    def __init__(self, nombres, dias=FEATURES_INDEX_DAYS, interval=FEATURES_INDEX_REFRESH_INTERVAL):
+        # Nombres con los que se devuelven las features (los de la API, en el orden del modelo)
+        self.nombres = list(nombres)
+        self.dias = dias
+        self.interval = interval
+        self._datos = _Datos([])
+        self._firma = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def buscar(self, parroquia_id, fecha=None):
+        """
+        Devuelve (features, fecha) con las features de la parroquia en `fecha`
+        (por defecto su fecha más reciente en el índice) o None si no están.
+        """
+        datos = self._datos
+        i = datos.fila(parroquia_id, fecha)
+        if i is None:
+            return None
+        return dict(zip(self.nombres, datos.valores[i].tolist())), date.fromordinal(int(datos.fechas[i]))
+
+    def __len__(self):
+        return len(self._datos.claves)
+
+    def refrescar(self, force=False):
+        """Reconstruye el índice si la tabla cambió. Devuelve True si se reemplazó."""
+        with get_engine().connect() as conn:
+            firma = tuple(conn.execute(SQL_FIRMA).fetchone())
+            if not force and firma == self._firma:
+                return False
+            filas = []
+            if firma[0] is not None:
+                ultima = firma[0] if isinstance(firma[0], date) else date.fromisoformat(str(firma[0])[:10])
+                desde = ultima - timedelta(days=self.dias - 1)
+                filas = conn.execute(SQL_FILAS, {"desde": desde}).fetchall()
+        self._datos, self._firma = _Datos(filas), firma
+        logging.info(f"Índice de features: {len(filas)} filas, {len(self._datos.ultima)} parroquias")
+        return True
+
+    def stats(self):
+        datos = self._datos
+        return {
+            "filas": len(datos.claves),
+            "parroquias": len(datos.ultima),
+            "fecha_max": str(date.fromordinal(int(datos.fechas.max()))) if len(datos.fechas) else None,
+            "bytes": int(datos.claves.nbytes + datos.fechas.nbytes + datos.valores.nbytes),
+        }
+
+    def start(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="features-index", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refrescar()
+            except Exception as e:
+                logging.error(f"Error refrescando el índice de features: {e}")
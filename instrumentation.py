@@ -0,0 +1,240 @@
+# instrumentation.py
+"""
+Métricas del servicio en formato de texto de Prometheus (sin dependencias).
+
+- MetricasMiddleware (ASGI puro) cuenta cada request por endpoint, método y
+  status, y mide su duración total.
+- Dentro del request, `etapa(nombre)` mide una parte del trabajo (jwt,
+  predicción, auditoría...). Los tiempos se acumulan en un dict del request
+  (contextvar) y el middleware los vuelca al histograma al terminar, con la
+  ruta como etiqueta.
+- `marcar_handler()` al inicio de un endpoint permite derivar la etapa
+  "validacion": lectura del body, validación Pydantic y despacho al
+  threadpool, es decir, lo que pasa antes del handler sin contar el JWT.
+- Los colectores registrados con `registro.colector(fn)` aportan valores
+  que se leen al exportar (pool de BD, memoria, versión del modelo).
+
+Cada observación es una suma bajo un lock por métrica: el costo por request
+es de unos pocos microsegundos.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import bisect
+import os
+import threading
+import time
+
+# Límites (segundos) de los histogramas de latencia
+BUCKETS_LATENCIA = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(nombres, valores, extra=""):
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _numero(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre, self.ayuda, self.etiquetas = nombre, ayuda, tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *valores, cantidad=1):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + cantidad
+
+    def exportar(self):
+        with self._lock:
+            valores = sorted(self._valores.items())
+        return [f"{self.nombre}{_etiquetas(self.etiquetas, k)} {_numero(v)}" for k, v in valores]
+
+
+class Histograma:
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        self.nombre, self.ayuda, self.etiquetas = nombre, ayuda, tuple(etiquetas)
+        self.buckets = tuple(buckets)
+        self._series = {}   # etiquetas -> [conteos por bucket (no acumulados)..., suma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *valores):
+        i = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def exportar(self):
+        with self._lock:
+            series = sorted((k, list(v)) for k, v in self._series.items())
+        lineas = []
+        for valores, serie in series:
+            acumulado = 0
+            for limite, n in zip(self.buckets + (float("inf"),), serie):
+                acumulado += n
+                le = f'le="{_numero(limite)}"'
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, valores, le)} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, valores)} {_numero(serie[-2])}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, valores)} {serie[-1]}")
+        return lineas
+
+
+class Registro:
+    def __init__(self):
+        self._metricas = []
+        self._colectores = []
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        m = Contador(nombre, ayuda, etiquetas)
+        self._metricas.append(m)
+        return m
+
+    def histograma(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        m = Histograma(nombre, ayuda, etiquetas, buckets)
+        self._metricas.append(m)
+        return m
+
+    def colector(self, fn):
+        """
+        Registra `fn()` -> [(nombre, tipo, ayuda, {etiquetas: valor} o valor)],
+        que se evalúa en cada exportación. Se puede usar como decorador.
+        """
+        self._colectores.append(fn)
+        return fn
+
+    def exportar(self):
+        lineas = []
+        for m in self._metricas:
+            lineas += [f"# HELP {m.nombre} {m.ayuda}", f"# TYPE {m.nombre} {m.tipo}"]
+            lineas += m.exportar()
+        for fn in self._colectores:
+            try:
+                familias = fn()
+            except Exception:
+                continue
+            for nombre, tipo, ayuda, valores in familias:
+                lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+                if not isinstance(valores, dict):
+                    valores = {(): valores}
+                for etiquetas, v in valores.items():
+                    if v is None:
+                        continue
+                    nombres = [n for n, _ in etiquetas]
+                    lineas.append(f"{nombre}{_etiquetas(nombres, [x for _, x in etiquetas])} {_numero(v)}")
+        return "\n".join(lineas) + "\n"
+
+
+registro = Registro()
+
+REQUESTS = registro.contador(
+    "epsdc_http_requests_total", "Requests atendidos", ("endpoint", "method", "status"))
+DURACION = registro.histograma(
+    "epsdc_http_request_duration_seconds", "Duración total del request", ("endpoint", "method"))
+ETAPAS = registro.histograma(
+    "epsdc_request_stage_duration_seconds", "Duración de cada etapa del request", ("endpoint", "etapa"))
+PREDICCIONES = registro.contador(
+    "epsdc_predictions_total", "Predicciones emitidas por etiqueta", ("prediction", "model_version"))
+
+
+# --- Etapas dentro del request ---
+_etapas: ContextVar = ContextVar("epsdc_etapas", default=None)
+
+
+@contextmanager
+def etapa(nombre):
+    tiempos = _etapas.get()
+    if tiempos is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        tiempos[nombre] = tiempos.get(nombre, 0.0) + time.perf_counter() - t0
+
+
+def marcar_handler():
+    """Marca el inicio del handler (para la etapa 'validacion')."""
+    tiempos = _etapas.get()
+    if tiempos is not None:
+        tiempos["_handler"] = time.perf_counter()
+
+
+def contar_predicciones(etiquetas, version):
+    for etiqueta in etiquetas:
+        PREDICCIONES.inc(etiqueta, version)
+
+
+class MetricasMiddleware:
+    """Middleware ASGI: conteo y duración por endpoint y volcado de las etapas."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        tiempos = {}
+        token = _etapas.set(tiempos)
+        status = [500]
+
+        async def send_con_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_con_status)
+        finally:
+            _etapas.reset(token)
+            total = time.perf_counter() - t0
+            route = scope.get("route")
+            # La plantilla de la ruta (no el path) mantiene acotadas las etiquetas
+            endpoint = getattr(route, "path", None) or "sin_ruta"
+            method = scope.get("method", "")
+            REQUESTS.inc(endpoint, method, str(status[0]))
+            DURACION.observar(total, endpoint, method)
+            inicio_handler = tiempos.pop("_handler", None)
+            if inicio_handler is not None:
+                tiempos["validacion"] = max(0.0, inicio_handler - t0 - tiempos.get("jwt", 0.0))
+            for nombre, segundos in tiempos.items():
+                ETAPAS.observar(segundos, endpoint, nombre)
+
+
+# --- Colectores de proceso ---
+def memoria_residente_bytes():
+    """RSS actual del proceso (Linux: /proc/self/statm; en otro caso el pico)."""
+    try:
+        with open("/proc/self/statm", "r") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        from memoria import peak_rss_mb
+        pico = peak_rss_mb()
+        return None if pico is None else int(pico * 1024 * 1024)
+
+
+@registro.colector
+def _proceso():
+    return [("process_resident_memory_bytes", "gauge", "Memoria residente del proceso",
+             memoria_residente_bytes())]
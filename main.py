@@ -1,28 +1,145 @@
 # main.py
-from fastapi import FastAPI, Depends, HTTPException
+import time
+# Inicio de los imports, para reportar cuánto tarda el arranque
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
-from auth import verificar_jwt
-from model_loader import load_model, predict_from_dict
+from auth import verificar_jwt, verificar_jwt_async, token_cache_stats
+from model_loader import (load_model, reload_model, active_model, loaded_model, start_watcher,
+                          on_reload, predict_from_dict, predict_batch, FEATURES)
+from typing import List, Optional, Union
 import logging
-from datetime import datetime
-import subprocess
-import json
-from sqlalchemy import create_engine, text
-from config import DB_URI
+from datetime import datetime, date
+import base64
+import threading
+from cache import TTLCache
+from audit import audit_writer
+from drift_online import OnlineDriftMonitor
+from ejecutor_cpu import EjecutorCPU, EjecutorSaturado
+from instrumentation import (MetricasMiddleware, registro, etapa, marcar_handler,
+                             contar_predicciones)
 import os
 
-from config import LOG_FILE
+from config import (LOG_FILE, BATCH_MAX_ROWS, MODEL_DIR, MODEL_WATCH_INTERVAL,
+                    METRICS_CACHE_TTL, METRICS_HISTORY_MAX_LIMIT, DRIFT_ONLINE_ENABLED,
+                    METRICS_PROM_ENABLED, METRICS_PROM_PATH,
+                    PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL, INFERENCE_SLIM, API_ASYNC)
+
+# SQLAlchemy (db.py), el índice de features, las recomendaciones diarias y la
+# cola de reentrenamiento se importan donde se usan: el camino de predicción
+# no los necesita para arrancar.
+IMPORT_SECONDS = time.perf_counter() - _import_started
+startup_seconds = None
 
 app = FastAPI(title="IA EPSDC - Servicio de Inferencia")
+if METRICS_PROM_ENABLED:
+    app.add_middleware(MetricasMiddleware)
+
+# Modo API_ASYNC: el JWT se verifica en el event loop y los lotes se puntúan
+# en un ejecutor propio acotado a los núcleos (ver ejecutor_cpu.py)
+auth_dependency = verificar_jwt_async if API_ASYNC else verificar_jwt
+cpu_executor = EjecutorCPU() if API_ASYNC else None
 
 # Configuración de log
 logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
                     format="%(asctime)s [%(levelname)s] %(message)s")
 
+# Respuestas de /metrics y /metrics/history: sólo cambian cuando se registra
+# una versión nueva, así que se sirven desde memoria hasta entonces. El TTL
+# cubre versiones registradas por otro proceso sin pasar por este servidor.
+metrics_cache = TTLCache(maxsize=256, ttl=METRICS_CACHE_TTL)
+
+# Resultados de inferencia por (versión, valores de entrada). Las features de
+# una parroquia cambian una vez por corrida del ETL, así que los refrescos
+# repetidos del mismo tablero se responden sin recorrer el árbol.
+prediction_cache = (TTLCache(maxsize=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL)
+                    if PREDICTION_CACHE_SIZE > 0 else None)
+
+@on_reload
+def _invalidate_metrics_cache(bundle=None):
+    metrics_cache.clear()
+    if prediction_cache is not None:
+        # La versión ya forma parte de la clave; vaciar libera las entradas viejas
+        prediction_cache.clear()
+
+# Distribución de las entradas y predicciones recibidas frente a la de
+# entrenamiento de la versión activa (ver drift_online.py)
+drift_monitor = OnlineDriftMonitor(FEATURES)
+
+# Recomendaciones del día precalculadas tras el ETL, servidas desde memoria, y
+# features de los últimos días por parroquia, para predecir con sólo el id.
+# Se crean en el arranque (ver _start_db_components); hasta entonces son None.
+daily_recommendations = None
+features_index = None
+
+@on_reload
+def _update_drift_profile(bundle):
+    drift_monitor.set_profile(bundle.profile, bundle.version)
+
+def _start_db_components():
+    """Carga las recomendaciones diarias y el índice de features desde la BD y los publica."""
+    global daily_recommendations, features_index
+    from recomendaciones_diarias import MapaRecomendaciones
+    from features_index import IndiceFeatures
+
+    recommendations = MapaRecomendaciones()
+    try:
+        recommendations.refrescar(force=True)
+    except Exception as e:
+        logging.error(f"No se pudieron cargar las recomendaciones diarias: {e}")
+    recommendations.start()
+    index = IndiceFeatures(FEATURES)
+    try:
+        index.refrescar(force=True)
+    except Exception as e:
+        logging.error(f"No se pudo cargar el índice de features: {e}")
+    index.start()
+    daily_recommendations, features_index = recommendations, index
+
 # Cargar modelo al iniciar
 @app.on_event("startup")
 def startup_event():
-    load_model()
+    global startup_seconds
+    t0 = time.perf_counter()
+    bundle = load_model()
+    audit_writer.start()
+    if DRIFT_ONLINE_ENABLED:
+        drift_monitor.set_profile(bundle.profile, bundle.version)
+        drift_monitor.start()
+    if INFERENCE_SLIM:
+        # La API responde predicciones en cuanto carga el modelo; los datos de
+        # BD llegan detrás (mientras tanto esos endpoints responden 503)
+        threading.Thread(target=_start_db_components, name="db-components", daemon=True).start()
+    else:
+        _start_db_components()
+    # Recargar automáticamente cuando un reentrenamiento publique otra versión
+    start_watcher(MODEL_WATCH_INTERVAL)
+    startup_seconds = time.perf_counter() - t0
+    logging.info(f"Arranque: imports {IMPORT_SECONDS:.3f}s, startup {startup_seconds:.3f}s "
+                 f"(INFERENCE_SLIM={INFERENCE_SLIM})")
+    print(f"🚀 API lista: imports {IMPORT_SECONDS:.2f}s, arranque {startup_seconds:.2f}s")
+
+@app.on_event("shutdown")
+def shutdown_event():
+    import retrain_jobs
+    from db import dispose_engine
+    retrain_jobs.shutdown()
+    audit_writer.stop()
+    drift_monitor.stop()
+    if daily_recommendations is not None:
+        daily_recommendations.stop()
+    if features_index is not None:
+        features_index.stop()
+    dispose_engine()
+
+if API_ASYNC:
+    @app.on_event("shutdown")
+    async def shutdown_async():
+        from db import dispose_async_engine
+        cpu_executor.shutdown()
+        await dispose_async_engine()
 
 # --- MODELOS DE DATOS ---
 class FeaturesInput(BaseModel):
@@ -36,86 +153,411 @@ class FeaturesInput(BaseModel):
     proyeccion_72h: float
     indicador_riesgo: float
 
+class ParroquiaInput(BaseModel):
+    """Sólo la parroquia (y opcionalmente la fecha): las features las resuelve el servidor."""
+    parroquia_id: int
+    fecha: Optional[date] = None
+
+def _resolve_features(data):
+    """
+    Devuelve (features, entrada para la bitácora, extra para la respuesta).
+    Un ParroquiaInput se resuelve con el índice en memoria de features_parroquia_daily.
+    """
+    if isinstance(data, FeaturesInput):
+        features = data.dict()
+        return features, features, {}
+    if features_index is None:
+        raise HTTPException(status_code=503, detail="El índice de features todavía se está cargando")
+    found = features_index.buscar(data.parroquia_id, data.fecha)
+    if found is None:
+        cuando = f" el {data.fecha}" if data.fecha else ""
+        raise HTTPException(status_code=404,
+                            detail=f"No hay features de la parroquia {data.parroquia_id}{cuando}")
+    features, fecha = found
+    ref = {"parroquia_id": data.parroquia_id, "fecha": str(fecha)}
+    return features, ref, ref
+
+def _prediction_key(features, bundle):
+    # NaN (columna NULL en el índice) no es igual a sí mismo: se normaliza a None
+    return (bundle.version, tuple(None if v != v else v for v in (float(features[f]) for f in FEATURES)))
+
+def _predict_cached(features, bundle):
+    if prediction_cache is None:
+        return predict_from_dict(features, bundle)
+    key = _prediction_key(features, bundle)
+    result = prediction_cache.get(key)
+    if result is None:
+        result = predict_from_dict(features, bundle)
+        prediction_cache.set(key, result)
+    return result
+
+def _predict_batch_cached(rows, bundle):
+    """Como predict_batch, pero sólo puntúa (en una pasada) las filas que no están en caché."""
+    if prediction_cache is None:
+        return predict_batch(rows, bundle)
+    keys = [_prediction_key(row, bundle) for row in rows]
+    results = [prediction_cache.get(key) for key in keys]
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        for i, result in zip(missing, predict_batch([rows[i] for i in missing], bundle)):
+            results[i] = result
+            prediction_cache.set(keys[i], result)
+    return results
+
 # --- ENDPOINTS ---
 @app.get("/api/v1/status")
-def status(user=Depends(verificar_jwt)):
+def status(user=Depends(auth_dependency)):
     return {"status": "ok", "message": "IA operativa", "user": user.get("username")}
 
-@app.post("/api/v1/recommendations")
-def predict(data: FeaturesInput, user=Depends(verificar_jwt)):
-    result = predict_from_dict(data.dict())
+def _predict(data, user):
+    bundle = active_model()
+    with etapa("prediccion"):
+        features, audit_input, extra = _resolve_features(data)
+        result = _predict_cached(features, bundle)
 
-    # Registrar en bitácora
-    logging.info(f"Usuario:{user.get('username','?')} "
-                 f"Predicción:{result['prediction']} "
-                 f"Confianza:{result['confidence']}")
+    # Registrar en bitácora (se escribe en lote desde un hilo de fondo)
+    with etapa("auditoria"):
+        audit_writer.record(user.get('username', '?'), "recomendacion",
+                            input=audit_input, output=result, confianza=result["confidence"])
+    if DRIFT_ONLINE_ENABLED:
+        with etapa("drift"):
+            drift_monitor.observe(features, result["prediction"])
+    contar_predicciones((result["prediction"],), bundle.version)
 
     return {
         "timestamp": datetime.utcnow().isoformat(),
-        "model_version": "cart_v1",
+        "model_version": bundle.version,
         "prediction": result["prediction"],
         "confidence": result["confidence"],
-        "probabilities": result["probabilities"]
+        "probabilities": result["probabilities"],
+        **extra
     }
 
-@app.post("/api/v1/retrain")
-def retrain(user=Depends(verificar_jwt)):
+def _predict_batch(data, user):
+    bundle = active_model()
+    with etapa("prediccion"):
+        resolved = [_resolve_features(row) for row in data]
+        rows = [features for features, _, _ in resolved]
+        results = _predict_batch_cached(rows, bundle)
+    labels = [r["prediction"] for r in results]
+
+    # Registrar en bitácora (un registro por lote)
+    with etapa("auditoria"):
+        audit_writer.record(user.get('username', '?'), "recomendacion_lote",
+                            input=[audit_input for _, audit_input, _ in resolved], output=labels)
+    if DRIFT_ONLINE_ENABLED:
+        with etapa("drift"):
+            drift_monitor.observe_many(rows, labels)
+    contar_predicciones(labels, bundle.version)
+
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "model_version": bundle.version,
+        "count": len(results),
+        "results": [{**result, **extra} if extra else result
+                    for result, (_, _, extra) in zip(results, resolved)]
+    }
+
+def _check_batch_size(data):
+    if len(data) > BATCH_MAX_ROWS:
+        raise HTTPException(status_code=413,
+                            detail=f"El lote excede el máximo de {BATCH_MAX_ROWS} filas")
+
+if API_ASYNC:
+    @app.post("/api/v1/recommendations")
+    async def predict(data: Union[FeaturesInput, ParroquiaInput], user=Depends(auth_dependency)):
+        # Una fila recorre el árbol en microsegundos, menos que el salto a
+        # otro hilo: se puntúa en el loop
+        marcar_handler()
+        return _predict(data, user)
+
+    @app.post("/api/v1/recommendations/batch")
+    async def predict_batch_endpoint(data: List[Union[FeaturesInput, ParroquiaInput]],
+                                     user=Depends(auth_dependency)):
+        """Como en modo sincrónico, pero el lote se puntúa en el ejecutor de CPU."""
+        _check_batch_size(data)
+        marcar_handler()
+        try:
+            return await cpu_executor.run(_predict_batch, data, user)
+        except EjecutorSaturado as e:
+            raise HTTPException(status_code=503, detail=f"Servidor saturado: {e}")
+else:
+    @app.post("/api/v1/recommendations")
+    def predict(data: Union[FeaturesInput, ParroquiaInput], user=Depends(auth_dependency)):
+        marcar_handler()
+        return _predict(data, user)
+
+    @app.post("/api/v1/recommendations/batch")
+    def predict_batch_endpoint(data: List[Union[FeaturesInput, ParroquiaInput]],
+                               user=Depends(auth_dependency)):
+        """
+        Puntúa una lista de filas en una sola llamada al modelo. Cada fila trae
+        sus features o sólo la parroquia (ver ParroquiaInput).
+        Los resultados se devuelven en el mismo orden de entrada.
+        """
+        _check_batch_size(data)
+        marcar_handler()
+        return _predict_batch(data, user)
+
+@app.get("/api/v1/recommendations/{parroquia_id}")
+def get_daily_recommendation(parroquia_id: int, user=Depends(auth_dependency)):
+    """
+    Recomendación del día de una parroquia, puntuada tras el ETL con el modelo
+    activo en ese momento (sin ejecutar el modelo en el request).
+    """
+    if daily_recommendations is None:
+        raise HTTPException(status_code=503, detail="Las recomendaciones diarias todavía se están cargando")
+    rec = daily_recommendations.get(parroquia_id)
+    if rec is None:
+        raise HTTPException(status_code=404,
+                            detail=f"No hay recomendación precalculada para la parroquia {parroquia_id}")
+    audit_writer.record(user.get('username', '?'), "recomendacion_diaria",
+                        input={"parroquia_id": parroquia_id}, output=rec, confianza=rec["confidence"])
+    return rec
+
+def _on_retrain_success(job):
+    # Activar la nueva versión en este worker; los demás la toman del watcher
+    _invalidate_metrics_cache()
+    reload_model()
+
+@app.post("/api/v1/retrain", status_code=202)
+def retrain(user=Depends(auth_dependency)):
+    """
+    Encola un reentrenamiento y responde de inmediato con el id del trabajo.
+    El progreso se consulta en GET /api/v1/retrain/{job_id}.
+    """
     # Por ahora, desactivamos validación de rol (ya que no usas Laravel)
+    import retrain_jobs
     try:
-        result = subprocess.run(
-            ["python", "retrain_model.py"],
-            capture_output=True, text=True, check=True
-        )
+        job = retrain_jobs.submit(user.get("username", "?"), on_success=_on_retrain_success)
+    except retrain_jobs.RetrainBusy as e:
+        raise HTTPException(status_code=409, detail=f"{e}")
 
-        # Extraer resumen del JSON (si el script lo devuelve)
-        print(result.stdout)
-        return {"status": "ok", "message": "Reentrenamiento completado", "output": result.stdout}
+    audit_writer.record(user.get('username', '?'), "reentrenamiento", output={"job_id": job.id})
+    return {"status": job.status, "message": "Reentrenamiento encolado", "job_id": job.id}
 
-    except subprocess.CalledProcessError as e:
-        raise HTTPException(status_code=500, detail=f"Error al reentrenar: {e.stderr}")
+@app.get("/api/v1/retrain/{job_id}")
+def retrain_status(job_id: str, user=Depends(auth_dependency)):
+    import retrain_jobs
+    job = retrain_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo de reentrenamiento no encontrado")
+    return job.to_dict()
 
-@app.get("/api/v1/metrics")
-def get_metrics(user=Depends(verificar_jwt)):
+@app.post("/api/v1/model/reload")
+def reload(user=Depends(auth_dependency)):
     """
-    Devuelve información de la versión actual del modelo,
-    sus métricas y estado general.
+    Carga la versión publicada en disco y la activa sin reiniciar.
+    Si la nueva versión no pasa la verificación se conserva la actual.
     """
-    try:
-        engine = create_engine(DB_URI)
-        with engine.connect() as conn:
-            # Obtener última versión registrada
-            result = conn.execute(text("""
-                SELECT version_name, fecha_entrenamiento, accuracy, f1,
-                       dataset_size, comentario
-                FROM ai_model_versions
-                ORDER BY fecha_entrenamiento DESC
-                LIMIT 1
-            """)).fetchone()
-
-        if result:
-            return {
-                "version": result.version_name,
-                "fecha_entrenamiento": str(result.fecha_entrenamiento),
-                "accuracy": float(result.accuracy),
-                "f1_score": float(result.f1),
-                "dataset_size": int(result.dataset_size),
-                "comentario": result.comentario,
-                "modelo_existe": os.path.exists(f"modelo_cart_{result.version_name}.joblib")
-            }
-        else:
-            return {"status": "empty", "message": "No hay modelos registrados aún."}
+    changed, version = reload_model(force=True)
+    return {"status": "ok" if changed else "sin_cambios", "model_version": version}
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al obtener métricas: {e}")
+SQL_LATEST_METRICS = """
+    SELECT version_name, fecha_entrenamiento, accuracy, f1,
+           dataset_size, comentario
+    FROM ai_model_versions
+    ORDER BY fecha_entrenamiento DESC, id DESC
+    LIMIT 1
+"""
+
+def _latest_metrics(result):
+    if result:
+        return {
+            "version": result.version_name,
+            "fecha_entrenamiento": str(result.fecha_entrenamiento),
+            "accuracy": float(result.accuracy),
+            "f1_score": float(result.f1),
+            "dataset_size": int(result.dataset_size),
+            "comentario": result.comentario,
+            "modelo_existe": os.path.exists(
+                os.path.join(MODEL_DIR, f"modelo_cart_{result.version_name}.joblib"))
+        }
+    else:
+        return {"status": "empty", "message": "No hay modelos registrados aún."}
 
-@app.get("/api/v1/metrics/history")
-def get_metrics_history(user=Depends(verificar_jwt)):
-    engine = create_engine(DB_URI)
+def _fetch_latest_metrics():
+    from sqlalchemy import text
+    from db import get_engine
+    engine = get_engine()
     with engine.connect() as conn:
-        result = conn.execute(text("""
-            SELECT version_name, fecha_entrenamiento, accuracy, f1, dataset_size
+        # Obtener última versión registrada
+        result = conn.execute(text(SQL_LATEST_METRICS)).fetchone()
+    return _latest_metrics(result)
+
+async def _fetch_latest_metrics_async():
+    from sqlalchemy import text
+    from db import get_async_engine
+    async with get_async_engine().connect() as conn:
+        result = (await conn.execute(text(SQL_LATEST_METRICS))).fetchone()
+    return _latest_metrics(result)
+
+def _encode_cursor(fecha, row_id):
+    raw = f"{fecha}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def _decode_cursor(cursor):
+    try:
+        fecha, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        datetime.fromisoformat(fecha)  # validar formato
+        return fecha, int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def _history_query(after, limit):
+    where, params = "", {"limit": limit + 1}
+    if after:
+        where = """
+            WHERE fecha_entrenamiento < :fecha
+               OR (fecha_entrenamiento = :fecha AND id < :id)
+        """
+        params.update(fecha=after[0], id=after[1])
+    return f"""
+            SELECT id, version_name, fecha_entrenamiento, accuracy, f1, dataset_size
             FROM ai_model_versions
-            ORDER BY fecha_entrenamiento DESC
-        """)).mappings().all()
-    return {"history": list(result)}
+            {where}
+            ORDER BY fecha_entrenamiento DESC, id DESC
+            LIMIT :limit
+        """, params
+
+def _history_page(rows, limit):
+    history = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = history[-1]
+        next_cursor = _encode_cursor(last["fecha_entrenamiento"], last["id"])
+    return {"history": history, "next_cursor": next_cursor}
+
+def _fetch_history_page(after, limit):
+    from sqlalchemy import text
+    from db import get_engine
+    sql, params = _history_query(after, limit)
+    engine = get_engine()
+    with engine.connect() as conn:
+        rows = conn.execute(text(sql), params).mappings().all()
+    return _history_page(rows, limit)
+
+async def _fetch_history_page_async(after, limit):
+    from sqlalchemy import text
+    from db import get_async_engine
+    sql, params = _history_query(after, limit)
+    async with get_async_engine().connect() as conn:
+        rows = (await conn.execute(text(sql), params)).mappings().all()
+    return _history_page(rows, limit)
+
+if API_ASYNC:
+    @app.get("/api/v1/metrics")
+    async def get_metrics(user=Depends(auth_dependency)):
+        """Como en modo sincrónico, con la consulta en el engine async."""
+        try:
+            return await metrics_cache.get_or_set_async("latest", _fetch_latest_metrics_async)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error al obtener métricas: {e}")
+
+    @app.get("/api/v1/metrics/history")
+    async def get_metrics_history(limit: int = Query(50, ge=1, le=METRICS_HISTORY_MAX_LIMIT),
+                                  cursor: Optional[str] = None,
+                                  user=Depends(auth_dependency)):
+        """Como en modo sincrónico, con la consulta en el engine async."""
+        after = _decode_cursor(cursor) if cursor else None
+        return await metrics_cache.get_or_set_async(("history", cursor, limit),
+                                                    lambda: _fetch_history_page_async(after, limit))
+else:
+    @app.get("/api/v1/metrics")
+    def get_metrics(user=Depends(auth_dependency)):
+        """
+        Devuelve información de la versión actual del modelo,
+        sus métricas y estado general.
+        """
+        try:
+            return metrics_cache.get_or_set("latest", _fetch_latest_metrics)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error al obtener métricas: {e}")
+
+    @app.get("/api/v1/metrics/history")
+    def get_metrics_history(limit: int = Query(50, ge=1, le=METRICS_HISTORY_MAX_LIMIT),
+                            cursor: Optional[str] = None,
+                            user=Depends(auth_dependency)):
+        """
+        Historial de versiones, de la más reciente a la más antigua, paginado por
+        (fecha_entrenamiento, id). `next_cursor` se pasa como `cursor` para
+        obtener la página siguiente; es None en la última.
+        """
+        after = _decode_cursor(cursor) if cursor else None
+        return metrics_cache.get_or_set(("history", cursor, limit),
+                                        lambda: _fetch_history_page(after, limit))
+
+@app.get("/api/v1/db/pool")
+def get_pool_stats(user=Depends(auth_dependency)):
+    """Estado del pool de conexiones compartido y tiempos de espera acumulados."""
+    from db import pool_stats
+    return pool_stats()
+
+@app.get("/api/v1/cache/stats")
+def get_cache_stats(user=Depends(auth_dependency)):
+    """Aciertos y fallos de las cachés en memoria del servidor."""
+    return {"metrics": metrics_cache.stats(), "tokens": token_cache_stats(),
+            "predictions": prediction_cache.stats() if prediction_cache is not None else None,
+            "features_index": features_index.stats() if features_index is not None else None,
+            "cpu_executor": cpu_executor.stats() if cpu_executor is not None else None}
+
+@app.get("/api/v1/audit/stats")
+def get_audit_stats(user=Depends(auth_dependency)):
+    """Registros de auditoría pendientes, escritos, desviados a archivo y descartados."""
+    return audit_writer.stats()
+
+@app.get("/api/v1/drift")
+def get_online_drift(user=Depends(auth_dependency)):
+    """
+    Drift del tráfico de predicción en la ventana en curso: PSI/KS por feature
+    contra el perfil de entrenamiento, mezcla de clases predichas y resumen de
+    las ventanas anteriores.
+    """
+    if not DRIFT_ONLINE_ENABLED:
+        raise HTTPException(status_code=404, detail="Monitor de drift en línea desactivado")
+    return drift_monitor.report()
+
+@registro.colector
+def _service_metrics():
+    """Valores que se leen al exportar: versión activa, arranque, pool de BD y cola de auditoría."""
+    from db import pool_stats
+    familias = [("epsdc_import_seconds", "gauge", "Duración de los imports de main.py", IMPORT_SECONDS),
+                ("epsdc_startup_seconds", "gauge", "Duración del evento de arranque", startup_seconds)]
+    bundle = loaded_model()
+    if bundle is not None:
+        familias.append(("epsdc_model_info", "gauge", "Versión activa del modelo",
+                         {(("model_version", bundle.version),): 1}))
+        familias.append(("epsdc_model_loaded_timestamp_seconds", "gauge",
+                         "Momento en que se activó la versión", bundle.loaded_at))
+    pool = pool_stats()
+    for clave in ("pool_size", "checked_out", "checked_in", "overflow"):
+        if clave in pool:
+            familias.append((f"epsdc_db_pool_{clave}", "gauge", f"Pool de BD: {clave}", pool[clave]))
+    familias.append(("epsdc_db_pool_checkouts_total", "counter", "Préstamos de conexión", pool["checkouts"]))
+    familias.append(("epsdc_db_pool_wait_seconds_total", "counter",
+                     "Tiempo acumulado esperando conexión", pool["wait_total_s"]))
+    if prediction_cache is not None:
+        cache = prediction_cache.stats()
+        familias.append(("epsdc_prediction_cache_hits_total", "counter",
+                         "Predicciones servidas desde la caché", cache["hits"]))
+        familias.append(("epsdc_prediction_cache_misses_total", "counter",
+                         "Predicciones que recorrieron el modelo", cache["misses"]))
+        familias.append(("epsdc_prediction_cache_size", "gauge", "Entradas en la caché de predicciones",
+                         cache["size"]))
+    if cpu_executor is not None:
+        cpu = cpu_executor.stats()
+        familias.append(("epsdc_cpu_executor_in_flight", "gauge",
+                         "Tareas de CPU en curso o en espera", cpu["en_curso"]))
+        familias.append(("epsdc_cpu_executor_rejected_total", "counter",
+                         "Tareas de CPU rechazadas con la cola llena", cpu["rechazadas"]))
+    audit = audit_writer.stats()
+    familias.append(("epsdc_audit_queued", "gauge", "Registros de auditoría en cola", audit["queued"]))
+    familias.append(("epsdc_audit_dropped_total", "counter", "Registros de auditoría descartados",
+                     audit["dropped"]))
+    return familias
 
+if METRICS_PROM_ENABLED:
+    @app.get(METRICS_PROM_PATH, include_in_schema=False)
+    def get_prometheus_metrics():
+        """Métricas en formato de texto de Prometheus (sin autenticación)."""
+        return PlainTextResponse(registro.exportar(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,20 @@
+# memoria.py
+"""Medición de memoria del proceso (sin dependencias externas)."""
+import sys
+
+
+def peak_rss_mb(hijos=False):
+    """
+    Pico de memoria residente del proceso en MB (None si la plataforma no lo
+    expone). Con `hijos=True`, el mayor pico entre los procesos hijos ya
+    terminados (p. ej. el pool de la búsqueda de hiperparámetros).
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    quien = resource.RUSAGE_CHILDREN if hijos else resource.RUSAGE_SELF
+    peak = resource.getrusage(quien).ru_maxrss
+    # Linux lo reporta en KB, macOS en bytes
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
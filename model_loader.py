@@ -1,41 +1,264 @@
 # model_loader.py
-import joblib
-from sklearn.tree import DecisionTreeClassifier
-import pandas as pd
+import json
+import logging
 import os
+import threading
+import time
+import warnings
 
-from config import MODEL_DIR, MODEL_PATH, ENCODER_PATH
+from config import MODEL_DIR, MODEL_PATH, ENCODER_PATH, MODEL_MMAP, INFERENCE_SLIM
+from compiled_tree import CompiledTree, check_parity, sample_inputs
+from artifacts import MANIFEST_FULLPATH, read_manifest, atomic_dump
+import modelo_compacto
 
 MODEL_FULLPATH = os.path.join(MODEL_DIR, MODEL_PATH)
 ENCODER_FULLPATH = os.path.join(MODEL_DIR, ENCODER_PATH)
 
-model: DecisionTreeClassifier = None
-encoder = None
+# Versión reportada cuando los artefactos activos no traen manifiesto
+DEFAULT_MODEL_VERSION = "cart_v1"
+
+# Orden de columnas con el que se construye la entrada del modelo
+FEATURES = [
+    'consumo_7d', 'consumo_30d', 'promedio_12m',
+    'dias_desde_ultima_entrega', 'stock_actual',
+    'stock_capacidad', 'solicitudes_pendientes',
+    'proyeccion_72h', 'indicador_riesgo'
+]
+
+
+class ModelBundle:
+    """
+    Versión cargada del modelo: árbol sklearn, codificador y evaluador
+    compilado viajan juntos y no se modifican después de construirse.
+    En modo MODEL_MMAP o INFERENCE_SLIM sólo se carga el evaluador (model y
+    encoder son None).
+    """
+    __slots__ = ("version", "model", "encoder", "compiled", "signature", "loaded_at", "profile")
+
+    def __init__(self, version, model, encoder, compiled, signature, profile=None):
+        self.version = version
+        self.model = model
+        self.encoder = encoder
+        self.compiled = compiled
+        self.signature = signature
+        self.loaded_at = time.time()
+        # Distribución de entrenamiento (drift_stats.perfil_entrenamiento) o None
+        self.profile = profile
+
+
+# Referencia a la versión activa. Se reemplaza entera en cada recarga, por lo
+# que un request que ya tomó su bundle termina con él aunque haya un cambio.
+_active: ModelBundle = None
+_reload_lock = threading.Lock()
+# Firma de la última publicación que falló: no se reintenta hasta que cambie
+_failed_signature = None
+_watcher: threading.Thread = None
+# Funciones a llamar después de activar una versión nueva
+_reload_listeners = []
+
+
+def compile_model(model, encoder) -> CompiledTree:
+    """Compila el árbol y verifica que coincida con sklearn en una muestra."""
+    tree = CompiledTree.from_sklearn(model, encoder)
+    X = sample_inputs(tree, model.n_features_in_)
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        mismatches, max_diff = check_parity(tree, model, X)
+    if mismatches or max_diff > 1e-9:
+        raise RuntimeError(
+            f"El árbol compilado no coincide con sklearn ({mismatches} etiquetas distintas)")
+    return tree
+
+
+def export_arrays(model, encoder, path):
+    """
+    Guarda el árbol compilado como arreglos sin comprimir (joblib), listos
+    para mapearse con mmap_mode="r" en modo MODEL_MMAP.
+    """
+    atomic_dump(compile_model(model, encoder).to_arrays(), path)
+
+
+def export_compact(model, encoder, path, version):
+    """Guarda el artefacto compacto (ver modelo_compacto.py) y devuelve su sha256."""
+    return modelo_compacto.guardar(compile_model(model, encoder), path, version)
+
+
+def _load_shared(arrays_path) -> CompiledTree:
+    """Árbol compilado sobre los arreglos mapeados del archivo (sin copiarlos)."""
+    import joblib
+    return CompiledTree(**joblib.load(arrays_path, mmap_mode="r"), compartido=True)
+
+
+def _file_signature(*paths):
+    sig = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            sig.append((path, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            sig.append((path, None, None))
+    return tuple(sig)
+
+
+def _artifact_signature():
+    # Con manifiesto, sólo importa el manifiesto: se escribe al final, cuando
+    # los artefactos a los que apunta ya están completos.
+    if os.path.exists(MANIFEST_FULLPATH):
+        return _file_signature(MANIFEST_FULLPATH)
+    return _file_signature(MODEL_FULLPATH, ENCODER_FULLPATH)
+
+
+def _load_bundle() -> ModelBundle:
+    signature = _artifact_signature()
+    manifest = read_manifest()
+    if manifest:
+        version = manifest["version"]
+        model_path = os.path.join(MODEL_DIR, manifest["model"])
+        encoder_path = os.path.join(MODEL_DIR, manifest["encoder"])
+    else:
+        version = DEFAULT_MODEL_VERSION
+        model_path, encoder_path = MODEL_FULLPATH, ENCODER_FULLPATH
+
+    arrays_file = manifest.get("arrays") if manifest else None
+    compact_file = manifest.get("compact") if manifest else None
+    if INFERENCE_SLIM and compact_file:
+        # Sin joblib ni sklearn: sólo numpy y el árbol ya verificado al exportar
+        model = encoder = None
+        compiled = modelo_compacto.cargar(os.path.join(MODEL_DIR, compact_file),
+                                          manifest.get("compact_sha256"), version)
+        n_features = compiled.n_features
+    elif MODEL_MMAP and arrays_file:
+        # La paridad con sklearn se verificó al exportar los arreglos
+        model = encoder = None
+        compiled = _load_shared(os.path.join(MODEL_DIR, arrays_file))
+        n_features = compiled.n_features
+    else:
+        if INFERENCE_SLIM:
+            logging.warning(f"La versión {version} no trae artefacto compacto: se carga con sklearn")
+        elif MODEL_MMAP:
+            logging.warning(f"La versión {version} no trae archivo de arreglos: se carga sin mmap")
+        import joblib
+        model = joblib.load(model_path)
+        encoder = joblib.load(encoder_path)
+        n_features = model.n_features_in_
+
+    if n_features != len(FEATURES):
+        raise RuntimeError(
+            f"El modelo espera {n_features} features, la API envía {len(FEATURES)}")
+    if model is not None:
+        compiled = compile_model(model, encoder)
+
+    # Predicción de prueba antes de exponer la versión
+    sample = compiled.predict_one([0.0] * len(FEATURES))
+    if sample["prediction"] not in compiled.classes:
+        raise RuntimeError("La predicción de prueba devolvió una clase desconocida")
+
+    return ModelBundle(version, model, encoder, compiled, signature,
+                       _load_profile(manifest.get("profile") if manifest else None))
+
+
+def _load_profile(profile_file):
+    """El perfil es opcional: si falta o está dañado sólo se desactiva el drift en línea."""
+    if not profile_file:
+        return None
+    try:
+        with open(os.path.join(MODEL_DIR, profile_file), "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except Exception as e:
+        logging.warning(f"No se pudo leer el perfil de entrenamiento {profile_file}: {e}")
+        return None
+
 
 def load_model():
-    global model, encoder
-    model = joblib.load(MODEL_FULLPATH)
-    encoder = joblib.load(ENCODER_FULLPATH)
+    global _active
+    with _reload_lock:
+        _active = _load_bundle()
     print("✅ Modelo cargado correctamente.")
+    return _active
+
+
+def reload_model(force: bool = False):
+    """
+    Carga la versión publicada en disco y, si pasa la verificación, la activa
+    con un único cambio de referencia. Si falla se conserva la versión actual.
+    Devuelve (cambió, versión activa).
+    """
+    global _active, _failed_signature
+    with _reload_lock:
+        current = _active
+        signature = _artifact_signature()
+        if not force and current is not None and signature in (current.signature, _failed_signature):
+            return False, current.version
+        try:
+            bundle = _load_bundle()
+        except Exception as e:
+            _failed_signature = signature
+            logging.error(f"Recarga de modelo fallida, se mantiene la versión actual: {e}")
+            if current is None:
+                raise
+            return False, current.version
+        _active = bundle
+    logging.info(f"Modelo activo: {bundle.version}")
+    for listener in list(_reload_listeners):
+        try:
+            listener(bundle)
+        except Exception as e:
+            logging.error(f"Error en listener de recarga: {e}")
+    return True, bundle.version
+
+
+def on_reload(listener):
+    """Registra `listener(bundle)` para ejecutarse tras cada recarga exitosa."""
+    _reload_listeners.append(listener)
+    return listener
+
+
+def active_model() -> ModelBundle:
+    if _active is None:
+        return load_model()
+    return _active
+
+
+def loaded_model():
+    """Versión activa o None si todavía no se cargó (no dispara la carga)."""
+    return _active
+
+
+def _watch_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            reload_model()
+        except Exception as e:
+            logging.error(f"Error vigilando artefactos del modelo: {e}")
+
+
+def start_watcher(interval: float):
+    """Revisa periódicamente los artefactos y recarga si cambiaron."""
+    global _watcher
+    if interval <= 0 or (_watcher is not None and _watcher.is_alive()):
+        return
+    _watcher = threading.Thread(target=_watch_loop, args=(interval,),
+                                name="model-watcher", daemon=True)
+    _watcher.start()
+
+
+def predict_batch(rows: list, bundle: ModelBundle = None):
+    """
+    Puntúa varias filas en una sola pasada vectorizada sobre el árbol.
+
+    La etiqueta de cada fila se deriva de la misma matriz de probabilidades
+    (argmax), y los resultados se devuelven en el mismo orden que `rows`.
+    """
+    bundle = bundle or active_model()
+
+    if not rows:
+        return []
+
+    X = [[row[f] for f in FEATURES] for row in rows]
+    return bundle.compiled.predict_batch(X)
+
 
-def predict_from_dict(data: dict):
-    if model is None:
-        load_model()
-
-    features = [
-        'consumo_7d', 'consumo_30d', 'promedio_12m',
-        'dias_desde_ultima_entrega', 'stock_actual',
-        'stock_capacidad', 'solicitudes_pendientes',
-        'proyeccion_72h', 'indicador_riesgo'
-    ]
-    df = pd.DataFrame([data], columns=features)
-    pred = model.predict(df)[0]
-    probs = model.predict_proba(df)[0]
-    etiqueta = encoder.inverse_transform([pred])[0]
-    confidence = round(float(max(probs)), 2)
-
-    return {
-        "prediction": etiqueta,
-        "confidence": confidence,
-        "probabilities": dict(zip(encoder.classes_, probs.round(3)))
-    }
+def predict_from_dict(data: dict, bundle: ModelBundle = None):
+    bundle = bundle or active_model()
+    return bundle.compiled.predict_one([data[f] for f in FEATURES])
@@ -0,0 +1,100 @@
+# modelo_compacto.py
+"""
+Artefacto compacto del modelo: el árbol compilado sin pickle.
+
+Un .npz sin comprimir con los arreglos del árbol (feature, threshold,
+children_left/right, proba, missing_go_to_left), la lista de clases y una
+cabecera JSON con el formato, la versión, n_features y max_depth. Se lee
+con allow_pickle=False: cargarlo no ejecuta código ni necesita sklearn o
+joblib, sólo numpy. Es lo único que carga la API en modo INFERENCE_SLIM.
+
+El sha256 del archivo se publica en el manifiesto ("compact_sha256") y se
+verifica antes de activar la versión; un archivo alterado o a medio copiar
+se rechaza como cualquier otra versión que no pasa la verificación.
+
+Uso como script (puntuación por línea de comandos con el modelo activo):
+    python modelo_compacto.py < filas.jsonl
+    python modelo_compacto.py --modelo modelo_v20250301_120000.npz --entrada filas.jsonl
+Cada línea de entrada es un objeto con las features de la API; cada línea
+de salida, {"prediction", "confidence", "probabilities"}.
+"""
+import json
+import os
+
+import numpy as np
+
+from artifacts import atomic_savez, sha256_file
+from compiled_tree import CompiledTree
+
+# Se incrementa si cambia el contenido del archivo; un lector rechaza formatos que no conoce
+FORMATO = 1
+ARREGLOS = ("feature", "threshold", "children_left", "children_right", "proba", "missing_go_to_left")
+
+
+def guardar(tree: CompiledTree, path, version):
+    """Escribe el artefacto de `tree` en `path` y devuelve su sha256."""
+    cabecera = {"formato": FORMATO, "version": version,
+                "n_features": tree.n_features, "max_depth": int(tree.max_depth)}
+    arrays = {nombre: valor for nombre, valor in tree.to_arrays().items()
+              if nombre in ARREGLOS and valor is not None}
+    atomic_savez(path,
+                 cabecera=np.frombuffer(json.dumps(cabecera).encode("utf-8"), dtype=np.uint8),
+                 classes=np.array(tree.classes, dtype=str),
+                 **arrays)
+    return sha256_file(path)
+
+
+def cargar(path, sha256=None, version=None) -> CompiledTree:
+    """
+    Lee el artefacto. Con `sha256` verifica el contenido y con `version`
+    que el archivo sea el de esa versión; si algo no coincide, RuntimeError.
+    """
+    nombre = os.path.basename(path)
+    if sha256 is not None and sha256_file(path) != sha256:
+        raise RuntimeError(f"{nombre} no coincide con el sha256 del manifiesto")
+    with np.load(path, allow_pickle=False) as datos:
+        cabecera = json.loads(datos["cabecera"].tobytes().decode("utf-8"))
+        if cabecera.get("formato") != FORMATO:
+            raise RuntimeError(f"{nombre} tiene formato {cabecera.get('formato')}, se esperaba {FORMATO}")
+        if version is not None and cabecera.get("version") != version:
+            raise RuntimeError(f"{nombre} es de la versión {cabecera.get('version')}, no de {version}")
+        arrays = {campo: datos[campo] for campo in ARREGLOS if campo in datos.files}
+        classes = datos["classes"].tolist()
+    return CompiledTree(**arrays, classes=classes, max_depth=cabecera["max_depth"],
+                        n_features=cabecera["n_features"])
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+
+    t0 = time.perf_counter()
+    parser = argparse.ArgumentParser(description="Puntúa filas JSON con el artefacto compacto")
+    parser.add_argument("--modelo", help="Archivo .npz (por defecto el de la versión activa)")
+    parser.add_argument("--entrada", help="Archivo JSON por línea (por defecto stdin)")
+    args = parser.parse_args()
+
+    from artifacts import read_manifest
+    from config import MODEL_DIR
+    from model_loader import FEATURES
+
+    if args.modelo:
+        tree = cargar(args.modelo)
+    else:
+        manifest = read_manifest()
+        if not manifest or not manifest.get("compact"):
+            raise SystemExit("La versión activa no tiene artefacto compacto (usar --modelo)")
+        tree = cargar(os.path.join(MODEL_DIR, manifest["compact"]),
+                      manifest.get("compact_sha256"), manifest["version"])
+    carga = time.perf_counter() - t0
+
+    entrada = open(args.entrada, "r", encoding="utf-8") if args.entrada else sys.stdin
+    with entrada:
+        filas = [json.loads(linea) for linea in entrada if linea.strip()]
+    X = np.array([[np.nan if fila.get(f) is None else fila[f] for f in FEATURES] for fila in filas],
+                 dtype=np.float64).reshape(len(filas), len(FEATURES))
+    for resultado in tree.predict_batch(X):
+        print(json.dumps(resultado, ensure_ascii=False))
+    print(f"⏱️ {len(filas)} filas; carga del modelo {carga:.3f}s, total {time.perf_counter() - t0:.3f}s",
+          file=sys.stderr)
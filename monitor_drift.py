@@ -1,32 +1,52 @@
 # monitor_drift.py
-import pandas as pd
-from sqlalchemy import create_engine
-import joblib
-from scipy.stats import ks_2samp
-from config import DB_URI
+from datetime import date, timedelta
 
-THRESHOLD_DRIFT = 0.2  # Si más de 20% de las variables presentan drift → alerta
-
-def check_drift():
-    engine = create_engine(DB_URI)
-    df_actual = pd.read_sql("SELECT * FROM dataset_entrenamiento", engine)
-    import os
-    prev_csv = "dataset_entrenamiento.csv"
-    if not os.path.exists(prev_csv):
-        print(f"⚠️ Archivo previo '{prev_csv}' no encontrado. Ejecuta dataset_entrenamiento.py para generarlo antes de monitorizar drift.")
-        return
+from config import DRIFT_PSI_ALERT
+from dataset_entrenamiento import FEATURES
+import drift_sketch
 
-    df_prev = pd.read_csv(prev_csv)  # dataset previo guardado
+THRESHOLD_DRIFT = 0.2  # Si más de 20% de las variables presentan drift → alerta
 
-    numeric_cols = df_actual.select_dtypes(include="number").columns
+def _fecha(valor):
+    # MySQL devuelve date; SQLite, texto
+    return valor if isinstance(valor, date) else date.fromisoformat(str(valor)[:10])
+
+def check_drift(actualizar=True, dias_tendencia=7):
+    """
+    Lee el último punto de la serie de drift (PSI y KS por feature, ver
+    drift_sketch.py) y lo compara con el de `dias_tendencia` días antes.
+    Sólo se leen esas dos fechas de drift_serie: el costo no depende del
+    tamaño del dataset ni del largo de la historia.
+    """
+    if actualizar:
+        drift_sketch.actualizar_drift()
+    ultima = drift_sketch.ultima_fecha()
+    if ultima is None:
+        print("⚠️ Sin serie de drift: hace falta historia suficiente en dataset_entrenamiento "
+              "(ventana base + ventana reciente).")
+        return None
+
+    anterior = ultima - timedelta(days=dias_tendencia)
+    puntos = drift_sketch.serie(fechas=[ultima, anterior])
+    actual = {p["feature"]: p for p in puntos if _fecha(p["fecha"]) == ultima}
+    previo = {p["feature"]: p for p in puntos if _fecha(p["fecha"]) == anterior}
+
+    print(f"Drift al {ultima} (PSI / KS; tendencia de PSI vs {anterior}):")
     drift_count = 0
-    total = len(numeric_cols)
-
-    for col in numeric_cols:
-        stat, p_value = ks_2samp(df_prev[col], df_actual[col])
-        if p_value < 0.05:  # diferencia significativa
+    for col in FEATURES:
+        p = actual.get(col)
+        if p is None:
+            print(f"   {col:<28} sin datos")
+            continue
+        tendencia = ""
+        if col in previo:
+            tendencia = f" ({p['psi'] - previo[col]['psi']:+.3f})"
+        marca = "⚠️" if p["psi"] > DRIFT_PSI_ALERT else "  "
+        print(f"{marca} {col:<28} PSI {p['psi']:.3f}{tendencia}  KS {p['ks']:.3f}")
+        if p["psi"] > DRIFT_PSI_ALERT:
             drift_count += 1
 
+    total = len(FEATURES)
     ratio = drift_count / total
     print(f"Variables con drift: {drift_count}/{total} ({ratio:.1%})")
 
@@ -34,6 +54,7 @@ def check_drift():
         print("⚠️ ALERTA: Posible drift detectado, considera reentrenar.")
     else:
         print("✅ Sin drift significativo.")
+    return {"fecha": ultima, "features": actual, "ratio": ratio}
 
 if __name__ == "__main__":
     check_drift()
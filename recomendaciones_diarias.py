@@ -0,0 +1,172 @@
+# recomendaciones_diarias.py
+"""
+Recomendaciones del día precalculadas por parroquia.
+
+Tras el ETL, `puntuar_dia` lee las features del día de
+features_parroquia_daily, puntúa todas las parroquias en una sola pasada
+vectorizada con el modelo activo y reemplaza las filas de esa fecha en
+recomendaciones_diarias (etiqueta, confianza, probabilidades y versión).
+
+En la API, `MapaRecomendaciones` mantiene en memoria las recomendaciones de
+la última fecha puntuada ({parroquia_id: respuesta}) y revisa cada
+RECOMMENDATIONS_REFRESH_INTERVAL segundos si hay una puntuación nueva; el
+request sólo hace una búsqueda en el dict, sin pasar por el modelo.
+
+Uso:
+    python recomendaciones_diarias.py                     # última fecha con features
+    python recomendaciones_diarias.py --fecha 2025-03-01
+"""
+from datetime import date, datetime
+import argparse
+import json
+import logging
+import threading
+
+import numpy as np
+from sqlalchemy import text
+
+from config import RECOMMENDATIONS_REFRESH_INTERVAL
+from dataset_entrenamiento import FEATURES
+from db import get_engine
+
+# Las columnas de features_parroquia_daily van en el mismo orden que las
+# features de la API (model_loader.FEATURES): el modelo se alinea por posición
+SQL_FEATURES_DIA = text(f"""
+    SELECT parroquia_id, {", ".join(FEATURES)}
+    FROM features_parroquia_daily
+    WHERE fecha = :fecha
+    ORDER BY parroquia_id
+""")
+SQL_ULTIMA_FECHA = text("SELECT MAX(fecha) FROM features_parroquia_daily")
+SQL_BORRAR = text("DELETE FROM recomendaciones_diarias WHERE fecha = :fecha")
+SQL_INSERTAR = text("""
+    INSERT INTO recomendaciones_diarias
+        (fecha, parroquia_id, prediccion, confianza, probabilidades, model_version, creado)
+    VALUES (:fecha, :parroquia_id, :prediccion, :confianza, :probabilidades, :model_version, :creado)
+""")
+# Identifica una puntuación: cambia cuando se puntúa otra fecha o se repite la misma
+SQL_FIRMA = text("""
+    SELECT fecha, MAX(creado), COUNT(*) FROM recomendaciones_diarias
+    WHERE fecha = (SELECT MAX(fecha) FROM recomendaciones_diarias)
+    GROUP BY fecha
+""")
+SQL_LEER = text("""
+    SELECT parroquia_id, prediccion, confianza, probabilidades, model_version
+    FROM recomendaciones_diarias WHERE fecha = :fecha
+""")
+
+
+def puntuar_dia(fecha: date = None, bundle=None):
+    """
+    Puntúa todas las parroquias de `fecha` (por defecto la última con
+    features) y guarda el resultado. Devuelve {"fecha", "parroquias", "model_version"}.
+    """
+    import model_loader
+    bundle = bundle or model_loader.active_model()
+    engine = get_engine()
+    with engine.connect() as conn:
+        fecha = fecha or conn.execute(SQL_ULTIMA_FECHA).scalar()
+        if fecha is None:
+            logging.warning("features_parroquia_daily está vacía: no hay recomendaciones que puntuar")
+            return {"fecha": None, "parroquias": 0, "model_version": bundle.version}
+        filas = conn.execute(SQL_FEATURES_DIA, {"fecha": fecha}).fetchall()
+
+    resultados = []
+    if filas:
+        # None (feature sin dato) -> NaN, que el árbol compilado envía por la rama de faltantes
+        X = np.array([fila[1:] for fila in filas], dtype=np.float64)
+        resultados = bundle.compiled.predict_batch(X)
+
+    creado = datetime.now().replace(microsecond=0)
+    registros = [{
+        "fecha": fecha,
+        "parroquia_id": fila[0],
+        "prediccion": r["prediction"],
+        "confianza": r["confidence"],
+        "probabilidades": json.dumps(r["probabilities"]),
+        "model_version": bundle.version,
+        "creado": creado,
+    } for fila, r in zip(filas, resultados)]
+    with engine.begin() as conn:
+        conn.execute(SQL_BORRAR, {"fecha": fecha})
+        if registros:
+            conn.execute(SQL_INSERTAR, registros)
+
+    resumen = {"fecha": str(fecha), "parroquias": len(registros), "model_version": bundle.version}
+    logging.info(f"Recomendaciones diarias puntuadas: {resumen}")
+    return resumen
+
+
+class MapaRecomendaciones:
+    """Recomendaciones de la última fecha puntuada, en memoria y de sólo lectura."""
+
+    def __init__(self, interval=RECOMMENDATIONS_REFRESH_INTERVAL):
+        self.interval = interval
+        # Se reemplaza entero en cada recarga: un request nunca ve un mapa a medias
+        self._datos = {}
+        self._firma = None
+        self.fecha = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get(self, parroquia_id):
+        return self._datos.get(parroquia_id)
+
+    def __len__(self):
+        return len(self._datos)
+
+    def refrescar(self, force=False):
+        """Recarga el mapa si hay una puntuación nueva. Devuelve True si cambió."""
+        with get_engine().connect() as conn:
+            firma = conn.execute(SQL_FIRMA).fetchone()
+            firma = tuple(firma) if firma else None
+            if not force and firma == self._firma:
+                return False
+            filas = conn.execute(SQL_LEER, {"fecha": firma[0]}).fetchall() if firma else []
+        fecha = str(firma[0]) if firma else None
+        datos = {}
+        for parroquia_id, prediccion, confianza, probabilidades, version in filas:
+            if isinstance(probabilidades, str):
+                probabilidades = json.loads(probabilidades)
+            datos[int(parroquia_id)] = {
+                "parroquia_id": int(parroquia_id),
+                "fecha": fecha,
+                "model_version": version,
+                "prediction": prediccion,
+                "confidence": float(confianza),
+                "probabilities": probabilidades,
+            }
+        self._datos, self._firma, self.fecha = datos, firma, fecha
+        logging.info(f"Recomendaciones en memoria: {len(datos)} parroquias del {fecha}")
+        return True
+
+    def stats(self):
+        return {"fecha": self.fecha, "parroquias": len(self._datos)}
+
+    def start(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="recomendaciones", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refrescar()
+            except Exception as e:
+                logging.error(f"Error refrescando recomendaciones diarias: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Puntuación diaria de recomendaciones por parroquia")
+    parser.add_argument("--fecha", type=date.fromisoformat, help="Fecha a puntuar (por defecto la última)")
+    args = parser.parse_args()
+    res = puntuar_dia(args.fecha)
+    print(f"✅ {res['parroquias']} recomendaciones del {res['fecha']} con el modelo {res['model_version']}")
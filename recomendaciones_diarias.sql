@@ -0,0 +1,19 @@
+-- V1.0
+
+-- recomendaciones_diarias.sql
+-- Recomendación precalculada de cada parroquia para el día, con el modelo
+-- activo al momento de puntuar (ver recomendaciones_diarias.py). La API la
+-- sirve en GET /api/v1/recommendations/{parroquia_id}.
+CREATE TABLE IF NOT EXISTS recomendaciones_diarias (
+    fecha DATE NOT NULL,
+    parroquia_id INT NOT NULL,
+
+    prediccion VARCHAR(10) NOT NULL,
+    confianza DECIMAL(5,4) NOT NULL,
+    probabilidades JSON NOT NULL,
+    model_version VARCHAR(50) NOT NULL,
+
+    creado TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (fecha, parroquia_id)
+);
@@ -0,0 +1,240 @@
+# retrain_jobs.py
+"""
+Cola de trabajos de reentrenamiento.
+
+Cada trabajo ejecuta `retrain_model.py` en un proceso hijo con prioridad de
+CPU reducida y tope de memoria, para que la inferencia del servidor no se
+degrade mientras se entrena. Un único hilo despachador garantiza que nunca
+corren dos entrenamientos a la vez dentro del proceso, y un lock de archivo
+evita que otro worker del servidor lance uno en paralelo.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from datetime import datetime
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import uuid
+
+from config import (RETRAIN_TIMEOUT, RETRAIN_NICE, RETRAIN_MEMORY_LIMIT_MB,
+                    RETRAIN_JOBS_HISTORY, MODEL_DIR)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+RETRAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "retrain_model.py")
+LOCK_FILE = os.path.join(MODEL_DIR, ".retrain.lock")
+
+# Estados posibles de un trabajo
+QUEUED, RUNNING, SUCCEEDED, FAILED, TIMEOUT = "queued", "running", "succeeded", "failed", "timeout"
+CANCELLED = "cancelled"
+
+
+class RetrainBusy(Exception):
+    def __init__(self, job=None):
+        if job is None:
+            super().__init__("Otro proceso del servidor ya está reentrenando")
+        else:
+            super().__init__(f"Ya hay un reentrenamiento en curso ({job.id})")
+        self.job = job
+
+
+class RetrainJob:
+    def __init__(self, user):
+        self.id = uuid.uuid4().hex
+        self.user = user
+        self.status = QUEUED
+        self.submitted_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.returncode = None
+        self.summary = None
+        self.error = None
+        self.future = None
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    def to_dict(self):
+        duration = None
+        if self.started_at:
+            end = self.finished_at or datetime.utcnow()
+            duration = round((end - self.started_at).total_seconds(), 3)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "user": self.user,
+            "submitted_at": self.submitted_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "duration_s": duration,
+            "returncode": self.returncode,
+            "summary": self.summary,
+            "error": self.error,
+        }
+
+
+_jobs = OrderedDict()
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retrain")
+_process: subprocess.Popen = None
+
+
+def _limit_resources(pid):
+    """
+    Aplica prioridad y tope de memoria al hijo ya lanzado, desde el padre.
+    No se usa preexec_fn: correr código entre fork y exec en un servidor con
+    varios hilos (watcher, auditoría, ejecutores) puede dejar al hijo bloqueado.
+    """
+    if os.name != "posix":
+        return
+    if RETRAIN_NICE:
+        try:
+            os.setpriority(os.PRIO_PROCESS, pid, os.getpriority(os.PRIO_PROCESS, 0) + RETRAIN_NICE)
+        except OSError as e:
+            logging.warning(f"No se pudo bajar la prioridad del reentrenamiento: {e}")
+    if RETRAIN_MEMORY_LIMIT_MB > 0:
+        import resource
+        if not hasattr(resource, "prlimit"):  # sólo Linux
+            logging.warning("Sin resource.prlimit: el reentrenamiento corre sin tope de memoria")
+            return
+        limit = RETRAIN_MEMORY_LIMIT_MB * 1024 * 1024
+        try:
+            resource.prlimit(pid, resource.RLIMIT_AS, (limit, limit))
+        except (OSError, ValueError) as e:
+            logging.warning(f"No se pudo limitar la memoria del reentrenamiento: {e}")
+
+
+def _popen_kwargs():
+    if os.name == "posix":
+        return {}
+    # En Windows no hay RLIMIT: sólo se baja la prioridad
+    return {"creationflags": subprocess.BELOW_NORMAL_PRIORITY_CLASS}
+
+
+def parse_summary(stdout: str):
+    """El script imprime su resumen como JSON en la última línea parseable."""
+    for line in reversed((stdout or "").strip().splitlines()):
+        line = line.strip()
+        if line.startswith("{"):
+            try:
+                return json.loads(line)
+            except ValueError:
+                continue
+    return None
+
+
+def _tail(text, lines=20):
+    return "\n".join((text or "").strip().splitlines()[-lines:])
+
+
+def _run(job: RetrainJob, on_success):
+    global _process
+    lock_fh = open(LOCK_FILE, "w")
+    try:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                job.status, job.error = FAILED, "Otro proceso del servidor ya está reentrenando"
+                job.finished_at = datetime.utcnow()
+                return
+
+        job.status = RUNNING
+        job.started_at = datetime.utcnow()
+        logging.info(f"Reentrenamiento {job.id} iniciado por {job.user}")
+
+        _process = subprocess.Popen(
+            [sys.executable, RETRAIN_SCRIPT],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            cwd=os.path.dirname(RETRAIN_SCRIPT), **_popen_kwargs()
+        )
+        # El hijo recién arranca el intérprete: el tope llega antes de cargar datos
+        _limit_resources(_process.pid)
+        try:
+            stdout, stderr = _process.communicate(timeout=RETRAIN_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            _process.kill()
+            stdout, stderr = _process.communicate()
+            job.status = TIMEOUT
+            job.error = f"Tiempo máximo de {RETRAIN_TIMEOUT}s excedido"
+        job.returncode = _process.returncode
+
+        if job.status != TIMEOUT:
+            job.summary = parse_summary(stdout)
+            if job.returncode == 0:
+                job.status = SUCCEEDED
+            else:
+                job.status = FAILED
+                job.error = _tail(stderr) or f"Código de salida {job.returncode}"
+    except Exception as e:
+        job.status, job.error = FAILED, str(e)
+    finally:
+        _process = None
+        job.finished_at = datetime.utcnow()
+        lock_fh.close()
+        logging.info(f"Reentrenamiento {job.id} terminado: {job.status}")
+
+    if job.status == SUCCEEDED and on_success is not None:
+        try:
+            on_success(job)
+        except Exception as e:
+            logging.error(f"Error tras reentrenamiento {job.id}: {e}")
+
+
+def _locked_elsewhere():
+    """True si otro proceso tiene tomado el lock de reentrenamiento."""
+    if fcntl is None:
+        return False
+    with open(LOCK_FILE, "w") as fh:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        fcntl.flock(fh, fcntl.LOCK_UN)
+    return False
+
+
+def submit(user, on_success=None) -> RetrainJob:
+    """
+    Encola un reentrenamiento y devuelve el trabajo de inmediato.
+    Lanza RetrainBusy si ya hay uno en cola o corriendo.
+    """
+    with _lock:
+        for job in _jobs.values():
+            if job.active:
+                raise RetrainBusy(job)
+        # Otro worker entrenando: se rechaza ya en lugar de aceptar un trabajo
+        # que fallaría al tomar el lock (que _run igual vuelve a comprobar)
+        if _locked_elsewhere():
+            raise RetrainBusy()
+        job = RetrainJob(user)
+        _jobs[job.id] = job
+        while len(_jobs) > RETRAIN_JOBS_HISTORY:
+            _jobs.popitem(last=False)
+        job.future = _executor.submit(_run, job, on_success)
+    return job
+
+
+def get(job_id) -> RetrainJob:
+    return _jobs.get(job_id)
+
+
+def shutdown():
+    """Detiene el entrenamiento en curso (si lo hay) al apagar el servidor."""
+    proc = _process
+    if proc is not None and proc.poll() is None:
+        proc.kill()
+    _executor.shutdown(wait=False, cancel_futures=True)
+    # Los trabajos que no llegaron a empezar no quedan "queued" para siempre
+    with _lock:
+        for job in _jobs.values():
+            if job.status == QUEUED and job.future is not None and job.future.cancelled():
+                job.status, job.error = CANCELLED, "El servidor se apagó antes de iniciar el trabajo"
+                job.finished_at = datetime.utcnow()
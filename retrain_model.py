@@ -1,51 +1,63 @@
 # retrain_model.py
-import pandas as pd
-from sqlalchemy import create_engine, text
-from sklearn.tree import DecisionTreeClassifier
+import numpy as np
+from sqlalchemy import text
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import accuracy_score, f1_score
-import joblib
 import os
 from datetime import datetime
-from config import DB_URI, MODEL_DIR, MODEL_PATH, ENCODER_PATH
+from db import get_engine
+from config import MODEL_DIR, MODEL_PATH, ENCODER_PATH, TRAIN_SOURCE, SEARCH_SEED
 import json
-import shutil
-import os
+from artifacts import atomic_dump, atomic_copy, atomic_write_json, write_manifest
+from dataset_entrenamiento import cargar_xy, FEATURES
+from drift_stats import perfil_entrenamiento
+from busqueda_hiperparametros import entrenar
+from memoria import peak_rss_mb
+from model_loader import export_arrays, export_compact
+
+def _cargar_datos(fuente):
+    if fuente == "snapshot":
+        # Lectura del snapshot local (memmap), tras agregar las fechas nuevas
+        from snapshot_store import SnapshotStore
+        store = SnapshotStore()
+        store.actualizar()
+        return store.cargar_xy()
+    if fuente != "db":
+        raise ValueError(f"Origen de datos desconocido: {fuente} (opciones: db, snapshot)")
+    return cargar_xy()
 
-def retrain_model():
+def retrain_model(fuente=TRAIN_SOURCE):
     print("🚀 Iniciando reentrenamiento del modelo CART...")
 
-    engine = create_engine(DB_URI)
-    df = pd.read_sql("SELECT * FROM dataset_entrenamiento", engine)
+    engine = get_engine()
 
     # --- Preparación de datos ---
-    # aceptar tanto 'etiqueta' como 'clase' como nombre de columna objetivo
-    if 'etiqueta' in df.columns:
-        target_col = 'etiqueta'
-    elif 'clase' in df.columns:
-        target_col = 'clase'
-    else:
-        raise RuntimeError("Columna objetivo no encontrada (esperada 'etiqueta' o 'clase').")
-
-    X = df.drop(columns=[target_col])
-    y = df[target_col]
+    # Sólo las features del modelo (float32) y la etiqueta categórica, leídas por bloques
+    X, y = _cargar_datos(fuente)
+    if len(X) == 0:
+        raise RuntimeError("dataset_entrenamiento no tiene filas para entrenar.")
+    dataset_size = len(X)
 
+    # Las categorías vienen ordenadas, igual que LabelEncoder.classes_: los
+    # códigos de la categórica ya son las etiquetas codificadas
     encoder = LabelEncoder()
-    y_encoded = encoder.fit_transform(y)
+    encoder.fit(np.asarray(y.categories))
+    y_encoded = y.codes.astype(np.int32)
+    del y
 
+    # Estratificado como en entrenar_modelo_cart.py (si todas las clases lo permiten)
+    estratificar = y_encoded if np.bincount(y_encoded).min() >= 2 else None
     X_train, X_test, y_train, y_test = train_test_split(
-        X, y_encoded, test_size=0.2, random_state=42
+        X, y_encoded, test_size=0.2, random_state=SEARCH_SEED, stratify=estratificar
     )
+    del X
 
     # --- Entrenamiento ---
-    model = DecisionTreeClassifier(
-        criterion="gini",
-        max_depth=6,
-        class_weight="balanced",
-        random_state=42
-    )
-    model.fit(X_train, y_train)
+    # Búsqueda de hiperparámetros con CV estratificada sobre X_train y ajuste final
+    model, busqueda = entrenar(X_train, y_train)
+    print(f"🔎 Hiperparámetros: {busqueda['params']} (F1 CV {busqueda['f1_cv']}, "
+          f"{busqueda['evaluaciones']} evaluaciones en {busqueda['tiempo_s']}s)")
 
     # --- Evaluación ---
     y_pred = model.predict(X_test)
@@ -54,45 +66,80 @@ def retrain_model():
 
     # --- Guardar nueva versión ---
     version_name = f"v{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    model_path = f"modelo_cart_{version_name}.joblib"
-    encoder_path = f"encoder_etiquetas_{version_name}.joblib"
+    model_file = f"modelo_cart_{version_name}.joblib"
+    encoder_file = f"encoder_etiquetas_{version_name}.joblib"
+    model_path = os.path.join(MODEL_DIR, model_file)
+    encoder_path = os.path.join(MODEL_DIR, encoder_file)
+    profile_file = f"perfil_{version_name}.json"
+    arrays_file = f"arbol_{version_name}.joblib"
+    compact_file = f"modelo_{version_name}.npz"
+
+    # Escritura temporal + rename: la API nunca lee un artefacto a medias
+    atomic_dump(model, model_path)
+    atomic_dump(encoder, encoder_path)
+    # Árbol compilado como arreglos sin comprimir (modo MODEL_MMAP de la API)
+    export_arrays(model, encoder, os.path.join(MODEL_DIR, arrays_file))
+    # Artefacto compacto sin pickle (modo INFERENCE_SLIM), con su sha256 en el manifiesto
+    compact_sha256 = export_compact(model, encoder, os.path.join(MODEL_DIR, compact_file), version_name)
+    # Distribución de entrenamiento: referencia del monitor de drift en línea
+    atomic_write_json(os.path.join(MODEL_DIR, profile_file),
+                      perfil_entrenamiento(X_train, encoder.classes_[y_train], FEATURES))
 
-    joblib.dump(model, model_path)
-    joblib.dump(encoder, encoder_path)
+    # --- Registrar en base de datos ---
+    # Primero la fila de la versión: al publicar el manifiesto los servidores
+    # recargan y vacían la caché de /metrics, y la versión ya debe estar en la BD
+    try:
+        with engine.begin() as conn:
+            insert_sql = text("""
+                INSERT INTO ai_model_versions
+                (version_name, fecha_entrenamiento, accuracy, f1, clases, dataset_size, ruta_modelo, comentario,
+                 hiperparametros, tiempo_busqueda_s)
+                VALUES (:version_name, :fecha_entrenamiento, :accuracy, :f1, :clases, :dataset_size, :ruta_modelo, :comentario,
+                        :hiperparametros, :tiempo_busqueda_s)
+            """)
+            conn.execute(insert_sql, {
+                'version_name': version_name,
+                'fecha_entrenamiento': datetime.now(),
+                'accuracy': acc,
+                'f1': f1,
+                'clases': json.dumps(list(encoder.classes_)),
+                'dataset_size': dataset_size,
+                'ruta_modelo': model_path,
+                'comentario': 'Reentrenamiento automático',
+                'hiperparametros': json.dumps(busqueda['params']),
+                'tiempo_busqueda_s': busqueda['tiempo_s']
+            })
+    except Exception:
+        # La versión no se publicó: sus artefactos no los referencia nadie
+        for archivo in (model_file, encoder_file, arrays_file, compact_file, profile_file):
+            try:
+                os.remove(os.path.join(MODEL_DIR, archivo))
+            except FileNotFoundError:
+                pass
+        raise
+
+    # Publicar la versión: el manifiesto apunta al par modelo/codificador y los
+    # servidores lo recargan juntos (ver model_loader.reload_model)
+    write_manifest(version_name, model_file, encoder_file, profile=profile_file, arrays=arrays_file,
+                   compact=compact_file, compact_sha256=compact_sha256)
 
     # Copiar los artefactos versionados a la ruta 'activa' configurada
     try:
         active_model_path = os.path.join(MODEL_DIR, MODEL_PATH)
         active_encoder_path = os.path.join(MODEL_DIR, ENCODER_PATH)
-        shutil.copyfile(model_path, active_model_path)
-        shutil.copyfile(encoder_path, active_encoder_path)
+        atomic_copy(model_path, active_model_path)
+        atomic_copy(encoder_path, active_encoder_path)
     except Exception as e:
         print(f"⚠️ No se pudo copiar artefactos a ruta activa: {e}")
 
-    # --- Registrar en base de datos ---
-    # Insertar metadatos de la nueva versión en la BD usando parámetros nombrados
-    with engine.begin() as conn:
-        insert_sql = text("""
-            INSERT INTO ai_model_versions
-            (version_name, fecha_entrenamiento, accuracy, f1, clases, dataset_size, ruta_modelo, comentario)
-            VALUES (:version_name, :fecha_entrenamiento, :accuracy, :f1, :clases, :dataset_size, :ruta_modelo, :comentario)
-        """)
-        conn.execute(insert_sql, {
-            'version_name': version_name,
-            'fecha_entrenamiento': datetime.now(),
-            'accuracy': acc,
-            'f1': f1,
-            'clases': json.dumps(list(encoder.classes_)),
-            'dataset_size': len(df),
-            'ruta_modelo': model_path,
-            'comentario': 'Reentrenamiento automático'
-        })
-
     summary = {
         "version": version_name,
         "accuracy": acc,
         "f1": f1,
-        "dataset_size": len(df)
+        "dataset_size": dataset_size,
+        "hiperparametros": busqueda["params"],
+        "tiempo_busqueda_s": busqueda["tiempo_s"],
+        "peak_rss_mb": peak_rss_mb()
     }
 
     print(f"✅ Reentrenamiento completado ({version_name})")
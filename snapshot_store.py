@@ -0,0 +1,221 @@
+# snapshot_store.py
+"""
+Copia local columnar de dataset_entrenamiento.
+
+Cada fecha es una partición (un directorio fecha=YYYY-MM-DD) con un .npy por
+columna; la etiqueta se guarda como códigos int8 contra la lista de
+etiquetas del manifiesto. El manifiesto (manifest.json) registra las
+columnas, las filas y el sha256 de cada archivo por partición, y la marca
+de agua (MAX(updated_at) de dataset_entrenamiento) de la última
+actualización: las fechas con filas modificadas después de esa marca (un
+refresco o una reetiquetación del ETL incremental) se reescriben.
+
+Las particiones se escriben en un directorio temporal y se renombran, y el
+manifiesto se reemplaza al final: si algo falla a la mitad, el manifiesto
+sigue describiendo sólo particiones completas. La lectura usa np.load con
+mmap_mode='r', así que los datos no se parsean ni se copian al abrirlos.
+
+Uso:
+    store = SnapshotStore()
+    store.actualizar()                       # agrega fechas nuevas y reescribe las modificadas
+    X, y = store.cargar_xy(desde=..., hasta=...)
+"""
+from datetime import date, datetime, timedelta
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from artifacts import atomic_write_json, sha256_file
+from config import SNAPSHOT_DIR
+from dataset_entrenamiento import FEATURES, TARGET, cargar_dataset
+from db import get_engine
+
+MANIFEST = "manifest.json"
+FORMATO = 1
+# dtype de cada columna guardada (la fecha va en el nombre de la partición)
+COLUMNAS = {"parroquia": "int32", **{f: "float32" for f in FEATURES}, TARGET: "int8"}
+
+SQL_MAX_UPDATED = text("SELECT MAX(updated_at) FROM dataset_entrenamiento")
+SQL_FECHAS_CAMBIADAS = text("""
+    SELECT DISTINCT fecha FROM dataset_entrenamiento
+    WHERE updated_at >= :marca AND fecha <= :hasta
+""")
+
+
+class SnapshotStore:
+    def __init__(self, root=SNAPSHOT_DIR):
+        self.root = root
+        self.manifest = self._leer_manifest()
+
+    # --- Manifiesto ---
+    def _leer_manifest(self):
+        path = os.path.join(self.root, MANIFEST)
+        if not os.path.exists(path):
+            return {"formato": FORMATO, "columnas": COLUMNAS, "etiquetas": [], "particiones": {}}
+        with open(path, "r", encoding="utf-8") as fh:
+            manifest = json.load(fh)
+        if manifest.get("formato") != FORMATO:
+            raise RuntimeError(f"Formato de snapshot no soportado: {manifest.get('formato')}")
+        return manifest
+
+    def _guardar_manifest(self):
+        self.manifest["actualizado"] = datetime.now().isoformat(timespec="seconds")
+        atomic_write_json(os.path.join(self.root, MANIFEST), self.manifest)
+
+    def fechas(self):
+        return sorted(date.fromisoformat(f) for f in self.manifest["particiones"])
+
+    def filas(self, desde=None, hasta=None):
+        return sum(p["filas"] for _, p in self._seleccion(desde, hasta))
+
+    def _dir_particion(self, fecha):
+        return os.path.join(self.root, f"fecha={fecha}")
+
+    def _seleccion(self, desde=None, hasta=None):
+        for f in self.fechas():
+            if (desde is None or f >= desde) and (hasta is None or f <= hasta):
+                yield f, self.manifest["particiones"][f.isoformat()]
+
+    # --- Escritura ---
+    def _codigos_etiqueta(self, serie):
+        etiquetas = self.manifest["etiquetas"]
+        # Lista sólo de agregado: los códigos ya escritos no cambian de significado
+        for valor in pd.unique(serie.dropna()):
+            if valor not in etiquetas:
+                etiquetas.append(valor)
+        indice = {e: i for i, e in enumerate(etiquetas)}
+        return serie.map(indice).fillna(-1).to_numpy(dtype=np.int8)
+
+    def agregar(self, df, reemplazar=()):
+        """
+        Escribe como particiones nuevas las fechas de `df` que aún no están en
+        el snapshot y reescribe las de `reemplazar` (las que ya no tienen
+        filas en `df` se quitan). Devuelve las fechas escritas.
+        """
+        reemplazar = {f.isoformat() for f in reemplazar}
+        vacias = [c for c in reemplazar if c in self.manifest["particiones"]]
+        if df.empty and not vacias:
+            return []
+        os.makedirs(self.root, exist_ok=True)
+        dias = pd.to_datetime(df["fecha"]).dt.date
+        existentes = set(self.manifest["particiones"]) - reemplazar
+        agregadas = []
+        for fecha, grupo in df.groupby(dias, sort=True):
+            clave = fecha.isoformat()
+            if clave in vacias:
+                vacias.remove(clave)
+            if clave in existentes:
+                continue
+            destino = self._dir_particion(clave)
+            tmp = f"{destino}.tmp-{os.getpid()}"
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            hashes = {}
+            for col, dtype in COLUMNAS.items():
+                if col == TARGET:
+                    valores = self._codigos_etiqueta(grupo[col].astype(object))
+                else:
+                    valores = grupo[col].to_numpy(dtype=dtype)
+                path = os.path.join(tmp, f"{col}.npy")
+                np.save(path, np.ascontiguousarray(valores))
+                hashes[col] = sha256_file(path)
+            shutil.rmtree(destino, ignore_errors=True)
+            os.replace(tmp, destino)
+            self.manifest["particiones"][clave] = {"filas": len(grupo), "sha256": hashes}
+            agregadas.append(fecha)
+        for clave in vacias:
+            shutil.rmtree(self._dir_particion(clave), ignore_errors=True)
+            del self.manifest["particiones"][clave]
+        if agregadas or vacias:
+            self._guardar_manifest()
+        return agregadas
+
+    def actualizar(self, hasta=None):
+        """
+        Trae de la BD las fechas posteriores a la última partición y reescribe
+        las que tienen filas modificadas desde la marca del manifiesto, hasta
+        ayer por defecto (el día en curso todavía puede cambiar). Sin marca
+        (snapshot anterior a la marca) se reescriben todas las particiones.
+        """
+        hasta = hasta or date.today() - timedelta(days=1)
+        fechas = self.fechas()
+        marca = self.manifest.get("marca")
+        with get_engine().connect() as conn:
+            # La marca nueva se toma antes de leer: lo que cambie durante la
+            # actualización queda para la próxima
+            nueva_marca = conn.execute(SQL_MAX_UPDATED).scalar()
+            if marca is None:
+                cambiadas = [f for f in fechas if f <= hasta]
+            else:
+                cambiadas = sorted({date.fromisoformat(str(r[0])[:10]) for r in conn.execute(
+                    SQL_FECHAS_CAMBIADAS, {"marca": marca, "hasta": hasta})} & set(fechas))
+
+        columnas = ["parroquia", "fecha"] + FEATURES + [TARGET]
+        escritas = []
+        for fecha in cambiadas:
+            escritas += self.agregar(cargar_dataset(columnas, desde=fecha, hasta=fecha), reemplazar=[fecha])
+        desde = fechas[-1] + timedelta(days=1) if fechas else None
+        if desde is None or desde <= hasta:
+            escritas += self.agregar(cargar_dataset(columnas, desde=desde, hasta=hasta))
+        if nueva_marca is not None and str(nueva_marca) != marca:
+            self.manifest["marca"] = str(nueva_marca)
+            self._guardar_manifest()
+        return sorted(escritas)
+
+    # --- Lectura ---
+    def particion(self, fecha, columnas=None):
+        """{columna: np.memmap} de una partición, sin copiar los datos."""
+        base = self._dir_particion(fecha.isoformat())
+        return {col: np.load(os.path.join(base, f"{col}.npy"), mmap_mode="r")
+                for col in (columnas or COLUMNAS)}
+
+    def columnas(self, columnas=None, desde=None, hasta=None):
+        """
+        {columna: array} del rango. Con una sola partición son memmaps sin
+        copia; con varias se concatenan (una copia, sin parseo).
+        """
+        columnas = list(columnas or COLUMNAS)
+        partes = [self.particion(f, columnas) for f, _ in self._seleccion(desde, hasta)]
+        if not partes:
+            return {c: np.empty(0, dtype=COLUMNAS[c]) for c in columnas}
+        if len(partes) == 1:
+            return partes[0]
+        return {c: np.concatenate([p[c] for p in partes]) for c in columnas}
+
+    def cargar_xy(self, desde=None, hasta=None):
+        """Igual que dataset_entrenamiento.cargar_xy pero desde el snapshot."""
+        partes = [self.particion(f, FEATURES + [TARGET]) for f, _ in self._seleccion(desde, hasta)]
+        n = sum(len(p[TARGET]) for p in partes)
+        X = np.empty((n, len(FEATURES)), dtype=np.float32)
+        codigos = np.empty(n, dtype=np.int8)
+        i = 0
+        for p in partes:
+            k = len(p[TARGET])
+            for j, f in enumerate(FEATURES):
+                X[i:i + k, j] = p[f]
+            codigos[i:i + k] = p[TARGET]
+            i += k
+        etiquetas = self.manifest["etiquetas"]
+        y = pd.Categorical.from_codes(codigos, categories=etiquetas)
+        # Mismas categorías que la carga desde la BD: sólo las presentes, en orden alfabético
+        y = y.remove_unused_categories()
+        return X, y.reorder_categories(sorted(y.categories))
+
+    def verificar(self):
+        """Fechas cuyas filas o hashes no coinciden con el manifiesto."""
+        errores = []
+        for fecha, info in self._seleccion():
+            base = self._dir_particion(fecha.isoformat())
+            for col, esperado in info["sha256"].items():
+                path = os.path.join(base, f"{col}.npy")
+                if not os.path.exists(path) or sha256_file(path) != esperado:
+                    errores.append(fecha)
+                    break
+            else:
+                if len(np.load(os.path.join(base, f"{TARGET}.npy"), mmap_mode="r")) != info["filas"]:
+                    errores.append(fecha)
+        return errores